@@ -5,12 +5,18 @@ Author: Ron Webb
 Since: 1.0.0
 """
 
+from query_ai.api.admission import Admission
 from query_ai.api.context import Context
+from query_ai.api.health import Health
+from query_ai.api.metrics import Metrics
 from query_ai.api.query import Query
 
 endpoints = (
-    lambda app: Context(app), #pylint: disable=unnecessary-lambda
-    lambda app: Query(app), #pylint: disable=unnecessary-lambda
+    lambda app, models: Context(app, models), #pylint: disable=unnecessary-lambda
+    lambda app, models: Query(app, models), #pylint: disable=unnecessary-lambda
+    lambda app, models: Health(app, models), #pylint: disable=unnecessary-lambda
+    lambda app, _: Metrics(app),
+    lambda app, _: Admission(app),
 )
 
 __all__ = ['endpoints']
@@ -0,0 +1,101 @@
+"""
+This module defines the Admission class to bound the concurrent requests of the endpoints
+running the models.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+from flask import Flask, g, jsonify, make_response, request
+
+from query_ai.config.server_config import ServerConfig
+from query_ai.logger import get_logger
+from query_ai.metrics import admission_rejected_total
+from query_ai.util.admission_controller import AdmissionController, \
+    AdmissionQueueFullException, AdmissionRejectedException
+
+# pylint: disable=R0903
+class Admission:
+    """
+    A class to admit the query and context requests within their limits. A request over its
+    limit is rejected at once with 429 if the queue of its limit is full, or with 503 if it
+    waited too long for its turn, both with a Retry-After header.
+
+    A request holds its turn until its response is sent, including a streamed body.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    LIMITS = {
+        '/api/v1/query': 'query',
+        '/api/v1/query/batch': 'query',
+        '/api/v1/context': 'context',
+        '/api/v1/context/stream': 'context',
+    }
+
+    def __init__(self, app: Flask, server_config: ServerConfig = None):
+        """
+        Initializes the Admission class with the given Flask app and sets up the hooks
+        admitting the requests.
+
+        Parameters:
+        app (Flask): The Flask application instance.
+        server_config (ServerConfig): The limits of the requests. The environment variables
+            are read if not provided.
+        """
+        self.app = app
+        self.server_config = server_config if server_config is not None else ServerConfig()
+        self.log = get_logger(__name__)
+        self.controllers = {name: AdmissionController(name, *self.server_config.get_limit(name))
+                            for name in set(Admission.LIMITS.values())}
+        self.app.before_request(self.__admit)
+        self.app.after_request(self.__release_on_close)
+        self.app.teardown_request(self.__release)
+
+    def __admit(self):
+        rule = request.url_rule.rule if request.url_rule is not None else None
+        name = Admission.LIMITS.get(rule)
+
+        if name is None or request.method not in ('POST', 'PUT'):
+            return None
+
+        too_many_requests = 429
+        service_unavailable = 503
+
+        try:
+            self.controllers[name].acquire()
+        except AdmissionRejectedException as exception:
+            status = too_many_requests if isinstance(exception, AdmissionQueueFullException) \
+                else service_unavailable
+
+            self.log.warning("Rejected a %s request with %d: %s", name, status, exception)
+            admission_rejected_total.inc(limit=name, status=str(status))
+
+            response = make_response(jsonify({'error': str(exception)}), status)
+            response.headers['Retry-After'] = str(self.server_config.get_retry_after())
+            return response
+
+        g.admission_controller = self.controllers[name]
+        return None
+
+    @staticmethod
+    def __release_on_close(response):
+        """
+        Holds the turn of a streamed response until its body is sent, i.e. until it is closed.
+        """
+        if response.is_streamed:
+            controller = g.pop('admission_controller', None)
+
+            if controller is not None:
+                response.call_on_close(controller.release)
+
+        return response
+
+    @staticmethod
+    def __release(___exception):
+        controller = g.pop('admission_controller', None)
+
+        if controller is not None:
+            controller.release()
+# pylint: enable=R0903
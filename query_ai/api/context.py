@@ -5,11 +5,16 @@ Author: Ron Webb
 Since: 1.0.0
 """
 
-from flask import Flask, request, make_response
+import json
 
-from query_ai.database import is_existing_context, db_manager
+from flask import Flask, request, make_response, jsonify
+
+from query_ai.config import ingestion_config
+from query_ai.database import vector_store
+from query_ai.job import job_manager, IngestionJob, JobQueueFullException
+from query_ai.metrics import chunks_total
 from query_ai.model import model_manager
-from query_ai.util import text_util
+from query_ai.util import text_util, LineTooLongException
 
 # pylint: disable=R0903
 class Context:
@@ -20,27 +25,112 @@ class Context:
     Since: 1.0.0
     """
 
-    def __init__(self, app: Flask):
+    def __init__(self, app: Flask, models=None):
         """
-        Initializes the Context class with the given Flask app and sets up the URL rule.
+        Initializes the Context class with the given Flask app and sets up the URL rules.
 
         Parameters:
         app (Flask): The Flask application instance.
+        models (ModelMgr): The models answering the requests, or a ModelWorkerPool running
+            them. The model_manager is used if not provided.
         """
         self.app = app
+        self.models = models if models is not None else model_manager
         self.app.add_url_rule('/api/v1/context', view_func=self.save_context, methods=['PUT'])
+        self.app.add_url_rule('/api/v1/context/stream', view_func=self.stream_context,
+                              methods=['PUT'])
+        self.app.add_url_rule('/api/v1/context/jobs/<job_id>', view_func=self.get_job,
+                              methods=['GET'])
+
+    def __ingest(self, context, job: IngestionJob):
+        job.add_paragraphs(text_util.count_paragraphs(context))
+
+        return self.__ingest_paragraphs(self.__pack(text_util.iter_clean_paragraphs(context)),
+                                        job)
+
+    @staticmethod
+    def __pack(cleaned_paragraphs):
+        """
+        Groups the cleaned paragraphs that are embedded together. Every paragraph is a group
+        of its own unless IngestionConfig.pack_paragraphs is enabled.
+        """
+        if not ingestion_config.pack_paragraphs:
+            return ([cleaned_text] for cleaned_text in cleaned_paragraphs)
+
+        return text_util.iter_packed_paragraphs(cleaned_paragraphs,
+                                                ingestion_config.pack_max_words,
+                                                ingestion_config.pack_boundary_pattern)
+
+    def __ingest_paragraphs(self, paragraph_groups, job: IngestionJob, flush_records=None):
+        """
+        Embeds the groups of cleaned paragraphs and persists their chunks. The chunks are
+        persisted at the end in a single transaction, or every flush_records chunks if given.
+        """
+        inserted = 0
+        embedding_records = []
+
+        for paragraphs in paragraph_groups:
+            embeddings = self.models.get_embeddings(
+                ingestion_config.pack_separator.join(paragraphs))
+            embedding_records.extend(embeddings)
+            job.advance(len(embeddings), len(paragraphs))
+
+            if flush_records and len(embedding_records) >= flush_records:
+                inserted += self.__persist(embedding_records, job)
+                embedding_records = []
+
+        if embedding_records:
+            inserted += self.__persist(embedding_records, job)
 
-    def __persist(self, embedding_record):
-        chunk_id = embedding_record[0]
-        start_word = embedding_record[1]
-        end_word = embedding_record[2]
-        chunk = embedding_record[3]
-        embedding = embedding_record[4]
+        return inserted
 
-        db_manager.execute(stmt="""
-                        INSERT INTO qa_embeddings (chunk_id, start_word, end_word, context, embedding)
-                        VALUES (%s, %s, %s, %s, %s)
-                        """, stmt_vars=(chunk_id, start_word, end_word, chunk, embedding))
+    def __persist(self, embedding_records, job: IngestionJob):
+        inserted = vector_store.persist_contexts(embedding_records)
+        job.record_persisted(inserted, len(embedding_records) - inserted)
+        chunks_total.inc(inserted, outcome="inserted")
+        chunks_total.inc(len(embedding_records) - inserted, outcome="skipped")
+
+        if inserted:
+            self.models.clear_answer_cache()
+            vector_store.ensure_vector_index()
+
+        return inserted
+
+    @staticmethod
+    def __count_paragraphs(cleaned_paragraphs, job: IngestionJob):
+        for cleaned_text in cleaned_paragraphs:
+            job.add_paragraphs(1)
+            yield cleaned_text
+
+    def __iter_stream_paragraphs(self, lines, is_ndjson, job: IngestionJob):
+        """
+        Yields the groups of cleaned paragraphs of the request body lines. A plain text line is
+        a paragraph and the whole body is packed as one document. An NDJSON line is a document,
+        a JSON object with a context field or a JSON string, and is packed on its own.
+        """
+        if not is_ndjson:
+            yield from self.__pack(self.__count_paragraphs(
+                (cleaned_text for line in lines
+                 for cleaned_text in text_util.iter_clean_paragraphs(line)), job))
+            return
+
+        for line in lines:
+            if not line.strip():
+                continue
+
+            document = json.loads(line)
+            context = document.get('context') if isinstance(document, dict) else document
+
+            if not isinstance(context, str):
+                raise ValueError("An NDJSON line has no context.")
+
+            yield from self.__pack(self.__count_paragraphs(
+                text_util.iter_clean_paragraphs(context), job))
+
+    @staticmethod
+    def __is_async_request():
+        return request.args.get('async', '').lower() == 'true' \
+            or 'respond-async' in request.headers.get('Prefer', '')
 
     def save_context(self):
         """
@@ -48,36 +138,116 @@ class Context:
 
         This method:
         - Retrieves JSON data from the request.
-        - Splits the context into paragraphs.
-        - Cleans each paragraph.
-        - Generates embeddings for each cleaned paragraph.
-        - Checks if the context already exists in the database.
-        - Inserts new context data into the database if it does not already exist.
+        - Reads the cleaned paragraphs of the context one at a time.
+        - Packs consecutive short paragraphs together if IngestionConfig.pack_paragraphs is
+          enabled.
+        - Generates embeddings for each cleaned paragraph or pack.
+        - Inserts the embeddings that are not yet in the database in a single transaction.
+        - Clears the cached answers if new context data was inserted.
+
+        If the request has the async=true query parameter or a "Prefer: respond-async" header,
+        the work is queued as a background job instead.
 
         Returns:
-        Response: A Flask response object with status code 201.
+        Response: A Flask response object with status code 201 if new context data was saved,
+            200 if all of it already exists, 202 with the job if it was queued, 400 if the
+            context is missing, or 503 if the job queue is full.
         """
         data = request.get_json()
         context = data.get('context')
         created_status = 201
         success_status = 200
+        accepted_status = 202
         bad_request = 400
-        response_code = success_status if context else bad_request
-        paragraphs = text_util.split_by_paragraph(context)
+        service_unavailable = 503
 
-        for paragraph in paragraphs:
-            cleaned_text = text_util.clean_text(paragraph)
-            embeddings = model_manager.get_embeddings(cleaned_text)
+        if not context:
+            return make_response('', bad_request)
 
-            for embedding_record in embeddings:
-                chunk = embedding_record[3]
+        if self.__is_async_request():
+            try:
+                job = job_manager.submit(lambda ingestion_job: self.__ingest(context,
+                                                                             ingestion_job))
+            except JobQueueFullException as exception:
+                response = make_response(jsonify({'error': str(exception)}), service_unavailable)
+                response.headers['Retry-After'] = str(ingestion_config.retry_after)
+                return response
 
-                if is_existing_context(db_manager, chunk):
-                    continue
+            response = make_response(jsonify(job.to_dict()), accepted_status)
+            response.headers['Location'] = f'/api/v1/context/jobs/{job.job_id}'
+            return response
 
-                self.__persist(embedding_record)
+        inserted = self.__ingest(context, IngestionJob())
 
-                response_code = created_status
+        return make_response('', created_status if inserted else success_status)
 
-        return make_response('', response_code)
+    def stream_context(self):
+        """
+        Handles the PUT request to save a large context streamed in the request body.
+
+        The body is either plain text (text/plain), where every line is a paragraph, or NDJSON
+        (application/x-ndjson), where every line is a JSON object with a context field. It can
+        be sent with chunked transfer encoding. The paragraphs are cleaned and embedded as they
+        are read, and their chunks are persisted in batches, so the memory used does not grow
+        with the size of the body.
+
+        Returns:
+        Response: A Flask JSON response with the ingestion summary and status code 201 if new
+            context data was saved, 200 if all of it already exists, 400 if an NDJSON line is
+            invalid, 413 if an NDJSON line is too long, or 415 for other content types.
+        """
+        created_status = 201
+        success_status = 200
+        bad_request = 400
+        payload_too_large = 413
+        unsupported_media_type = 415
+
+        mimetype = request.mimetype
+        is_ndjson = mimetype in ('application/x-ndjson', 'application/jsonl')
+
+        if not is_ndjson and mimetype != 'text/plain':
+            return jsonify({'error': 'Use text/plain or application/x-ndjson.'}), \
+                unsupported_media_type
+
+        job = IngestionJob()
+        job.start()
+
+        lines = text_util.iter_stream_lines(request.stream, ingestion_config.stream_read_size,
+                                            ingestion_config.stream_max_line_size,
+                                            split_long_lines=not is_ndjson)
+
+        try:
+            inserted = self.__ingest_paragraphs(
+                self.__iter_stream_paragraphs(lines, is_ndjson, job), job,
+                flush_records=ingestion_config.stream_flush_records)
+        except LineTooLongException as exception:
+            job.fail(str(exception))
+            return jsonify(job.to_dict()), payload_too_large
+        except ValueError as exception:
+            job.fail(str(exception))
+            return jsonify(job.to_dict()), bad_request
+
+        job.complete()
+
+        return jsonify(job.to_dict()), created_status if inserted else success_status
+
+    def get_job(self, job_id):
+        """
+        Handles the GET request for the progress of an ingestion job.
+
+        Parameters:
+        job_id (str): The id returned when the job was queued.
+
+        Returns:
+        Response: A Flask JSON response with the job and status code 200, or 404 if the job is
+            unknown or expired.
+        """
+        job = job_manager.get_job(job_id)
+
+        if job is None:
+            not_found = 404
+            return jsonify({'error': 'Job not found.'}), not_found
+
+        success_status = 200
+        return jsonify(job.to_dict()), success_status
 # pylint: enable=R0903
@@ -0,0 +1,61 @@
+"""
+This module defines the Health class to handle the liveness and readiness endpoints.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+from flask import Flask, jsonify
+
+from query_ai.model import model_manager
+
+# pylint: disable=R0903
+class Health:
+    """
+    A class to report if the application is running and if it is ready to answer.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    def __init__(self, app: Flask, models=None):
+        """
+        Initializes the Health class with the given Flask app and sets up the URL rules.
+
+        Parameters:
+        app (Flask): The Flask application instance.
+        models (ModelMgr): The models answering the requests, or a ModelWorkerPool running
+            them. The model_manager is used if not provided.
+        """
+        self.app = app
+        self.models = models if models is not None else model_manager
+        self.app.add_url_rule('/api/v1/health', view_func=self.live, methods=['GET'])
+        self.app.add_url_rule('/api/v1/health/ready', view_func=self.ready, methods=['GET'])
+
+    def live(self):
+        """
+        Handles the GET request to check if the application is running.
+
+        Returns:
+        Response: A Flask JSON response with status code 200.
+        """
+        success_status = 200
+        return jsonify({'status': 'live'}), success_status
+
+    def ready(self):
+        """
+        Handles the GET request to check if the models are loaded and warmed up.
+
+        Returns:
+        Response: A Flask JSON response with status code 200 if the models are ready, or 503
+            with a Retry-After header while they are warming up.
+        """
+        if self.models.is_ready():
+            success_status = 200
+            return jsonify({'status': 'ready'}), success_status
+
+        service_unavailable = 503
+        retry_after = 5
+        return jsonify({'status': 'warming up'}), service_unavailable, \
+            {'Retry-After': str(retry_after)}
+# pylint: enable=R0903
@@ -0,0 +1,66 @@
+"""
+This module defines the Metrics class to expose the metrics of the application.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import time
+
+from flask import Flask, Response, g, request
+
+from query_ai.metrics import metrics, request_duration
+
+# pylint: disable=R0903
+class Metrics:
+    """
+    A class to expose the metrics in the Prometheus text format and to measure the duration of
+    every request.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    def __init__(self, app: Flask):
+        """
+        Initializes the Metrics class with the given Flask app, sets up the URL rule and the
+        hooks measuring the requests.
+
+        Parameters:
+        app (Flask): The Flask application instance.
+        """
+        self.app = app
+        self.app.add_url_rule('/metrics', view_func=self.get_metrics, methods=['GET'])
+        self.app.before_request(self.__start_timer)
+        self.app.after_request(self.__record_request)
+
+    @staticmethod
+    def __start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @staticmethod
+    def __record_request(response):
+        """
+        Records the duration of the request until its response is returned. The body of a
+        streamed response is sent afterward and is not included.
+        """
+        start = g.pop('metrics_start', None)
+
+        if start is not None:
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            request_duration.observe(time.perf_counter() - start, method=request.method,
+                                     endpoint=endpoint, status=str(response.status_code))
+
+        return response
+
+    def get_metrics(self):
+        """
+        Handles the GET request for the metrics.
+
+        Returns:
+        Response: The metrics in the Prometheus text exposition format with status code 200.
+        """
+        success_status = 200
+        return Response(metrics.render(), status=success_status,
+                        content_type=metrics.CONTENT_TYPE)
+# pylint: enable=R0903
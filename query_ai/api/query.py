@@ -5,10 +5,14 @@ Author: Ron Webb
 Since: 1.0.0
 """
 
-from flask import Flask, request, jsonify
+import json
+
+from flask import Flask, Response, request, jsonify, stream_with_context
 from werkzeug.exceptions import UnsupportedMediaType
 
-from query_ai.database import db_manager
+from query_ai.config import generator_config
+from query_ai.database import vector_store
+from query_ai.logger import get_logger
 from query_ai.model import model_manager
 
 # pylint: disable=R0903
@@ -20,26 +24,64 @@ class Query:
     Since: 1.0.0
     """
 
-    def __init__(self, app: Flask):
+    def __init__(self, app: Flask, models=None):
         """
         Initializes the Query class with the given Flask application instance.
 
         Parameters:
         app (Flask): The Flask application instance.
+        models (ModelMgr): The models answering the requests, or a ModelWorkerPool running
+            them. The model_manager is used if not provided.
         """
         self.app = app
+        self.models = models if models is not None else model_manager
         self.app.add_url_rule('/api/v1/query', view_func=self.query, methods=['POST'])
+        self.app.add_url_rule('/api/v1/query/batch', view_func=self.query_batch,
+                              methods=['POST'])
+
+    @staticmethod
+    def __is_event_stream_request():
+        return request.accept_mimetypes.best_match(['application/json',
+                                                    'text/event-stream']) == 'text/event-stream'
+
+    @staticmethod
+    def __format_event(name, data):
+        return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+    def __stream(self, question, context):
+        """
+        Streams the answer as server-sent events. See ModelMgr.stream_answer for the events.
+        """
+        if context:
+            events = self.models.stream_answer(question, provided_context=context)
+        else:
+            events = self.models.stream_answer(question, vector_store)
+
+        def generate():
+            try:
+                for name, data in events:
+                    yield self.__format_event(name, data)
+            except Exception: # pylint: disable=broad-exception-caught
+                get_logger(__name__).exception("Streaming the answer failed.")
+                yield self.__format_event('error', {'error': 'Error generating response.'})
+
+        return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
     def query(self):
         """
         Handles POST requests to the /api/v1/query endpoint.
 
         Expects a JSON payload with a 'question' field.
-        Uses the model_manager to generate an answer based on the question.
+        Uses the models to generate an answer based on the question.
         Returns a JSON response with the generated answer.
 
+        If the request accepts text/event-stream, the retrieved context, the validation
+        verdict and the tokens of the answer are streamed as server-sent events instead.
+
         Returns:
-        Response: A Flask JSON response containing the answer and a status code 200.
+        Response: A Flask JSON response containing the answer and a status code 200, or a
+            text/event-stream response.
         """
 
         try:
@@ -50,10 +92,13 @@ class Query:
             question = data.get('question')
             context = data.get('context')
 
+            if (context or question) and self.__is_event_stream_request():
+                return self.__stream(question, context)
+
             if context:
-                response = model_manager.generate_answer(question, provided_context=context)
+                response = self.models.generate_answer(question, provided_context=context)
             elif question:
-                response = model_manager.generate_answer(question, db_manager)
+                response = self.models.generate_answer(question, vector_store)
             else:
                 return jsonify(''), bad_request
 
@@ -66,4 +111,63 @@ class Query:
         except UnsupportedMediaType:
             unsupported_media_type = 415
             return jsonify({'error': 'Unsupported Media Type'}), unsupported_media_type
+
+    @staticmethod
+    def __parse_batch_item(item):
+        """
+        Gets the question and the optional context of a batch item, either a question or an
+        object with question and context fields. Returns None if the item is invalid.
+        """
+        if isinstance(item, str):
+            return item, None
+
+        if isinstance(item, dict) and isinstance(item.get('question'), str) \
+                and isinstance(item.get('context'), (str, type(None))):
+            return item['question'], item.get('context')
+
+        return None
+
+    def query_batch(self):
+        """
+        Handles POST requests to the /api/v1/query/batch endpoint.
+
+        Expects a JSON payload with a 'questions' list. Each item is a question, or an object
+        with a 'question' field and an optional 'context' field. The questions are answered
+        together by ModelMgr.generate_answers.
+
+        Returns:
+        Response: A Flask JSON response containing the answers in the order of the questions
+            and a status code 200, 400 if the questions are invalid, 413 if there are more than
+            GeneratorConfig.max_query_batch, or 415 if the payload is not JSON.
+        """
+
+        try:
+            success_status = 200
+            bad_request = 400
+            payload_too_large = 413
+            data = request.get_json()
+            items = data.get('questions') if isinstance(data, dict) else None
+
+            if not isinstance(items, list) or not items:
+                return jsonify({'error': 'The questions must be a non-empty list.'}), bad_request
+
+            if len(items) > generator_config.max_query_batch:
+                return jsonify({'error': f'At most {generator_config.max_query_batch} '
+                                         'questions are allowed.'}), payload_too_large
+
+            parsed = [self.__parse_batch_item(item) for item in items]
+
+            if any(item is None or not item[0] for item in parsed):
+                return jsonify({'error': 'Every item must have a question.'}), bad_request
+
+            questions = [question for question, _ in parsed]
+            results = self.models.generate_answers(
+                questions, vector_store, provided_contexts=[context for _, context in parsed])
+
+            return jsonify({'answers': [{'question': question, 'answer': result['generated_text']}
+                                        for question, result in zip(questions, results)]}), \
+                success_status
+        except UnsupportedMediaType:
+            unsupported_media_type = 415
+            return jsonify({'error': 'Unsupported Media Type'}), unsupported_media_type
 # pylint: enable=R0903
@@ -1,14 +1,35 @@
 """
 This module serves as the entry point for the Query AI application.
-It initializes the logger, creates a Flask application instance,
-registers all endpoints, and serves the application using Waitress.
+It initializes the logger, starts the model worker processes if configured,
+creates a Flask application instance, registers all endpoints, warms up the
+models in the background, serves the application using Waitress, and stops
+the model worker processes once it is stopped.
 """
 
+import threading
+import time
+
 from flask import Flask
 from waitress import serve
 
 from query_ai.api import endpoints
+from query_ai.config.server_config import ServerConfig
 from query_ai.logger import get_logger
+from query_ai.model import model_manager
+from query_ai.model.worker_pool import ModelWorkerPool
+
+def warmup():
+    """
+    Loads and warms up the models. The readiness endpoint reports 503 until it completes.
+    :return: None
+    """
+
+    logger = get_logger(__name__)
+
+    try:
+        model_manager.warmup()
+    except Exception: # pylint: disable=broad-exception-caught
+        logger.exception("Warming up the models failed.")
 
 def main():
     """
@@ -16,16 +37,41 @@ def main():
     :return: None
     """
 
+    start = time.perf_counter()
     logger = get_logger(__name__)
 
     logger.info("Query AI application")
 
+    server_config = ServerConfig()
+    models = model_manager
+
+    if server_config.get_workers() > 0:
+        # The workers are forked before any other thread is started.
+        models = ModelWorkerPool(model_manager, server_config.get_workers(),
+                                 server_config.get_worker_threads(),
+                                 server_config.is_pin_cores(),
+                                 server_config.get_worker_timeout(),
+                                 server_config.get_worker_concurrency())
+        models.start()
+
     app = Flask(__name__)
 
     for endpoint in endpoints:
-        endpoint(app)
+        endpoint(app, models)
+
+    if models is model_manager:
+        threading.Thread(target=warmup, name="query_ai_warmup", daemon=True).start()
+
+    logger.info("Started the application in %.2fs.", time.perf_counter() - start)
 
-    serve(app, host='0.0.0.0', port=5000)
+    try:
+        serve(app, host=server_config.get_host(), port=server_config.get_port(),
+              threads=server_config.get_threads(),
+              connection_limit=server_config.get_connection_limit(),
+              backlog=server_config.get_backlog())
+    finally:
+        if models is not model_manager:
+            models.shutdown()
 
 if __name__ == '__main__':
 
@@ -0,0 +1,23 @@
+"""
+This package contains the benchmarks of the application.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import json
+
+def write_results(path: str, results):
+    """
+    Writes the results of a benchmark as JSON.
+
+    :param path: The file to write to. Nothing is written if it is empty.
+    :param results: The results to write.
+    :return: None
+    """
+
+    if path:
+        with open(path, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+
+__all__ = ['write_results']
@@ -0,0 +1,133 @@
+"""
+This script compares the throughput of the embedding backends.
+
+The PyTorch backend is the baseline. For each backend, the latency of a single text and the
+throughput of batches are measured. The largest difference of the mean-pooled vectors from the
+baseline is also reported.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import argparse
+import time
+
+import torch
+from transformers import AutoTokenizer, AutoModel
+
+from query_ai.config import embedding_config
+from query_ai.model.embedding_backend import TorchEmbeddingBackend, OnnxEmbeddingBackend, \
+    onnx_model_path
+from query_ai.model.model_manager import mean_pooling
+from query_ai.benchmark import write_results
+
+TEXTS = [
+    "The sun is in the center of the solar system.",
+    "The quick brown fox jumps over the lazy dog.",
+    "Python was created by Guido van Rossum and first released in 1991.",
+    "Water boils at 100 degrees Celsius at sea level.",
+    "The Great Wall of China is over 21,000 kilometers long, and it was built over many "
+    "centuries to protect the northern borders of the Chinese states.",
+    "Photosynthesis converts light energy into chemical energy stored in glucose.",
+    "A vector database stores embeddings and finds the nearest neighbors of a query.",
+    "Mount Everest is the highest mountain above sea level.",
+]
+
+def embed(backend, tokenizer, texts):
+    """
+    Gets the mean-pooled embeddings of texts.
+
+    :param backend: The embedding backend.
+    :param tokenizer: The tokenizer of the model.
+    :param texts: The texts to embed.
+    :return: The embeddings.
+    """
+
+    inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True,
+                       max_length=embedding_config.token_length)
+    return mean_pooling(backend.last_hidden_state(inputs), inputs["attention_mask"])
+
+def throughput(backend, tokenizer, batch_size: int, repeat: int):
+    """
+    Measures the texts embedded per second.
+
+    :param backend: The embedding backend.
+    :param tokenizer: The tokenizer of the model.
+    :param batch_size: The number of texts per call.
+    :param repeat: The number of passes over the texts.
+    :return: The texts per second.
+    """
+
+    texts = (TEXTS * (batch_size // len(TEXTS) + 1))[:batch_size]
+    embed(backend, tokenizer, texts)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        embed(backend, tokenizer, texts)
+
+    return batch_size * repeat / (time.perf_counter() - start)
+
+def benchmark(backends, tokenizer, batch_sizes, repeat: int):
+    """
+    Measures each backend against the first one.
+
+    :param backends: The embedding backends by name. The first one is the baseline.
+    :param tokenizer: The tokenizer of the model.
+    :param batch_sizes: The batch sizes to measure.
+    :param repeat: The number of passes per measurement.
+    :return: The results by backend name.
+    """
+
+    baseline = None
+    results = {}
+
+    for name, backend in backends.items():
+        embeddings = embed(backend, tokenizer, TEXTS)
+        baseline = embeddings if baseline is None else baseline
+
+        results[name] = {
+            "single_text_latency": 1 / throughput(backend, tokenizer, 1, repeat * len(TEXTS)),
+            "texts_per_second": {str(batch_size): throughput(backend, tokenizer, batch_size,
+                                                             repeat)
+                                 for batch_size in batch_sizes},
+            "max_abs_difference": float((embeddings - baseline).abs().max()),
+        }
+
+    return results
+
+def main():
+    """
+    This function runs the benchmark of the embedding backends.
+    :return: None
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0].strip())
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="The number of passes per measurement.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32],
+                        help="The batch sizes to measure.")
+    parser.add_argument("--output", help="Writes the results as JSON to this file.")
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(embedding_config.model_name)
+    model = AutoModel.from_pretrained(embedding_config.model_name).eval()
+    backends = {
+        "torch": TorchEmbeddingBackend(model),
+        "onnx": OnnxEmbeddingBackend(model, tokenizer,
+                                     onnx_model_path(embedding_config.onnx_dir,
+                                                     embedding_config.model_name),
+                                     embedding_config.onnx_threads),
+    }
+
+    results = benchmark(backends, tokenizer, args.batch_sizes, args.repeat)
+
+    for name, result in results.items():
+        batches = ", ".join(f"batch {batch_size}: {rate:.0f} texts/s"
+                            for batch_size, rate in result["texts_per_second"].items())
+        print(f"{name}: single text {result['single_text_latency'] * 1000:.2f} ms, {batches}, "
+              f"max difference {result['max_abs_difference']:.2e}")
+
+    write_results(args.output, {"threads": torch.get_num_threads(), "results": results})
+
+if __name__ == "__main__":
+    main()
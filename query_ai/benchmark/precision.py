@@ -0,0 +1,242 @@
+"""
+This script reports the recall and the latency of the nearest context searches through the
+full, half and binary precision vector indexes of the configured database.
+
+The queries are stored embeddings with some noise. The exact nearest contexts, found with a
+sequential scan of the full precision embedding column, are the reference of the recall. The
+indexes missing for a precision are built for the benchmark and dropped afterward.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from query_ai.benchmark import write_results
+from query_ai.benchmark.suite import percentiles
+
+def sample_queries(db_manager, count: int, noise: float, seed: int):
+    """
+    Samples stored embeddings and adds gaussian noise to them.
+
+    :param db_manager: The database manager.
+    :param count: The number of queries.
+    :param noise: The standard deviation of the noise, relative to the norm of the embedding.
+    :param seed: The seed of the sampling and of the noise.
+    :return: The query embeddings.
+    """
+
+    def sample(___connection, cursor):
+        cursor.execute("SELECT setseed(%s)", (seed / 2 ** 31,))
+        cursor.execute("SELECT embedding::float4[] FROM qa_embeddings ORDER BY random() LIMIT %s",
+                       (count,))
+        return cursor.fetchall()
+
+    rows = db_manager.execute_in_transaction(sample)
+    generator = np.random.default_rng(seed)
+    queries = []
+
+    for (embedding,) in rows:
+        embedding = np.asarray(embedding, dtype=np.float32)
+        scale = noise * np.linalg.norm(embedding) / np.sqrt(embedding.size)
+        queries.append(embedding + generator.normal(0, scale, embedding.size).astype(np.float32))
+
+    return queries
+
+def exact_nearest_contexts(db_manager, embedding, limit: int):
+    """
+    Finds the nearest contexts with a sequential scan of the full precision embeddings.
+
+    :param db_manager: The database manager.
+    :param embedding: The embedding to search for.
+    :param limit: The maximum number of contexts to return.
+    :return: The (context, distance) rows, nearest first.
+    """
+
+    def search(___connection, cursor):
+        cursor.execute("SET LOCAL enable_indexscan = off")
+        cursor.execute("SELECT context, embedding <=> %(embedding)s AS distance "
+                       "FROM qa_embeddings ORDER BY distance LIMIT %(limit)s",
+                       {"embedding": embedding, "limit": limit})
+        return cursor.fetchall()
+
+    return db_manager.execute_in_transaction(search)
+
+def ensure_index(db_manager, precision: str):
+    """
+    Builds the index of a precision with the configured index type if it does not exist.
+
+    :param db_manager: The database manager.
+    :param precision: The precision of the index, i.e. full, half or binary.
+    :return: The name of the index and whether it was built.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    from query_ai.database.db_manager import DBMgr
+    from query_ai.database.vector_index import ivfflat_lists_for, vector_index_operand
+    # pylint: enable=import-outside-toplevel
+
+    index_config = db_manager.index_config
+    index_type = index_config.get_index_type()
+    index_name = DBMgr.vector_index_name(index_type, precision)
+
+    def fetch_one(___connection, cursor):
+        return cursor.fetchone()[0]
+
+    if db_manager.execute("SELECT to_regclass(%s) IS NOT NULL", fetch_one, (index_name,)):
+        return index_name, False
+
+    print(f"Building {index_name}.")
+
+    if index_type == "hnsw":
+        db_manager.execute(f"CREATE INDEX {index_name} ON qa_embeddings "
+                           f"USING hnsw ({vector_index_operand(precision)}) "
+                           "WITH (m = %s, ef_construction = %s)",
+                           stmt_vars=(index_config.get_hnsw_m(),
+                                      index_config.get_hnsw_ef_construction()))
+    else:
+        rows = db_manager.execute("SELECT count(*) FROM qa_embeddings", fetch_one)
+        db_manager.execute(f"CREATE INDEX {index_name} ON qa_embeddings "
+                           f"USING ivfflat ({vector_index_operand(precision)}) "
+                           "WITH (lists = %s)",
+                           stmt_vars=(index_config.get_ivfflat_lists()
+                                      or ivfflat_lists_for(rows),))
+
+    return index_name, True
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments, too-many-locals
+def measure(db_manager, precision: str, queries: list, expected: list, limit: int,
+            candidates: int):
+    """
+    Measures the recall and the latency of the searches of a precision.
+
+    :param db_manager: The database manager.
+    :param precision: The precision of the first search, i.e. full, half or binary.
+    :param queries: The query embeddings.
+    :param expected: The exact nearest contexts of each query.
+    :param limit: The number of contexts per query.
+    :param candidates: The number of candidates reranked by the half and binary searches.
+    :return: The measurements.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    from query_ai.database import find_nearest_contexts
+    # pylint: enable=import-outside-toplevel
+
+    index_config = db_manager.index_config
+    ef_search = None
+    settings = {}
+
+    if precision != "full":
+        candidates = max(candidates, limit)
+        settings = {"precision": precision, "candidates": candidates}
+        if index_config.get_index_type() == "hnsw" \
+                and candidates > index_config.get_hnsw_ef_search():
+            ef_search = candidates
+
+    durations = []
+    recalls = []
+
+    for query, exact in zip(queries, expected):
+        start = time.perf_counter()
+        found = find_nearest_contexts(db_manager, query, limit, ef_search=ef_search, **settings)
+        durations.append(time.perf_counter() - start)
+
+        exact_contexts = {context for context, _ in exact}
+        recalls.append(len(exact_contexts & {context for context, _ in found})
+                       / max(len(exact_contexts), 1))
+
+    return {"precision": precision, "candidates": settings.get("candidates"),
+            "recall": sum(recalls) / max(len(recalls), 1), **percentiles(durations)}
+# pylint: enable=too-many-arguments, too-many-positional-arguments, too-many-locals
+
+def index_size(db_manager, index_name: str):
+    """
+    Gets the size of an index.
+
+    :param db_manager: The database manager.
+    :param index_name: The name of the index.
+    :return: The size in bytes.
+    """
+
+    return db_manager.execute("SELECT pg_relation_size(to_regclass(%s))",
+                              lambda ___connection, cursor: cursor.fetchone()[0],
+                              (index_name,))
+
+# pylint: disable=too-many-locals
+def main():
+    """
+    This function runs the benchmark.
+    :return: None
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0].strip())
+    parser.add_argument("--queries", type=int, default=100, help="The number of queries.")
+    parser.add_argument("--limit", type=int, default=10,
+                        help="The number of nearest contexts per query, i.e. the k of recall@k.")
+    parser.add_argument("--candidates", type=int,
+                        help="The candidates reranked by the half and binary searches. "
+                             "Defaults to QA_DB_RERANK_CANDIDATES.")
+    parser.add_argument("--noise", type=float, default=0.1,
+                        help="The relative noise added to the sampled embeddings.")
+    parser.add_argument("--precisions", nargs="+", choices=("full", "half", "binary"),
+                        default=["full", "half", "binary"], help="The precisions to measure.")
+    parser.add_argument("--seed", type=int, default=42, help="The seed of the queries.")
+    parser.add_argument("--keep", action="store_true",
+                        help="Keeps the indexes built for the benchmark.")
+    parser.add_argument("--output", help="Writes the results as JSON to this file.")
+    args = parser.parse_args()
+
+    # pylint: disable=import-outside-toplevel
+    from query_ai.database import db_manager
+    from query_ai.database.db_manager import DBException
+    # pylint: enable=import-outside-toplevel
+
+    candidates = args.candidates or db_manager.index_config.get_rerank_candidates()
+    built = []
+
+    try:
+        queries = sample_queries(db_manager, args.queries, args.noise, args.seed)
+
+        if not queries:
+            print("The qa_embeddings table is empty.")
+            sys.exit(1)
+
+        start = time.perf_counter()
+        expected = [exact_nearest_contexts(db_manager, query, args.limit) for query in queries]
+        exact_latency = (time.perf_counter() - start) / len(queries)
+        results = {"queries": len(queries), "limit": args.limit,
+                   "exact_latency": exact_latency, "precisions": []}
+
+        print(f"exact: {exact_latency * 1000:.1f} ms per query")
+
+        for precision in args.precisions:
+            index_name, is_built = ensure_index(db_manager, precision)
+            if is_built:
+                built.append(index_name)
+
+            result = measure(db_manager, precision, queries, expected, args.limit, candidates)
+            result["index_size"] = index_size(db_manager, index_name)
+            results["precisions"].append(result)
+
+            print(f"{precision}: recall@{args.limit} {result['recall']:.3f}, "
+                  f"p50 {result['p50'] * 1000:.1f} ms, p99 {result['p99'] * 1000:.1f} ms, "
+                  f"index {result['index_size'] / 1024 / 1024:.1f} MB")
+
+        write_results(args.output, results)
+    except DBException as e:
+        print(f"The benchmark failed with error: {e}")
+        sys.exit(1)
+    finally:
+        if not args.keep:
+            for index_name in built:
+                db_manager.execute(f"DROP INDEX IF EXISTS {index_name}")
+        db_manager.close()
+# pylint: enable=too-many-locals
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+This script compares the fp32 models with their dynamic int8 quantized versions.
+
+Each precision is measured in its own process so that the resident set sizes do not mix. The
+latencies, the resident set size, the size of the model weights, and the agreement of the
+embeddings and answers with the fp32 baseline are reported.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+from query_ai.benchmark import write_results
+
+SAMPLES = [
+    ("The sun is in the center of the solar system.",
+     "What is in the center of the solar system?"),
+    ("The quick brown fox jumps over the lazy dog.",
+     "What jumps over the lazy dog?"),
+    ("Python was created by Guido van Rossum and first released in 1991.",
+     "Who created Python?"),
+    ("Water boils at 100 degrees Celsius at sea level.",
+     "At what temperature does water boil at sea level?"),
+    ("The Great Wall of China is over 21,000 kilometers long.",
+     "How long is the Great Wall of China?"),
+]
+
+def resident_set_size():
+    """
+    Gets the resident set size of the current process.
+
+    :return: The size in bytes, or None if it is not available on the platform.
+    """
+
+    try:
+        with open("/proc/self/statm", encoding="utf-8") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def model_size(model):
+    """
+    Gets the size of the serialized weights of a model.
+
+    :param model: The model to measure.
+    :return: The size in bytes.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+def timed(function, *args, **kwargs):
+    """
+    Calls a function and measures its duration.
+
+    :param function: The function to call.
+    :return: The result of the function and its duration in seconds.
+    """
+
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def measure(quantize: bool, repeat: int):
+    """
+    Loads the models with the requested precision and measures them with the samples.
+
+    :param quantize: Quantizes both models to int8.
+    :param repeat: The number of times each sample is processed.
+    :return: The measurements, embeddings and answers.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    from query_ai.model.model_manager import ModelMgr
+
+    rss_before = resident_set_size()
+    model_mgr, load_time = timed(ModelMgr, quantize_embedding=quantize,
+                                 quantize_generator=quantize)
+    rss_after = resident_set_size()
+
+    outputs = {"embeddings": [], "answers": []}
+    timings = {"embedding": [], "answer": []}
+
+    for iteration in range(repeat):
+        model_mgr.embedding_cache.clear()
+        model_mgr.clear_answer_cache()
+
+        for context, question in SAMPLES:
+            embedding, duration = timed(model_mgr.get_embedding, context)
+            timings["embedding"].append(duration)
+
+            answer, duration = timed(model_mgr.generate_answer, question,
+                                     provided_context=context)
+            timings["answer"].append(duration)
+
+            if iteration == 0:
+                outputs["embeddings"].append(embedding.tolist())
+                outputs["answers"].append(answer[0]["generated_text"])
+
+    return {
+        "quantized": quantize,
+        "load_time": load_time,
+        "rss": rss_after,
+        "rss_delta": None if rss_before is None else rss_after - rss_before,
+        "embedding_model_size": model_size(model_mgr.embedding_model),
+        "generator_model_size": model_size(model_mgr.generator_model),
+        "embedding_latency": sum(timings["embedding"]) / len(timings["embedding"]),
+        "answer_latency": sum(timings["answer"]) / len(timings["answer"]),
+        **outputs,
+    }
+
+def cosine_similarity(first, second):
+    """
+    Gets the cosine similarity of two vectors.
+
+    :param first: The first vector.
+    :param second: The second vector.
+    :return: The cosine similarity.
+    """
+
+    dot = sum(x * y for x, y in zip(first, second))
+    norm = (sum(x * x for x in first) ** 0.5) * (sum(y * y for y in second) ** 0.5)
+    return dot / norm if norm else 0.0
+
+def compare(baseline, candidate):
+    """
+    Compares the measurements of the quantized models with the fp32 baseline.
+
+    :param baseline: The fp32 measurements.
+    :param candidate: The int8 measurements.
+    :return: The comparison.
+    """
+
+    similarities = [cosine_similarity(first, second) for first, second
+                    in zip(baseline["embeddings"], candidate["embeddings"])]
+    matches = [first == second for first, second
+               in zip(baseline["answers"], candidate["answers"])]
+
+    return {
+        "embedding_speedup": baseline["embedding_latency"] / candidate["embedding_latency"],
+        "answer_speedup": baseline["answer_latency"] / candidate["answer_latency"],
+        "embedding_model_size_ratio": candidate["embedding_model_size"]
+                                      / baseline["embedding_model_size"],
+        "generator_model_size_ratio": candidate["generator_model_size"]
+                                      / baseline["generator_model_size"],
+        "min_embedding_cosine_similarity": min(similarities),
+        "mean_embedding_cosine_similarity": sum(similarities) / len(similarities),
+        "answer_agreement": sum(matches) / len(matches),
+    }
+
+def run_isolated(quantize: bool, repeat: int):
+    """
+    Measures a precision in a child process.
+
+    :param quantize: Quantizes both models to int8.
+    :param repeat: The number of times each sample is processed.
+    :return: The measurements of the child process.
+    """
+
+    command = [sys.executable, "-m", "query_ai.benchmark.quantization", "--single",
+               "--repeat", str(repeat)]
+
+    if quantize:
+        command.append("--quantize")
+
+    completed = subprocess.run(command, check=True, capture_output=True, text=True)
+    return json.loads(completed.stdout.splitlines()[-1])
+
+def print_report(baseline, candidate, comparison):
+    """
+    Prints the measurements and the comparison.
+
+    :param baseline: The fp32 measurements.
+    :param candidate: The int8 measurements.
+    :param comparison: The comparison of both.
+    :return: None
+    """
+
+    megabyte = 1024 * 1024
+
+    for result in (baseline, candidate):
+        rss = "n/a" if result["rss"] is None else f"{result['rss'] / megabyte:.0f} MB"
+        print(f"{'int8' if result['quantized'] else 'fp32'}: "
+              f"load {result['load_time']:.2f}s, rss {rss}, "
+              f"embedding weights {result['embedding_model_size'] / megabyte:.0f} MB, "
+              f"generator weights {result['generator_model_size'] / megabyte:.0f} MB, "
+              f"embedding {result['embedding_latency'] * 1000:.1f} ms, "
+              f"answer {result['answer_latency'] * 1000:.1f} ms")
+
+    print(f"embedding speedup {comparison['embedding_speedup']:.2f}x, "
+          f"answer speedup {comparison['answer_speedup']:.2f}x")
+    print(f"embedding cosine similarity min {comparison['min_embedding_cosine_similarity']:.4f}, "
+          f"mean {comparison['mean_embedding_cosine_similarity']:.4f}")
+    print(f"answer agreement {comparison['answer_agreement']:.0%}")
+
+def main():
+    """
+    This function runs the benchmark of the quantized models against the fp32 baseline.
+    :return: None
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0].strip())
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="The number of times each sample is processed.")
+    parser.add_argument("--output", help="Writes the results as JSON to this file.")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--quantize", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(measure(args.quantize, args.repeat)))
+        return
+
+    baseline = run_isolated(False, args.repeat)
+    candidate = run_isolated(True, args.repeat)
+    comparison = compare(baseline, candidate)
+
+    print_report(baseline, candidate, comparison)
+
+    write_results(args.output, {"fp32": baseline, "int8": candidate, "comparison": comparison})
+
+if __name__ == "__main__":
+    main()
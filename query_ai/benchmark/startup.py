@@ -0,0 +1,107 @@
+"""
+This script measures how long the application takes to start.
+
+The time to import query_ai.application is measured in fresh processes. Then the application
+is started and the liveness and readiness endpoints are polled to measure the time until it
+accepts requests and the time until the models are warmed up.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from query_ai.benchmark import write_results
+
+def import_time(repeat: int):
+    """
+    Measures the time to import query_ai.application in fresh processes.
+
+    :param repeat: The number of processes to start.
+    :return: The fastest import time in seconds.
+    """
+
+    durations = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import query_ai.application"], check=True)
+        durations.append(time.perf_counter() - start)
+
+    return min(durations)
+
+def wait_for(url: str, deadline: float):
+    """
+    Polls a URL until it responds with status code 200.
+
+    :param url: The URL to poll.
+    :param deadline: The time.perf_counter value to give up at.
+    :return: True if the URL responded with status code 200 before the deadline.
+    """
+
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            pass
+
+        time.sleep(0.05)
+
+    return False
+
+def serve_time(base_url: str, timeout: float):
+    """
+    Starts the application and measures the time until it is live and ready.
+
+    :param base_url: The URL the application listens on.
+    :param timeout: The seconds to wait for the application to be ready.
+    :return: The seconds until live and until ready, None if not reached.
+    """
+
+    start = time.perf_counter()
+    deadline = start + timeout
+
+    with subprocess.Popen([sys.executable, "-m", "query_ai.application"]) as application:
+        try:
+            live = wait_for(f"{base_url}/api/v1/health", deadline)
+            live_time = time.perf_counter() - start if live else None
+            ready = live and wait_for(f"{base_url}/api/v1/health/ready", deadline)
+            ready_time = time.perf_counter() - start if ready else None
+        finally:
+            application.terminate()
+
+    return live_time, ready_time
+
+def main():
+    """
+    This function runs the startup benchmark.
+    :return: None
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0].strip())
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="The number of processes used to measure the import time.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000",
+                        help="The URL the application listens on.")
+    parser.add_argument("--timeout", type=float, default=600,
+                        help="The seconds to wait for the application to be ready.")
+    parser.add_argument("--output", help="Writes the results as JSON to this file.")
+    args = parser.parse_args()
+
+    results = {"import_time": import_time(args.repeat)}
+    results["live_time"], results["ready_time"] = serve_time(args.url, args.timeout)
+
+    for name, value in results.items():
+        print(f"{name}: {'n/a' if value is None else f'{value:.2f}s'}")
+
+    write_results(args.output, results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""
+This script measures the throughput and the latency of the ingestion and query paths and
+compares them with a stored baseline.
+
+The workloads are the text normalization (TextUtil.iter_clean_paragraphs), the chunk
+embeddings (ModelMgr.get_embeddings), the context ingestion (PUT /api/v1/context) and the
+answers (ModelMgr.generate_answer). They run without network access, either with tiny
+deterministic stub models built locally or with the configured models from the local cache,
+and either against the configured PostgreSQL database (e.g., the docker compose one) or a
+temporary memmap vector store.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import argparse
+import json
+import os
+import string
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from query_ai.benchmark import write_results
+
+STAGES = ("db_connect", "db_execute", "tokenize", "embedding_forward", "retrieval",
+          "validation", "generation")
+
+SENTENCES = [
+    "The quick brown fox jumps over the lazy dog near the river bank",
+    "Water boils at one hundred degrees at sea level",
+    "Python was created by Guido van Rossum and first released in 1991",
+    "The Great Wall of China is over twenty thousand kilometers long",
+    "A context is split into paragraphs that are embedded and stored",
+]
+
+STUB_WORDS = ["the", "quick", "brown", "fox", "is", "this", "test", "text", "what", "ai",
+              "context", "question", "answer", "user", "assistant", "system", "analyst",
+              "you", "are", "##s"]
+
+# pylint: disable=too-many-locals
+def build_stub_models(directory: str):
+    """
+    Builds tiny embedding and generator models with fixed random weights and saves them, so
+    that they can be loaded by name without network access.
+
+    :param directory: The directory to save the models to.
+    :return: The paths of the embedding model and of the generator model.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    import torch
+    from transformers import (BertConfig, BertModel, BertTokenizerFast, T5Config,
+                              T5ForConditionalGeneration)
+    # pylint: enable=import-outside-toplevel
+
+    vocabulary = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + list(string.ascii_lowercase) \
+        + list(string.digits) + list(string.punctuation) + STUB_WORDS
+    vocabulary_path = os.path.join(directory, "vocab.txt")
+
+    with open(vocabulary_path, "w", encoding="utf-8") as vocabulary_file:
+        vocabulary_file.write("\n".join(vocabulary))
+
+    tokenizer = BertTokenizerFast(vocabulary_path, model_max_length=512)
+    torch.manual_seed(0)
+    embedding_model = BertModel(BertConfig(vocab_size=len(vocabulary), hidden_size=32,
+                                           num_hidden_layers=1, num_attention_heads=2,
+                                           intermediate_size=37, max_position_embeddings=512))
+    generator_model = T5ForConditionalGeneration(T5Config(vocab_size=len(vocabulary), d_model=32,
+                                                          d_kv=8, d_ff=37, num_layers=1,
+                                                          num_heads=2, decoder_start_token_id=0,
+                                                          pad_token_id=0, eos_token_id=3))
+
+    paths = []
+
+    for name, model in (("embedding", embedding_model), ("generator", generator_model)):
+        path = os.path.join(directory, name)
+        model.save_pretrained(path)
+        tokenizer.save_pretrained(path)
+        paths.append(path)
+
+    return paths[0], paths[1]
+# pylint: enable=too-many-locals
+
+def generate_documents(count: int, paragraphs: int, run_id: str):
+    """
+    Generates documents made of short and long paragraphs. The run id makes the documents
+    unique, so that they are not skipped as duplicates by a previous run.
+
+    :param count: The number of documents.
+    :param paragraphs: The number of paragraphs per document.
+    :param run_id: A value unique to the run.
+    :return: The documents.
+    """
+
+    documents = []
+
+    for document in range(count):
+        lines = []
+
+        for paragraph in range(paragraphs):
+            sentence = SENTENCES[(document + paragraph) % len(SENTENCES)]
+            repeat = 1 + (paragraph % 4) * 5
+            lines.append(f"<p>Document {run_id} {document} part {paragraph}.</p> "
+                         + " ".join([sentence] * repeat) + ".")
+
+        documents.append("\n".join(lines))
+
+    return documents
+
+def percentiles(durations: list):
+    """
+    Gets the median and the 99th percentile of durations by nearest rank.
+
+    :param durations: The durations in seconds.
+    :return: A dictionary with the p50 and p99 keys.
+    """
+
+    if not durations:
+        return {"p50": None, "p99": None}
+
+    ordered = sorted(durations)
+
+    def rank(quantile):
+        return ordered[min(len(ordered) - 1, max(0, int(np.ceil(quantile * len(ordered))) - 1))]
+
+    return {"p50": rank(0.5), "p99": rank(0.99)}
+
+def run_workload(name: str, items: list, operation):
+    """
+    Runs an operation on every item and measures the throughput, the latency of each item,
+    and the latency of each stage recorded in the metrics.
+
+    :param name: The name of the workload.
+    :param items: The items to process.
+    :param operation: Receives an item and returns the number of chunks it produced.
+    :return: The results of the workload.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    from query_ai.metrics import metrics, stage_duration
+    # pylint: enable=import-outside-toplevel
+
+    metrics.reset()
+    durations = []
+    chunks = 0
+    start = time.perf_counter()
+
+    for item in items:
+        item_start = time.perf_counter()
+        chunks += operation(item) or 0
+        durations.append(time.perf_counter() - item_start)
+
+    elapsed = time.perf_counter() - start
+    result = {"items": len(items), "seconds": elapsed,
+              "items_per_sec": len(items) / elapsed if elapsed else None}
+
+    if chunks:
+        result["chunks"] = chunks
+        result["chunks_per_sec"] = chunks / elapsed if elapsed else None
+
+    result.update(percentiles(durations))
+    result["stages"] = {stage: {"p50": stage_duration.quantile(0.5, stage=stage),
+                                "p99": stage_duration.quantile(0.99, stage=stage)}
+                        for stage in STAGES if stage_duration.get(stage=stage)[0]}
+
+    print(f"{name}: {len(items)} items in {elapsed:.2f}s, "
+          f"{result['items_per_sec'] or 0:.1f}/s, p50 {result['p50'] or 0:.4f}s, "
+          f"p99 {result['p99'] or 0:.4f}s"
+          + (f", {chunks} chunks, {result['chunks_per_sec']:.1f} chunks/s" if chunks else ""))
+
+    return result
+
+def run_workloads(documents: list, questions: list):
+    """
+    Runs the text normalization, embedding, ingestion and answering workloads.
+
+    :param documents: The documents to normalize, embed and ingest.
+    :param questions: The questions to answer from the ingested documents.
+    :return: The results of each workload by name.
+    """
+
+    # pylint: disable=import-outside-toplevel
+    from flask import Flask
+    from query_ai.api.context import Context
+    from query_ai.database import vector_store
+    from query_ai.metrics import chunks_total
+    from query_ai.model import model_manager
+    from query_ai.util import text_util
+    # pylint: enable=import-outside-toplevel
+
+    app = Flask(__name__)
+    Context(app)
+    client = app.test_client()
+
+    def ingest(document):
+        before = chunks_total.get(outcome="inserted") + chunks_total.get(outcome="skipped")
+        response = client.put("/api/v1/context", json={"context": document})
+
+        if response.status_code not in (200, 201):
+            raise RuntimeError(f"The ingestion failed with status {response.status_code}.")
+
+        return chunks_total.get(outcome="inserted") + chunks_total.get(outcome="skipped") \
+            - before
+
+    def clean(document):
+        for _ in text_util.iter_clean_paragraphs(document):
+            pass
+
+    def answer(question):
+        model_manager.clear_answer_cache()
+        model_manager.generate_answer(question, vector_store)
+
+    return {
+        "clean_text": run_workload("clean_text", documents, clean),
+        "get_embeddings": run_workload(
+            "get_embeddings", documents,
+            lambda document: sum(len(model_manager.get_embeddings(paragraph))
+                                 for paragraph in text_util.iter_clean_paragraphs(document))),
+        "save_context": run_workload("save_context", documents, ingest),
+        "generate_answer": run_workload("generate_answer", questions, answer),
+    }
+
+def flatten(results: dict, prefix: str = ""):
+    """
+    Flattens the nested results into dotted keys, keeping the throughputs and latencies.
+
+    :param results: The nested results.
+    :param prefix: The prefix of the keys.
+    :return: The numeric results by dotted key.
+    """
+
+    flat = {}
+
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and (key.endswith("_per_sec") or key in ("p50",
+                                                                                      "p99")):
+            flat[name] = value
+
+    return flat
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """
+    Compares the results with a baseline. A throughput lower, or a latency higher, than the
+    baseline by more than the tolerance is a regression.
+
+    :param results: The workload results of this run.
+    :param baseline: The workload results of the baseline run.
+    :param tolerance: The allowed relative change, e.g. 0.2 for 20%.
+    :return: The comparison lines and the regressed keys.
+    """
+
+    current = flatten(results)
+    previous = flatten(baseline)
+    lines = []
+    regressions = []
+
+    for key in sorted(current.keys() & previous.keys()):
+        if not previous[key]:
+            continue
+
+        change = current[key] / previous[key] - 1
+        is_throughput = key.endswith("_per_sec")
+        regressed = change < -tolerance if is_throughput else change > tolerance
+
+        if regressed:
+            regressions.append(key)
+
+        lines.append(f"{key}: {previous[key]:.4g} -> {current[key]:.4g} ({change:+.1%})"
+                     + (" REGRESSION" if regressed else ""))
+
+    return lines, regressions
+
+def configure_models(models: str, directory: str):
+    """
+    Points the configuration to the models to benchmark before they are loaded.
+
+    :param models: stub for tiny deterministic models, or real for the configured ones.
+    :param directory: The directory to save the stub models to.
+    :return: None
+    """
+
+    # pylint: disable=import-outside-toplevel
+    from query_ai.config import embedding_config, generator_config
+    # pylint: enable=import-outside-toplevel
+
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+    if models == "stub":
+        embedding_config.model_name, generator_config.model_name = build_stub_models(directory)
+        embedding_config.backend = "torch"
+        generator_config.token_length = 32
+
+def main():
+    """
+    This function runs the benchmark suite.
+    :return: None
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0].strip())
+    parser.add_argument("--models", choices=("stub", "real"), default="stub",
+                        help="Tiny deterministic stub models, or the configured models.")
+    parser.add_argument("--store", choices=("memmap", "postgres"), default="memmap",
+                        help="A temporary memmap vector store, or the configured PostgreSQL "
+                             "database.")
+    parser.add_argument("--documents", type=int, default=20, help="The number of documents.")
+    parser.add_argument("--paragraphs", type=int, default=20,
+                        help="The number of paragraphs per document.")
+    parser.add_argument("--queries", type=int, default=20, help="The number of questions.")
+    parser.add_argument("--output", help="Writes the results as JSON to this file.")
+    parser.add_argument("--baseline", help="Compares the results with this JSON file.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="The relative change allowed before a regression is reported.")
+    args = parser.parse_args()
+
+    run_id = uuid.uuid4().hex[:8]
+    documents = generate_documents(args.documents, args.paragraphs, run_id)
+    questions = [f"What is part {index} of document {run_id} {index % args.documents}?"
+                 for index in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        configure_models(args.models, directory)
+
+        if args.store == "memmap":
+            os.environ["QA_VECTOR_STORE"] = "memmap"
+            os.environ["QA_VECTOR_STORE_DIR"] = os.path.join(directory, "vector_store")
+
+        workloads = run_workloads(documents, questions)
+
+    results = {"models": args.models, "store": args.store, "documents": args.documents,
+               "paragraphs": args.paragraphs, "queries": args.queries, "workloads": workloads}
+
+    write_results(args.output, results)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+
+        lines, regressions = compare(workloads, baseline["workloads"], args.tolerance)
+        print("\n".join(lines))
+
+        if regressions:
+            print(f"{len(regressions)} regressions beyond {args.tolerance:.0%}.")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+This script compares the streaming text normalization with the list-based one it replaced.
+
+A large context with HTML tags, emojis, mixed newline characters and blank lines is generated.
+Both implementations must produce the same cleaned paragraphs. Their duration and the peak
+memory allocated while they run are reported.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import argparse
+import re
+import time
+import tracemalloc
+
+from query_ai.util.text_util import TextUtil, EMOJI_CHARACTER_CLASS
+from query_ai.benchmark import write_results
+
+PARAGRAPHS = [
+    "<p>The quick brown fox 🦊 jumps over the <b>lazy</b> dog.</p>",
+    "  Water boils at 100 degrees Celsius at sea level 😊  ",
+    "<div class=\"note\">Python was created by Guido van Rossum 🐍 in 1991.</div>",
+    "The Great Wall of China is over 21,000 kilometers long 🚀🚀.",
+    "   ",
+]
+
+NEWLINES = ["\n", "\r\n", "\r", "\n\n"]
+
+def generate_text(size: int):
+    """
+    Generates a context of about size characters.
+
+    :param size: The number of characters to generate.
+    :return: The generated text.
+    """
+
+    parts = []
+    length = 0
+    index = 0
+
+    while length < size:
+        part = PARAGRAPHS[index % len(PARAGRAPHS)] + NEWLINES[index % len(NEWLINES)]
+        parts.append(part)
+        length += len(part)
+        index += 1
+
+    return "".join(parts)
+
+def legacy_clean_paragraphs(text: str):
+    """
+    Splits and cleans the text the way TextUtil did before it streamed the paragraphs.
+
+    :param text: The input text.
+    :return: The cleaned paragraphs.
+    """
+
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
+    cleaned = []
+
+    for paragraph in paragraphs:
+        paragraph = re.sub(r'<.*?>', '', paragraph)
+        emoji_pattern = re.compile(EMOJI_CHARACTER_CLASS, flags=re.UNICODE)
+        cleaned.append(emoji_pattern.sub(r'', paragraph))
+
+    return cleaned
+
+def measure(function, text: str):
+    """
+    Runs a normalization and measures its duration and peak memory.
+
+    :param function: Receives the text and returns an iterable of cleaned paragraphs.
+    :param text: The input text.
+    :return: The cleaned paragraphs, the seconds taken, and the peak bytes allocated.
+    """
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    checksum = 0
+    count = 0
+
+    for paragraph in function(text):
+        checksum = hash((checksum, paragraph))
+        count += 1
+
+    duration = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return (count, checksum), duration, peak
+
+def main():
+    """
+    This function runs the text normalization benchmark.
+    :return: None
+    """
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0].strip())
+    parser.add_argument("--megabytes", type=float, nargs="+", default=[1, 8, 32],
+                        help="The sizes of the generated contexts.")
+    parser.add_argument("--output", help="Writes the results as JSON to this file.")
+    args = parser.parse_args()
+
+    text_util = TextUtil()
+    results = []
+
+    for megabytes in args.megabytes:
+        text = generate_text(int(megabytes * 1024 * 1024))
+        legacy, legacy_time, legacy_peak = measure(legacy_clean_paragraphs, text)
+        streaming, streaming_time, streaming_peak = measure(text_util.iter_clean_paragraphs,
+                                                            text)
+
+        if legacy != streaming:
+            raise AssertionError("The streaming normalization changed the output.")
+
+        results.append({"megabytes": megabytes, "paragraphs": streaming[0],
+                        "legacy_time": legacy_time, "legacy_peak": legacy_peak,
+                        "streaming_time": streaming_time, "streaming_peak": streaming_peak})
+
+        print(f"{megabytes} MB, {streaming[0]} paragraphs: "
+              f"legacy {legacy_time:.3f}s peak {legacy_peak / 1024 / 1024:.1f} MB, "
+              f"streaming {streaming_time:.3f}s peak {streaming_peak / 1024 / 1024:.1f} MB")
+
+    write_results(args.output, results)
+
+if __name__ == "__main__":
+    main()
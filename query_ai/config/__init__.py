@@ -6,8 +6,10 @@ Since: 1.0.0
 """
 
 from query_ai.config.model_config import EmbeddingConfig, GeneratorConfig
+from query_ai.config.ingestion_config import IngestionConfig
 
 embedding_config=EmbeddingConfig()
 generator_config=GeneratorConfig()
+ingestion_config=IngestionConfig()
 
-__all__=['embedding_config', 'generator_config']
+__all__=['embedding_config', 'generator_config', 'ingestion_config']
@@ -8,6 +8,7 @@ Since: 1.0.0
 
 import os
 
+# pylint: disable=too-many-instance-attributes
 class DBConfig:
     """
     Configuration class for database settings.
@@ -27,6 +28,10 @@ class DBConfig:
         self.__port = os.getenv("QA_DB_PORT", "5432")
         self.__user = os.getenv("QA_DB_USERNAME", "postgres")
         self.__password = os.getenv("QA_DB_PASSWORD", "mypassword")
+        self.__min_pool_size = int(os.getenv("QA_DB_POOL_MIN_SIZE", "1"))
+        self.__max_pool_size = int(os.getenv("QA_DB_POOL_MAX_SIZE", "10"))
+        self.__pool_timeout = float(os.getenv("QA_DB_POOL_TIMEOUT", "30"))
+        self.__health_check_interval = float(os.getenv("QA_DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
 
     def get_database(self):
         """
@@ -67,3 +72,36 @@ class DBConfig:
         :return: The password of the database.
         """
         return self.__password
+
+    def get_min_pool_size(self):
+        """
+        Get the number of connections opened when the connection pool is created.
+
+        :return: The minimum size of the connection pool.
+        """
+        return self.__min_pool_size
+
+    def get_max_pool_size(self):
+        """
+        Get the maximum number of connections held by the connection pool.
+
+        :return: The maximum size of the connection pool.
+        """
+        return self.__max_pool_size
+
+    def get_pool_timeout(self):
+        """
+        Get the seconds to wait for a free connection from the connection pool.
+
+        :return: The connection pool timeout in seconds.
+        """
+        return self.__pool_timeout
+
+    def get_health_check_interval(self):
+        """
+        Get the seconds a pooled connection may stay idle before it is checked again.
+
+        :return: The health check interval in seconds.
+        """
+        return self.__health_check_interval
+# pylint: enable=too-many-instance-attributes
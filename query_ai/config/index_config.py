@@ -0,0 +1,129 @@
+"""
+This module contains the IndexConfig class which is used to load the settings of the vector
+index from environment variables.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import os
+
+# pylint: disable=too-many-instance-attributes
+class IndexConfig:
+    """
+    Configuration class for the approximate nearest neighbor index of the embeddings.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    def __init__(self):
+        """
+        Initialize the IndexConfig object by loading the settings from environment variables.
+        """
+
+        self.__index_type = os.getenv("QA_DB_INDEX_TYPE", "hnsw").lower()
+        self.__deferred = os.getenv("QA_DB_INDEX_DEFERRED", "false").lower() == "true"
+        self.__hnsw_m = int(os.getenv("QA_DB_HNSW_M", "16"))
+        self.__hnsw_ef_construction = int(os.getenv("QA_DB_HNSW_EF_CONSTRUCTION", "64"))
+        self.__hnsw_ef_search = int(os.getenv("QA_DB_HNSW_EF_SEARCH", "40"))
+        self.__ivfflat_lists = int(os.getenv("QA_DB_IVFFLAT_LISTS", "0"))
+        self.__ivfflat_probes = int(os.getenv("QA_DB_IVFFLAT_PROBES", "10"))
+        self.__ivfflat_min_rows = int(os.getenv("QA_DB_IVFFLAT_MIN_ROWS", "1000"))
+        self.__ivfflat_rebuild_growth = float(os.getenv("QA_DB_IVFFLAT_REBUILD_GROWTH", "2"))
+        self.__embedding_precision = os.getenv("QA_DB_EMBEDDING_PRECISION", "full").lower()
+        self.__rerank_candidates = int(os.getenv("QA_DB_RERANK_CANDIDATES", "40"))
+
+    def get_index_type(self):
+        """
+        Get the type of the vector index.
+
+        :return: The index type, i.e. hnsw, ivfflat or none.
+        """
+        return self.__index_type
+
+    def is_deferred(self):
+        """
+        Check if building the vector index is left to rebuild_vector_index, e.g. after a bulk
+        load.
+
+        :return: True if the index is not built automatically.
+        """
+        return self.__deferred
+
+    def get_hnsw_m(self):
+        """
+        Get the maximum number of connections per layer of the HNSW index.
+
+        :return: The m parameter of the HNSW index.
+        """
+        return self.__hnsw_m
+
+    def get_hnsw_ef_construction(self):
+        """
+        Get the size of the candidate list used to build the HNSW index.
+
+        :return: The ef_construction parameter of the HNSW index.
+        """
+        return self.__hnsw_ef_construction
+
+    def get_hnsw_ef_search(self):
+        """
+        Get the size of the candidate list used to search the HNSW index.
+
+        :return: The default hnsw.ef_search setting.
+        """
+        return self.__hnsw_ef_search
+
+    def get_ivfflat_lists(self):
+        """
+        Get the number of lists of the IVFFlat index.
+
+        :return: The lists parameter of the IVFFlat index, or 0 to derive it from the number
+            of rows.
+        """
+        return self.__ivfflat_lists
+
+    def get_ivfflat_probes(self):
+        """
+        Get the number of lists searched in the IVFFlat index.
+
+        :return: The default ivfflat.probes setting.
+        """
+        return self.__ivfflat_probes
+
+    def get_ivfflat_min_rows(self):
+        """
+        Get the number of rows needed before the IVFFlat index is built.
+
+        :return: The minimum number of rows to train the IVFFlat index on.
+        """
+        return self.__ivfflat_min_rows
+
+    def get_ivfflat_rebuild_growth(self):
+        """
+        Get how many times the rows the IVFFlat index was built with the table may grow to
+        before a rebuild is asked for, so that its lists are trained again and sized for the
+        table.
+
+        :return: The growth factor triggering the warning, or 0 to never warn.
+        """
+        return self.__ivfflat_rebuild_growth
+
+    def get_embedding_precision(self):
+        """
+        Get the precision of the embeddings searched through the vector index. The nearest
+        candidates of a half or binary search are reranked with the full precision embeddings.
+
+        :return: The precision, i.e. full, half or binary.
+        """
+        return self.__embedding_precision
+
+    def get_rerank_candidates(self):
+        """
+        Get the number of candidates of a half or binary search that are reranked.
+
+        :return: The number of nearest candidates reranked with the full precision embeddings.
+        """
+        return self.__rerank_candidates
+# pylint: enable=too-many-instance-attributes
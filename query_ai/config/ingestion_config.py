@@ -0,0 +1,25 @@
+"""
+This file contains the configuration for the ingestion of contexts.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+#pylint: disable=too-few-public-methods
+class IngestionConfig:
+    """
+    Configuration class for the ingestion of contexts.
+    """
+
+    job_workers = 2
+    job_queue_size = 16
+    job_retention = 3600
+    retry_after = 5
+    stream_read_size = 65536
+    stream_max_line_size = 1048576
+    stream_flush_records = 256
+    pack_paragraphs = False
+    pack_max_words = 250
+    pack_boundary_pattern = None
+    pack_separator = "\n"
+#pylint: enable=too-few-public-methods
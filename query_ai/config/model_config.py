@@ -15,6 +15,15 @@ class EmbeddingConfig:
     token_length = 384
     db_record_chunk_size = 300
     db_record_overlap = 50
+    chunking = "words"
+    db_record_token_stride = 64
+    batch_size = 32
+    cache_size = 1024
+    cache_ttl = 3600
+    quantize = False
+    backend = "torch"
+    onnx_dir = "onnx"
+    onnx_threads = 0
 
 class GeneratorConfig:
     """
@@ -23,4 +32,13 @@ class GeneratorConfig:
 
     model_name = "google/flan-t5-large"
     token_length = 512
+    answer_cache_size = 256
+    answer_cache_ttl = 600
+    validation_mode = "logits"
+    validation_threshold = 0.5
+    validation_temperature = 1.0
+    max_batch_size = 8
+    max_batch_wait = 0.01
+    max_query_batch = 256
+    quantize = False
 #pylint: enable=too-few-public-methods
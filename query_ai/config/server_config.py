@@ -0,0 +1,146 @@
+"""
+This module contains the ServerConfig class which is used to load the settings of the HTTP
+server and of its admission control from environment variables.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import os
+
+# pylint: disable=too-many-instance-attributes
+class ServerConfig:
+    """
+    Configuration class for the HTTP server and the limits of concurrent requests.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    def __init__(self):
+        """
+        Initialize the ServerConfig object by loading the settings from environment variables.
+        """
+
+        self.__host = os.getenv("QA_SERVER_HOST", "0.0.0.0")
+        self.__port = int(os.getenv("QA_SERVER_PORT", "5000"))
+        self.__threads = int(os.getenv("QA_SERVER_THREADS", "16"))
+        self.__connection_limit = int(os.getenv("QA_SERVER_CONNECTION_LIMIT", "100"))
+        self.__backlog = int(os.getenv("QA_SERVER_BACKLOG", "1024"))
+        self.__retry_after = int(os.getenv("QA_SERVER_RETRY_AFTER", "5"))
+        self.__workers = int(os.getenv("QA_SERVER_WORKERS", "0"))
+        self.__worker_threads = int(os.getenv("QA_SERVER_WORKER_THREADS", "0"))
+        self.__pin_cores = os.getenv("QA_SERVER_PIN_CORES", "true").lower() == "true"
+        self.__worker_timeout = float(os.getenv("QA_SERVER_WORKER_TIMEOUT", "300"))
+        self.__worker_concurrency = int(os.getenv("QA_SERVER_WORKER_CONCURRENCY", "0"))
+        self.__limits = {
+            "query": (int(os.getenv("QA_QUERY_MAX_CONCURRENT", "2")),
+                      int(os.getenv("QA_QUERY_MAX_QUEUED", "8")),
+                      float(os.getenv("QA_QUERY_QUEUE_TIMEOUT", "5"))),
+            "context": (int(os.getenv("QA_CONTEXT_MAX_CONCURRENT", "1")),
+                        int(os.getenv("QA_CONTEXT_MAX_QUEUED", "2")),
+                        float(os.getenv("QA_CONTEXT_QUEUE_TIMEOUT", "5"))),
+        }
+
+    def get_host(self):
+        """
+        Get the address the server listens on.
+
+        :return: The host of the server.
+        """
+        return self.__host
+
+    def get_port(self):
+        """
+        Get the port the server listens on.
+
+        :return: The port of the server.
+        """
+        return self.__port
+
+    def get_threads(self):
+        """
+        Get the number of threads handling the requests. It should exceed the concurrent and
+        queued requests of all the limits, so that the other endpoints are still served.
+
+        :return: The number of worker threads of the server.
+        """
+        return self.__threads
+
+    def get_connection_limit(self):
+        """
+        Get the number of connections the server accepts at the same time.
+
+        :return: The maximum number of open connections.
+        """
+        return self.__connection_limit
+
+    def get_backlog(self):
+        """
+        Get the number of connections waiting to be accepted by the server.
+
+        :return: The listen backlog of the server socket.
+        """
+        return self.__backlog
+
+    def get_retry_after(self):
+        """
+        Get the seconds a rejected client is told to wait before retrying.
+
+        :return: The value of the Retry-After header of the rejected requests.
+        """
+        return self.__retry_after
+
+    def get_workers(self):
+        """
+        Get the number of model worker processes.
+
+        :return: The number of worker processes running the models, or 0 to run them in the
+            server process.
+        """
+        return self.__workers
+
+    def get_worker_threads(self):
+        """
+        Get the number of torch threads of each model worker process.
+
+        :return: The torch threads per worker, or 0 for the number of cores of its core set.
+        """
+        return self.__worker_threads
+
+    def is_pin_cores(self):
+        """
+        Check if each model worker process is pinned to its own set of cores.
+
+        :return: True if the workers are pinned to their core sets.
+        """
+        return self.__pin_cores
+
+    def get_worker_timeout(self):
+        """
+        Get the seconds to wait for a model worker to answer a call, or to send the next event
+        of a streamed answer.
+
+        :return: The seconds before the call fails.
+        """
+        return self.__worker_timeout
+
+    def get_worker_concurrency(self):
+        """
+        Get the number of calls each model worker process runs at the same time, so that its
+        concurrent generations are batched together.
+
+        :return: The concurrent calls per worker, or 0 for the maximum generator batch size.
+        """
+        return self.__worker_concurrency
+
+    def get_limit(self, name: str):
+        """
+        Get the limit of the concurrent requests of a group of endpoints.
+
+        :param name: The name of the limit, i.e. query or context.
+        :return: The maximum number of concurrent requests, 0 for no limit, the maximum number
+            of requests waiting for their turn, and the seconds they may wait.
+        """
+        return self.__limits[name]
+# pylint: enable=too-many-instance-attributes
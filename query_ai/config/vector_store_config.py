@@ -0,0 +1,42 @@
+"""
+This module contains the VectorStoreConfig class which is used to select the store of the
+embeddings from environment variables.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import os
+
+class VectorStoreConfig:
+    """
+    Configuration class for the store of the embeddings.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    def __init__(self):
+        """
+        Initialize the VectorStoreConfig object by loading the settings from environment
+        variables.
+        """
+
+        self.__store_type = os.getenv("QA_VECTOR_STORE", "postgres").lower()
+        self.__directory = os.getenv("QA_VECTOR_STORE_DIR", "vector_store")
+
+    def get_store_type(self):
+        """
+        Get the type of the vector store.
+
+        :return: The store type, i.e. postgres or memmap.
+        """
+        return self.__store_type
+
+    def get_directory(self):
+        """
+        Get the directory of the files of the memmap vector store.
+
+        :return: The directory of the memmap vector store.
+        """
+        return self.__directory
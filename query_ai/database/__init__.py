@@ -6,8 +6,12 @@ Author: Ron Webb
 Since: 1.0.0
 """
 
-from .db_manager import DBMgr, is_existing_context, DBException
+from .db_manager import DBMgr, is_existing_context, persist_contexts, find_nearest_contexts, \
+    find_nearest_contexts_batch, DBException
+from .vector_store import VectorStore, MemmapVectorStore, create_vector_store
 from ..config.db_config import DBConfig
+from ..config.index_config import IndexConfig
+from ..config.vector_store_config import VectorStoreConfig
 from ..logger import get_logger
 
 logger = get_logger(__name__)
@@ -19,7 +23,19 @@ db_manager = DBMgr(
     user=db_config.get_user(),
     password=db_config.get_password(),
     host=db_config.get_host(),
-    port=db_config.get_port()
+    port=db_config.get_port(),
+    min_pool_size=db_config.get_min_pool_size(),
+    max_pool_size=db_config.get_max_pool_size(),
+    pool_timeout=db_config.get_pool_timeout(),
+    health_check_interval=db_config.get_health_check_interval(),
+    index_config=IndexConfig()
 )
 
-__all__ = ['db_manager', 'is_existing_context', 'DBMgr']
+vector_store_config = VectorStoreConfig()
+
+vector_store = create_vector_store(vector_store_config.get_store_type(), db_manager,
+                                   vector_store_config.get_directory())
+
+__all__ = ['db_manager', 'vector_store', 'is_existing_context', 'persist_contexts',
+           'find_nearest_contexts', 'find_nearest_contexts_batch', 'DBMgr', 'VectorStore',
+           'MemmapVectorStore']
@@ -4,18 +4,32 @@ A module to manage database connections and operations for a PostgreSQL database
 Author: Ron Webb
 Since: 1.0.0
 """
+import hashlib
 import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 
 import psycopg2
 from pgvector.psycopg2 import register_vector
-from psycopg2 import ProgrammingError
+from psycopg2.extras import execute_values
 
 from query_ai.config import embedding_config
+from query_ai.config.index_config import IndexConfig
+from query_ai.database.vector_index import ivfflat_lists_for, search_distance, \
+    vector_index_operand
+from query_ai.database.vector_store import VectorStore
 from query_ai.logger import get_logger
+from query_ai.metrics import stage_duration
 
-class DBMgr:
+VECTOR_INDEX_TYPES = ("hnsw", "ivfflat")
+EMBEDDING_PRECISIONS = ("full", "half", "binary")
+
+# pylint: disable=too-many-instance-attributes
+class DBMgr(VectorStore):
     """
-    A class to manage database connections and operations for a PostgreSQL database.
+    A class to manage database connections and operations for a PostgreSQL database. It is
+    the postgres vector store, keeping the embeddings in the qa_embeddings table.
 
     Author: Ron Webb
     Since: 1.0.0
@@ -34,7 +48,9 @@ class DBMgr:
         return DBMgr.__is_db_initialized__
 
     # pylint: disable=too-many-arguments, too-many-positional-arguments
-    def __init__(self, dbname: str, user: str, password: str, host: str, port: int):
+    def __init__(self, dbname: str, user: str, password: str, host: str, port: int,
+                 min_pool_size: int = 1, max_pool_size: int = 10, pool_timeout: float = 30.0,
+                 health_check_interval: float = 30.0, index_config: IndexConfig = None):
         """
         Constructs all the necessary attributes for the DBMgr object.
 
@@ -44,37 +60,57 @@ class DBMgr:
             password (str): The password used to authenticate.
             host (str): The host address of the database.
             port (int): The port number to connect to.
+            min_pool_size (int): The number of connections opened when the pool is created.
+            max_pool_size (int): The maximum number of connections held by the pool.
+            pool_timeout (float): The seconds to wait for a free connection.
+            health_check_interval (float): The seconds a connection may stay idle before it is
+                checked again.
+            index_config (IndexConfig): The settings of the vector index. The environment
+                variables are read if not provided.
         """
         self.dbname = dbname
         self.user = user
         self.password = password
         self.host = host
         self.port = port
+        self.min_pool_size = min_pool_size
+        self.max_pool_size = max_pool_size
+        self.pool_timeout = pool_timeout
+        self.health_check_interval = health_check_interval
+        self.index_config = index_config if index_config is not None else IndexConfig()
         self.log = get_logger(__name__)
+        self.__pool = None
+        self.__pool_lock = threading.Lock()
+        self.__index_lock = threading.Lock()
+        self.__outgrown_index = None
     # pylint: disable=too-many-arguments, too-many-positional-arguments
 
     def connect(self):
         """
         Establishes a connection to the PostgresSQL database.
 
+        The vector extension is registered on the new connection so that numpy arrays can be
+        passed as statement variables, and the configured ef_search and probes become the
+        defaults of its session.
+
         Returns:
             connection (psycopg2.extensions.connection): The database connection object if
             successful, None otherwise.
         """
         try:
-            connection = psycopg2.connect(
-                database=self.dbname,
-                user=self.user,
-                password=self.password,
-                host=self.host,
-                port=self.port
-            )
+            with stage_duration.time(stage="db_connect"):
+                connection = psycopg2.connect(
+                    database=self.dbname,
+                    user=self.user,
+                    password=self.password,
+                    host=self.host,
+                    port=self.port
+                )
 
             connection.autocommit = True
 
-            if DBMgr.__is_db_initialized() is False:
-                DBMgr.__set_db_initialized(True)
-                self.initialize()
+            self.__register_vector(connection)
+            self.__set_search_defaults(connection)
 
             return connection
         except psycopg2.Error as e:
@@ -82,10 +118,29 @@ class DBMgr:
             DBMgr.__set_db_initialized(False)
             return None
 
+    def __get_pool(self):
+        with self.__pool_lock:
+            if self.__pool is None:
+                self.__pool = ConnectionPool(self.connect,
+                                             min_size=self.min_pool_size,
+                                             max_size=self.max_pool_size,
+                                             timeout=self.pool_timeout,
+                                             health_check_interval=self.health_check_interval)
+            return self.__pool
+
+    def __initialize_once(self):
+        if DBMgr.__is_db_initialized() is False:
+            DBMgr.__set_db_initialized(True)
+            try:
+                self.initialize()
+            except DBException:
+                DBMgr.__set_db_initialized(False)
+                raise
+
     def execute(self, stmt: str, output_logic = lambda connection, cursor: None,
                 stmt_vars : tuple = None):
         """
-        Executes a given SQL statement.
+        Executes a given SQL statement using a pooled connection.
 
         Parameters:
             stmt (str): The SQL statement to execute.
@@ -95,33 +150,150 @@ class DBMgr:
         Returns:
             The result of the output_logic function.
         """
+        self.__initialize_once()
+
         try:
-            connection = self.connect()
-            try:
+            with self.__get_pool().connection() as connection, \
+                    stage_duration.time(stage="db_execute"):
                 cursor = connection.cursor()
-
-                try:
-                    cursor.execute(stmt, stmt_vars)
-                except ProgrammingError as prog_error:
-                    if "can't adapt type 'numpy.ndarray'" in str(prog_error):
-                        self.log.debug("Registering vector extension.")
-                        self.__register_vector()
-                        cursor.execute(stmt, stmt_vars)
-                    else:
-                        raise prog_error
+                cursor.execute(stmt, stmt_vars)
 
                 return output_logic(connection, cursor)
-            finally:
-                connection.close()
         except Exception as exception:
             raise DBException("Database error occurred.") from exception
 
-    def initialize(self):
+    def execute_in_transaction(self, logic):
         """
-        Initializes the database by creating necessary extensions and tables.
+        Runs several statements using a pooled connection inside a single transaction.
+
+        Parameters:
+            logic (function): A function receiving the connection and a cursor. The statements it
+                executes are committed when it returns and rolled back if it raises.
+
+        Returns:
+            The result of the logic function.
+        """
+        self.__initialize_once()
+
+        try:
+            with self.__get_pool().connection() as connection, \
+                    stage_duration.time(stage="db_execute"):
+                connection.autocommit = False
+                try:
+                    result = logic(connection, connection.cursor())
+                    connection.commit()
+                    return result
+                except Exception:
+                    connection.rollback()
+                    raise
+                finally:
+                    connection.autocommit = True
+        except Exception as exception:
+            raise DBException("Database error occurred.") from exception
+
+    def get_pool_stats(self):
         """
+        Gets the statistics of the connection pool.
+
+        Returns:
+            dict: The pool statistics. See ConnectionPool.get_stats.
+        """
+        return self.__get_pool().get_stats()
+
+    def close(self):
+        """
+        Closes all the pooled connections.
+        """
+        with self.__pool_lock:
+            if self.__pool is not None:
+                self.__pool.close()
+                self.__pool = None
+
+    def prepare(self):
+        """
+        Initializes the database and closes the pooled connections, so that the processes
+        forked afterward skip the initialization and open their own connections.
+        """
+        self.__initialize_once()
+        self.close()
+
+    def persist_contexts(self, embedding_records: list):
+        """
+        Inserts the embedding records that are not yet in the qa_embeddings table. See
+        persist_contexts.
+
+        Parameters:
+            embedding_records (list): The (chunk_id, start_word, end_word, chunk, embedding)
+                tuples.
+
+        Returns:
+            int: The number of inserted records.
+        """
+        return persist_contexts(self, embedding_records)
+
+    def find_nearest_contexts(self, embedding, limit: int = 1, ef_search: int = None,
+                              probes: int = None):
+        """
+        Finds the contexts nearest to an embedding by cosine distance. See
+        find_nearest_contexts.
+
+        Parameters:
+            embedding (numpy.ndarray): The embedding to search for.
+            limit (int): The maximum number of contexts to return.
+            ef_search (int): Overrides hnsw.ef_search for this query only.
+            probes (int): Overrides ivfflat.probes for this query only.
+
+        Returns:
+            list: The (context, distance) rows, nearest first.
+        """
+        return find_nearest_contexts(self, embedding, limit,
+                                     **self.__search_settings(limit, ef_search, probes))
+
+    def find_nearest_contexts_batch(self, embeddings: list, limit: int = 1,
+                                    ef_search: int = None, probes: int = None):
+        """
+        Finds the contexts nearest to several embeddings by cosine distance in a single query.
+        See find_nearest_contexts_batch.
+
+        Parameters:
+            embeddings (list): The numpy.ndarray embeddings to search for.
+            limit (int): The maximum number of contexts to return per embedding.
+            ef_search (int): Overrides hnsw.ef_search for this query only.
+            probes (int): Overrides ivfflat.probes for this query only.
+
+        Returns:
+            list: The (context, distance) rows of each embedding, nearest first, in the same
+                order as the embeddings.
+        """
+        return find_nearest_contexts_batch(self, embeddings, limit,
+                                           **self.__search_settings(limit, ef_search, probes))
+
+    def __search_settings(self, limit, ef_search, probes):
+        """
+        Gets the search settings of a query, and the precision and the number of candidates
+        to rerank of a search. The hnsw ef_search is raised to the number of candidates, an
+        HNSW scan returning at most ef_search rows.
+        """
+        settings = {key: value for key, value in (("ef_search", ef_search), ("probes", probes))
+                    if value is not None}
+        precision = self.index_config.get_embedding_precision()
+
+        if precision == "full":
+            return settings
+
+        candidates = max(self.index_config.get_rerank_candidates(), limit)
+        settings.update(precision=precision, candidates=candidates)
+
+        if self.index_config.get_index_type() == "hnsw" \
+                and candidates > settings.get("ef_search", self.index_config.get_hnsw_ef_search()):
+            settings["ef_search"] = candidates
+
+        return settings
 
-        self.__register_vector()
+    def initialize(self):
+        """
+        Initializes the database by creating necessary tables and indexes.
+        """
 
         self.execute("""
             CREATE TABLE IF NOT EXISTS qa_embeddings (id SERIAL PRIMARY KEY,
@@ -133,12 +305,440 @@ class DBMgr:
             )
             """, stmt_vars=(embedding_config.token_length,))
 
-        self.execute("CREATE INDEX IF NOT EXISTS embedding_idx ON qa_embeddings "
-                     "USING ivfflat(embedding)")
+        self.__migrate_content_hash()
+        self.__drop_stale_vector_indexes()
+        self.ensure_vector_index()
+
+    @staticmethod
+    def vector_index_name(index_type: str, precision: str = "full"):
+        """
+        Gets the name of the vector index of a type.
+
+        Parameters:
+            index_type (str): The index type, i.e. hnsw or ivfflat.
+            precision (str): The precision of the indexed embeddings, i.e. full, half or binary.
+
+        Returns:
+            str: The name of the index.
+        """
+        if precision == "full":
+            return f"qa_embeddings_embedding_{index_type}_idx"
+
+        return f"qa_embeddings_embedding_{precision}_{index_type}_idx"
+
+    def ensure_vector_index(self):
+        """
+        Builds the configured vector index if it does not exist yet.
+
+        Nothing is built when the index is deferred to rebuild_vector_index. An IVFFlat index
+        is only built once the table has enough rows to train its lists on, and it is reported
+        once the table outgrows them by the growth factor, but left to rebuild_vector_index.
+
+        Returns:
+            bool: True if the index exists.
+        """
+        index_type = self.index_config.get_index_type()
+
+        if index_type not in VECTOR_INDEX_TYPES or self.index_config.is_deferred():
+            return False
+
+        with self.__index_lock:
+            index_name = DBMgr.vector_index_name(index_type,
+                                                 self.index_config.get_embedding_precision())
+
+            if self.__has_index(index_name):
+                if index_type == "ivfflat":
+                    self.__is_outgrown(index_name)
+
+                return True
+
+            return self.__create_vector_index(index_type,
+                                              self.index_config.get_ivfflat_min_rows())
+
+    def rebuild_vector_index(self):
+        """
+        Builds the configured vector index again, even if it is deferred, e.g. after a bulk load
+        or once an IVFFlat index is outgrown. The new index is built concurrently under another
+        name and then replaces the current one, which the searches use in the meantime.
+
+        Returns:
+            bool: True if the index was built.
+        """
+        index_type = self.index_config.get_index_type()
+
+        if index_type not in VECTOR_INDEX_TYPES:
+            return False
+
+        index_name = DBMgr.vector_index_name(index_type,
+                                             self.index_config.get_embedding_precision())
+        new_index_name, old_index_name = index_name + "_new", index_name + "_old"
+
+        with self.__index_lock:
+            # Left by an interrupted rebuild
+            self.execute("DROP INDEX CONCURRENTLY IF EXISTS " + new_index_name)
+            self.execute("DROP INDEX CONCURRENTLY IF EXISTS " + old_index_name)
+
+            if not self.__create_vector_index(index_type, 1, new_index_name):
+                return False
+
+            self.execute_in_transaction(lambda ___connection, cursor: cursor.execute(
+                f"ALTER INDEX IF EXISTS {index_name} RENAME TO {old_index_name}; "
+                f"ALTER INDEX {new_index_name} RENAME TO {index_name}"))
+            self.execute("DROP INDEX CONCURRENTLY IF EXISTS " + old_index_name)
+
+            return True
+
+    def __has_index(self, index_name):
+        return self.execute("SELECT to_regclass(%s) IS NOT NULL",
+                            lambda ___connection, ___cursor: ___cursor.fetchone()[0],
+                            (index_name,))
+
+    def __is_outgrown(self, index_name):
+        """
+        Checks if the table outgrew the rows an IVFFlat index was built with, as recorded in
+        the comment of the index, and warns once per build. The rows of the table are estimated
+        from the planner statistics, this check running on every ingestion. An index without a
+        recorded row count is assumed to have been built with the minimum rows.
+        """
+        growth = self.index_config.get_ivfflat_rebuild_growth()
+
+        if growth <= 0:
+            return False
+
+        indexed_rows, estimated_rows = self.execute(
+            "SELECT obj_description(to_regclass(%s), 'pg_class'), reltuples FROM pg_class "
+            "WHERE oid = 'qa_embeddings'::regclass",
+            lambda ___connection, ___cursor: ___cursor.fetchone(), (index_name,))
+        indexed_rows = int(indexed_rows) if indexed_rows and indexed_rows.isdigit() \
+            else self.index_config.get_ivfflat_min_rows()
+
+        if estimated_rows < growth * max(indexed_rows, 1):
+            return False
+
+        if self.__outgrown_index != (index_name, indexed_rows):
+            self.__outgrown_index = (index_name, indexed_rows)
+            self.log.warning("The IVFFlat index of qa_embeddings was built with %d rows and the "
+                             "table has about %d rows. Rebuild it with reindex.", indexed_rows,
+                             estimated_rows)
+        return True
+
+    def __drop_stale_vector_indexes(self):
+        """
+        Drops the L2 IVFFlat index of the previous versions, which the cosine distance
+        queries never used, and the indexes of the index types and precisions not configured.
+
+        Changing the precision thus migrates the existing rows: the index of the previous
+        precision is dropped and the one of the new precision is built from the full precision
+        embeddings, which are kept for reranking.
+        """
+        configured = (self.index_config.get_index_type(),
+                      self.index_config.get_embedding_precision())
+
+        self.execute("DROP INDEX IF EXISTS embedding_idx")
+
+        for stale_type in VECTOR_INDEX_TYPES:
+            for stale_precision in EMBEDDING_PRECISIONS:
+                if (stale_type, stale_precision) != configured:
+                    self.execute("DROP INDEX IF EXISTS "
+                                 + DBMgr.vector_index_name(stale_type, stale_precision))
+
+    def __create_vector_index(self, index_type, min_rows, concurrent_name=None):
+        precision = self.index_config.get_embedding_precision()
+        index_name = concurrent_name or DBMgr.vector_index_name(index_type, precision)
+        create = "CREATE INDEX CONCURRENTLY" if concurrent_name else "CREATE INDEX IF NOT EXISTS"
+        operand = vector_index_operand(precision)
+
+        if index_type == "hnsw":
+            self.log.info("Creating the %s precision HNSW index of qa_embeddings.", precision)
+            self.execute(f"{create} {index_name} ON qa_embeddings "
+                         f"USING hnsw ({operand}) "
+                         "WITH (m = %s, ef_construction = %s)",
+                         stmt_vars=(self.index_config.get_hnsw_m(),
+                                    self.index_config.get_hnsw_ef_construction()))
+            return True
+
+        rows = self.execute("SELECT count(*) FROM qa_embeddings",
+                            lambda ___connection, ___cursor: ___cursor.fetchone()[0])
+
+        if rows < max(min_rows, 1):
+            self.log.debug("Deferring the IVFFlat index of qa_embeddings until it has %d rows.",
+                           min_rows)
+            return False
+
+        lists = self.index_config.get_ivfflat_lists() or ivfflat_lists_for(rows)
+
+        self.log.info("Creating the %s precision IVFFlat index of qa_embeddings with %d lists.",
+                      precision, lists)
+        self.execute(f"{create} {index_name} ON qa_embeddings "
+                     f"USING ivfflat ({operand}) WITH (lists = %s)",
+                     stmt_vars=(lists,))
+        self.execute(f"COMMENT ON INDEX {index_name} IS %s", stmt_vars=(str(rows),))
+        return True
+
+    def __migrate_content_hash(self):
+        """
+        Adds the content_hash column and its unique index used to detect duplicate contexts.
+
+        The hash is computed by content_hash when a row is inserted, a generated column
+        requiring an immutable expression, which convert_to is not. The rows of an existing
+        table are hashed by the same expression in SQL before the index is created. Duplicate
+        contexts inserted before the index existed are removed, keeping the oldest row.
+        """
+
+        self.execute("ALTER TABLE qa_embeddings ADD COLUMN IF NOT EXISTS content_hash BYTEA")
+
+        has_index = self.execute(
+            "SELECT to_regclass('qa_embeddings_content_hash_idx') IS NOT NULL",
+            lambda ___connection, ___cursor: ___cursor.fetchone()[0])
+
+        if not has_index:
+            self.log.info("Creating the content hash index of qa_embeddings.")
 
-    def __register_vector(self):
-        self.execute("CREATE EXTENSION IF NOT EXISTS vector",
-                     output_logic=lambda ___connection, ___cursor: register_vector(___connection))
+            self.execute("UPDATE qa_embeddings SET content_hash = "
+                         "sha256(convert_to(context, 'UTF8')) WHERE content_hash IS NULL")
+
+            self.execute("DELETE FROM qa_embeddings duplicate USING qa_embeddings original "
+                         "WHERE duplicate.content_hash = original.content_hash "
+                         "AND duplicate.id > original.id")
+
+            self.execute("CREATE UNIQUE INDEX IF NOT EXISTS qa_embeddings_content_hash_idx "
+                         "ON qa_embeddings (content_hash)")
+
+    def __register_vector(self, connection):
+        self.log.debug("Registering vector extension.")
+        cursor = connection.cursor()
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        register_vector(connection)
+
+    def __set_search_defaults(self, connection):
+        cursor = connection.cursor()
+        cursor.execute("SELECT set_config('hnsw.ef_search', %s, false), "
+                       "set_config('ivfflat.probes', %s, false)",
+                       (str(self.index_config.get_hnsw_ef_search()),
+                        str(self.index_config.get_ivfflat_probes())))
+
+class ConnectionPool:
+    """
+    A thread-safe pool of database connections.
+
+    Connections are created on demand up to max_size and handed back to the pool after use.
+    An idle connection that has not been used for health_check_interval seconds is checked
+    before it is reused, and broken connections are replaced.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, connection_factory, min_size: int = 1, max_size: int = 10,
+                 timeout: float = 30.0, health_check_interval: float = 30.0):
+        """
+        Creates the pool and opens min_size connections.
+
+        Parameters:
+            connection_factory (function): Returns a new connection or None on failure.
+            min_size (int): The number of connections to open upfront.
+            max_size (int): The maximum number of connections.
+            timeout (float): The seconds to wait for a free connection.
+            health_check_interval (float): The idle seconds after which a connection is checked.
+        """
+        self.__connection_factory = connection_factory
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.log = get_logger(__name__)
+        self.__condition = threading.Condition()
+        self.__idle = deque()
+        self.__size = 0
+        self.__in_use = 0
+        self.__closed = False
+        self.__stats = {"acquired": 0, "waited": 0, "timeouts": 0, "created": 0,
+                        "discarded": 0, "total_wait_time": 0.0, "max_wait_time": 0.0}
+
+        for _ in range(self.min_size):
+            with self.__condition:
+                self.__size += 1
+            try:
+                connection = self.__create()
+            except DBException:
+                with self.__condition:
+                    self.__size -= 1
+                break
+            with self.__condition:
+                self.__idle.append((connection, time.monotonic()))
+    # pylint: enable=too-many-arguments
+
+    def __create(self):
+        connection = self.__connection_factory()
+
+        if connection is None:
+            raise DBException("Unable to open a database connection.")
+
+        with self.__condition:
+            self.__stats["created"] += 1
+
+        return connection
+
+    def __is_healthy(self, connection, last_used):
+        if connection.closed:
+            return False
+
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            return True
+        except psycopg2.Error as error:
+            self.log.debug("Discarding unhealthy connection: %s", error)
+            return False
+
+    @staticmethod
+    def __close_quietly(connection):
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+    def acquire(self):
+        """
+        Gets a connection from the pool, waiting up to timeout seconds if all connections
+        are in use.
+
+        Returns:
+            connection (psycopg2.extensions.connection): A healthy connection.
+
+        Raises:
+            DBException: If no connection becomes available or a new one cannot be opened.
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        idle_entry = None
+
+        with self.__condition:
+            while True:
+                if self.__idle:
+                    idle_entry = self.__idle.pop()
+                    break
+                if self.__size < self.max_size:
+                    self.__size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.__stats["timeouts"] += 1
+                    raise DBException("Timed out waiting for a database connection.")
+                waited = True
+                self.__condition.wait(remaining)
+            self.__in_use += 1
+
+        try:
+            if idle_entry is not None and self.__is_healthy(*idle_entry):
+                connection = idle_entry[0]
+            else:
+                if idle_entry is not None:
+                    self.__close_quietly(idle_entry[0])
+                    with self.__condition:
+                        self.__stats["discarded"] += 1
+                connection = self.__create()
+        except Exception:
+            with self.__condition:
+                self.__size -= 1
+                self.__in_use -= 1
+                self.__condition.notify()
+            raise
+
+        wait_time = time.monotonic() - started
+
+        with self.__condition:
+            self.__stats["acquired"] += 1
+            self.__stats["total_wait_time"] += wait_time
+            self.__stats["max_wait_time"] = max(self.__stats["max_wait_time"], wait_time)
+            if waited:
+                self.__stats["waited"] += 1
+
+        return connection
+
+    def release(self, connection, discard: bool = False):
+        """
+        Returns a connection to the pool.
+
+        Parameters:
+            connection (psycopg2.extensions.connection): The connection to return.
+            discard (bool): Closes the connection instead of keeping it for reuse.
+        """
+        with self.__condition:
+            discard = discard or self.__closed or bool(connection.closed)
+
+        if discard:
+            self.__close_quietly(connection)
+
+        with self.__condition:
+            self.__in_use -= 1
+            if discard:
+                self.__size -= 1
+                self.__stats["discarded"] += 1
+            else:
+                self.__idle.append((connection, time.monotonic()))
+            self.__condition.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Acquires a connection for the duration of a with block.
+
+        A connection that raised a psycopg2.OperationalError or psycopg2.InterfaceError is
+        discarded instead of being returned to the pool.
+
+        Yields:
+            connection (psycopg2.extensions.connection): A healthy connection.
+        """
+        connection = self.acquire()
+        discard = False
+        try:
+            yield connection
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.release(connection, discard)
+
+    def get_stats(self):
+        """
+        Gets the statistics of the pool.
+
+        Returns:
+            dict: The size, in_use and idle counts, the number of acquired connections, how many
+            of them had to wait, the timeouts, the created and discarded connections and the
+            total, average and maximum wait times in seconds.
+        """
+        with self.__condition:
+            stats = dict(self.__stats)
+            stats["size"] = self.__size
+            stats["in_use"] = self.__in_use
+            stats["idle"] = len(self.__idle)
+
+        stats["average_wait_time"] = stats["total_wait_time"] / stats["acquired"] \
+            if stats["acquired"] else 0.0
+
+        return stats
+
+    def close(self):
+        """
+        Closes all the idle connections. Connections in use are closed when released.
+        """
+        with self.__condition:
+            self.__closed = True
+            idle = list(self.__idle)
+            self.__idle.clear()
+            self.__size -= len(idle)
+
+        for connection, _ in idle:
+            self.__close_quietly(connection)
+# pylint: enable=too-many-instance-attributes
 
 class DBException(Exception):
     """
@@ -156,5 +756,185 @@ def is_existing_context(db_manager : DBMgr, context: str):
     Returns:
         bool: True if the context exists, False otherwise.
     """
-    return db_manager.execute("SELECT EXISTS(SELECT 1 FROM qa_embeddings WHERE context = %s)",
-                              lambda ___connection, ___cursor: ___cursor.fetchone()[0], (context,))
+    return db_manager.execute("SELECT EXISTS(SELECT 1 FROM qa_embeddings "
+                              "WHERE content_hash = %s)",
+                              lambda ___connection, ___cursor: ___cursor.fetchone()[0],
+                              (content_hash(context),))
+
+def content_hash(context: str):
+    """
+    Gets the content hash of a context, i.e. the SHA-256 digest of its UTF-8 encoding, the same
+    as sha256(convert_to(context, 'UTF8')) in PostgreSQL.
+
+    Parameters:
+        context (str): The context to hash.
+
+    Returns:
+        bytes: The content hash.
+    """
+    return hashlib.sha256(context.encode("utf-8")).digest()
+
+def fetch_nearest(db_manager : DBMgr, stmt: str, stmt_vars: dict, ef_search: int = None,
+                  probes: int = None):
+    """
+    Runs a nearest neighbor query, overriding the search settings of the vector index for this
+    query only if requested.
+
+    Parameters:
+        db_manager (DBMgr): The database manager instance.
+        stmt (str): The query.
+        stmt_vars (dict): The variables of the query.
+        ef_search (int): Overrides hnsw.ef_search for this query only.
+        probes (int): Overrides ivfflat.probes for this query only.
+
+    Returns:
+        list: The rows of the query.
+    """
+    if ef_search is None and probes is None:
+        return db_manager.execute(stmt, lambda ___connection, ___cursor: ___cursor.fetchall(),
+                                  stmt_vars)
+
+    def search(___connection, cursor):
+        if ef_search is not None:
+            cursor.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(ef_search),))
+        if probes is not None:
+            cursor.execute("SELECT set_config('ivfflat.probes', %s, true)", (str(probes),))
+
+        cursor.execute(stmt, stmt_vars)
+        return cursor.fetchall()
+
+    return db_manager.execute_in_transaction(search)
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments
+def find_nearest_contexts(db_manager : DBMgr, embedding, limit: int = 1, ef_search: int = None,
+                          probes: int = None, precision: str = "full", candidates: int = None):
+    """
+    Finds the contexts nearest to an embedding by cosine distance.
+
+    With a half or binary precision, the nearest candidates are searched through the index of
+    that precision first, and then reranked by the cosine distance of their full precision
+    embeddings.
+
+    Parameters:
+        db_manager (DBMgr): The database manager instance.
+        embedding (numpy.ndarray): The embedding to search for.
+        limit (int): The maximum number of contexts to return.
+        ef_search (int): Overrides hnsw.ef_search for this query only.
+        probes (int): Overrides ivfflat.probes for this query only.
+        precision (str): The precision of the first search, i.e. full, half or binary.
+        candidates (int): The number of candidates of the first search to rerank.
+
+    Returns:
+        list: The (context, distance) rows, nearest first.
+    """
+    if precision == "full":
+        stmt = ("SELECT context, embedding <=> %(embedding)s AS distance FROM qa_embeddings "
+                "ORDER BY embedding <=> %(embedding)s LIMIT %(limit)s")
+        stmt_vars = {"embedding": embedding, "limit": limit}
+    else:
+        stmt = f"""
+            SELECT context, embedding <=> %(embedding)s AS distance FROM (
+                SELECT context, embedding FROM qa_embeddings
+                ORDER BY {search_distance(precision, "%(embedding)s")} LIMIT %(candidates)s
+            ) AS candidates
+            ORDER BY distance LIMIT %(limit)s
+        """
+        stmt_vars = {"embedding": embedding, "limit": limit,
+                     "candidates": max(candidates or limit, limit)}
+
+    return fetch_nearest(db_manager, stmt, stmt_vars, ef_search, probes)
+
+def find_nearest_contexts_batch(db_manager : DBMgr, embeddings: list, limit: int = 1,
+                                ef_search: int = None, probes: int = None,
+                                precision: str = "full", candidates: int = None):
+    """
+    Finds the contexts nearest to several embeddings by cosine distance in a single query. Each
+    embedding is searched with its own index scan through a lateral join.
+
+    With a half or binary precision, the candidates of each embedding are reranked like in
+    find_nearest_contexts.
+
+    Parameters:
+        db_manager (DBMgr): The database manager instance.
+        embeddings (list): The numpy.ndarray embeddings to search for.
+        limit (int): The maximum number of contexts to return per embedding.
+        ef_search (int): Overrides hnsw.ef_search for this query only.
+        probes (int): Overrides ivfflat.probes for this query only.
+        precision (str): The precision of the first search, i.e. full, half or binary.
+        candidates (int): The number of candidates of the first search to rerank.
+
+    Returns:
+        list: The (context, distance) rows of each embedding, nearest first, in the same order
+            as the embeddings.
+    """
+    if not embeddings:
+        return []
+
+    if precision == "full":
+        nearest = """
+            SELECT context, embedding <=> searched.embedding AS distance FROM qa_embeddings
+            ORDER BY embedding <=> searched.embedding LIMIT %(limit)s
+        """
+        stmt_vars = {"embeddings": list(embeddings), "limit": limit}
+    else:
+        nearest = f"""
+            SELECT context, embedding <=> searched.embedding AS distance FROM (
+                SELECT context, embedding FROM qa_embeddings
+                ORDER BY {search_distance(precision, "searched.embedding")}
+                LIMIT %(candidates)s
+            ) AS candidates
+            ORDER BY distance LIMIT %(limit)s
+        """
+        stmt_vars = {"embeddings": list(embeddings), "limit": limit,
+                     "candidates": max(candidates or limit, limit)}
+
+    stmt = f"""
+        SELECT searched.position, nearest.context, nearest.distance
+        FROM unnest(%(embeddings)s::vector[]) WITH ORDINALITY AS searched(embedding, position)
+        CROSS JOIN LATERAL ({nearest}) AS nearest
+        ORDER BY searched.position, nearest.distance
+    """
+    rows = fetch_nearest(db_manager, stmt, stmt_vars, ef_search, probes)
+
+    contexts = [[] for _ in embeddings]
+    for position, context, distance in rows:
+        contexts[position - 1].append((context, distance))
+
+    return contexts
+# pylint: enable=too-many-arguments, too-many-positional-arguments
+
+def persist_contexts(db_manager : DBMgr, embedding_records: list, page_size: int = 1000):
+    """
+    Inserts the embedding records that are not yet in the qa_embeddings table.
+
+    The records are written with multi-row inserts of up to page_size rows inside a single
+    transaction. Records with the same chunk text are only inserted once, and records whose
+    chunk text is already stored are skipped by the unique content hash index. The content hash
+    of each record is computed by content_hash.
+
+    Parameters:
+        db_manager (DBMgr): The database manager instance.
+        embedding_records (list): The (chunk_id, start_word, end_word, chunk, embedding) tuples.
+        page_size (int): The number of rows per INSERT statement.
+
+    Returns:
+        int: The number of inserted records.
+    """
+    records = {}
+    for embedding_record in embedding_records:
+        records.setdefault(embedding_record[3], embedding_record)
+
+    if not records:
+        return 0
+
+    rows = [(*record, content_hash(context)) for context, record in records.items()]
+
+    return db_manager.execute_in_transaction(
+        lambda ___connection, ___cursor: len(execute_values(___cursor, """
+            INSERT INTO qa_embeddings (chunk_id, start_word, end_word, context, embedding,
+                content_hash)
+            VALUES %s
+            ON CONFLICT (content_hash) DO NOTHING
+            RETURNING id
+            """, rows, template="(%s, %s, %s, %s, %s::vector, %s)",
+            page_size=page_size, fetch=True)))
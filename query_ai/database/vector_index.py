@@ -0,0 +1,82 @@
+"""
+A module building the SQL expressions of the vector index of the embeddings for each precision.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+import math
+
+from query_ai.config import embedding_config
+
+def ivfflat_lists_for(rows: int):
+    """
+    Gets the number of lists of an IVFFlat index as recommended by pgvector, i.e. rows / 1000
+    up to a million rows and the square root of the rows beyond.
+
+    Parameters:
+        rows (int): The number of rows to index.
+
+    Returns:
+        int: The number of lists.
+    """
+    if rows <= 1000000:
+        return max(rows // 1000, 1)
+
+    return int(math.sqrt(rows))
+
+def vector_index_operand(precision: str):
+    """
+    Gets the indexed expression and the operator class of the vector index of a precision. The
+    half and binary indexes are expression indexes over the full precision embedding column.
+
+    Parameters:
+        precision (str): The precision of the indexed embeddings, i.e. full, half or binary.
+
+    Returns:
+        str: The expression and the operator class to index.
+
+    Raises:
+        ValueError: If the precision is unknown.
+    """
+    dimensions = int(embedding_config.token_length)
+
+    if precision == "full":
+        return "embedding vector_cosine_ops"
+
+    if precision == "half":
+        return f"(embedding::halfvec({dimensions})) halfvec_cosine_ops"
+
+    if precision == "binary":
+        return f"(binary_quantize(embedding)::bit({dimensions})) bit_hamming_ops"
+
+    raise ValueError(f"Unknown embedding precision: {precision}")
+
+def search_distance(precision: str, embedding: str):
+    """
+    Gets the distance expression ordering a search with the vector index of a precision, i.e.
+    the cosine distance of the half precision embeddings, or the hamming distance of the binary
+    quantized embeddings.
+
+    Parameters:
+        precision (str): The precision of the indexed embeddings, i.e. full, half or binary.
+        embedding (str): The SQL expression of the embedding to search for.
+
+    Returns:
+        str: The distance expression.
+
+    Raises:
+        ValueError: If the precision is unknown.
+    """
+    dimensions = int(embedding_config.token_length)
+
+    if precision == "full":
+        return f"embedding <=> {embedding}"
+
+    if precision == "half":
+        return f"embedding::halfvec({dimensions}) <=> ({embedding})::halfvec({dimensions})"
+
+    if precision == "binary":
+        return (f"binary_quantize(embedding)::bit({dimensions}) "
+                f"<~> binary_quantize(({embedding})::vector)::bit({dimensions})")
+
+    raise ValueError(f"Unknown embedding precision: {precision}")
@@ -0,0 +1,406 @@
+"""
+A module providing the stores that persist the embeddings of the chunks and find the ones
+nearest to a question.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import hashlib
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+import numpy as np
+
+from query_ai.logger import get_logger
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
+VECTOR_STORE_TYPES = ("postgres", "memmap")
+
+class VectorStore(ABC):
+    """
+    The interface of the stores of the embeddings. The distances are cosine distances, i.e.
+    from 0 for the same direction to 2 for the opposite one.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    @abstractmethod
+    def persist_contexts(self, embedding_records: list):
+        """
+        Stores the embedding records whose chunk text is not stored yet.
+
+        Parameters:
+            embedding_records (list): The (chunk_id, start_word, end_word, chunk, embedding)
+                tuples.
+
+        Returns:
+            int: The number of stored records.
+        """
+
+    @abstractmethod
+    def find_nearest_contexts(self, embedding, limit: int = 1, ef_search: int = None,
+                              probes: int = None):
+        """
+        Finds the contexts nearest to an embedding.
+
+        Parameters:
+            embedding (numpy.ndarray): The embedding to search for.
+            limit (int): The maximum number of contexts to return.
+            ef_search (int): The size of the HNSW candidate list of this query only, if the
+                store searches an HNSW index.
+            probes (int): The IVFFlat lists searched by this query only, if the store searches
+                an IVFFlat index.
+
+        Returns:
+            list: The (context, distance) rows, nearest first.
+        """
+
+    def find_nearest_contexts_batch(self, embeddings: list, limit: int = 1,
+                                    ef_search: int = None, probes: int = None):
+        """
+        Finds the contexts nearest to several embeddings.
+
+        Parameters:
+            embeddings (list): The numpy.ndarray embeddings to search for.
+            limit (int): The maximum number of contexts to return per embedding.
+            ef_search (int): See find_nearest_contexts.
+            probes (int): See find_nearest_contexts.
+
+        Returns:
+            list: The (context, distance) rows of each embedding, nearest first, in the same
+                order as the embeddings.
+        """
+        return [self.find_nearest_contexts(embedding, limit, ef_search, probes)
+                for embedding in embeddings]
+
+    def ensure_vector_index(self):
+        """
+        Builds the index of the embeddings if the store needs one.
+
+        Returns:
+            bool: True if an index was built.
+        """
+        return False
+
+    def prepare(self):
+        """
+        Prepares the store before processes sharing it are forked, e.g. creates its tables, so
+        that the forked processes do not all do it.
+        """
+
+    def close(self):
+        """
+        Releases the resources of the store.
+        """
+
+# pylint: disable=too-many-instance-attributes
+class MemmapVectorStore(VectorStore):
+    """
+    A store keeping the embeddings in a local directory without a database.
+
+    The normalized embeddings are appended to a float32 matrix file that is memory-mapped for
+    searching, and the chunks to an append-only JSON lines file. The nearest contexts are
+    found by an exact search, i.e. a matrix product with all the embeddings. Several processes
+    can search and append to the same directory.
+
+    An append holds an exclusive lock on a lock file, and so does the first load of a process,
+    which discards the trailing bytes of an interrupted append. A process starting while
+    another one appends thus waits for the append instead of discarding it. Under the lock,
+    an append first loads the chunks appended by the other processes, so that it skips their
+    chunks and appends its own after them. Without fcntl, i.e. on Windows, nothing is locked
+    and only the appending process may search.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    EMBEDDINGS_FILE = "embeddings.f32"
+    CONTEXTS_FILE = "contexts.jsonl"
+    METADATA_FILE = "metadata.json"
+    LOCK_FILE = "append.lock"
+
+    def __init__(self, directory: str):
+        """
+        Initializes the store. The files are created or loaded on first use.
+
+        Parameters:
+            directory (str): The directory of the files.
+        """
+        self.directory = directory
+        self.dimension = None
+        self.log = get_logger(__name__)
+        self.__lock = threading.Lock()
+        self.__is_loaded = False
+        self.__matrix = np.empty((0, 0), dtype=np.float32)
+        self.__offsets = []
+        self.__content_hashes = set()
+        self.__end = 0
+
+    def __path(self, name):
+        return os.path.join(self.directory, name)
+
+    @staticmethod
+    def __content_hash(context):
+        return hashlib.sha256(context.encode("utf-8")).digest()
+
+    @staticmethod
+    def __normalize(embeddings):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+
+        return embeddings / np.maximum(norms, np.finfo(np.float32).tiny)
+
+    @contextmanager
+    def __append_lock(self):
+        """
+        Holds the exclusive lock of the appends across processes.
+        """
+        if fcntl is None:
+            yield
+            return
+
+        with open(self.__path(self.LOCK_FILE), "ab") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def __load(self):
+        """
+        Loads the chunks appended since the last load, e.g. by another process, and maps the
+        embeddings. The first load holds the append lock, so that the trailing bytes it
+        discards are those of an interrupted append rather than of one in progress.
+        """
+        if self.__is_loaded:
+            self.__load_appended(False)
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.__is_loaded = True
+        self.__map()
+
+        with self.__append_lock():
+            self.__load_appended(True)
+
+        self.log.info("Loaded %d chunks from %s.", len(self.__offsets), self.directory)
+
+    def __load_appended(self, is_recovering):
+        """
+        Loads the complete chunks appended since the last load, the embeddings being appended
+        before their chunks. If recovering, the trailing bytes of an interrupted append are
+        discarded.
+        """
+        if self.dimension is None and os.path.exists(self.__path(self.METADATA_FILE)):
+            with open(self.__path(self.METADATA_FILE), encoding="utf-8") as metadata_file:
+                self.dimension = json.load(metadata_file)["dimension"]
+
+        if not self.dimension or not os.path.exists(self.__path(self.CONTEXTS_FILE)) \
+                or not os.path.exists(self.__path(self.EMBEDDINGS_FILE)):
+            return
+
+        rows = os.path.getsize(self.__path(self.EMBEDDINGS_FILE)) // (4 * self.dimension)
+        contexts_size = os.path.getsize(self.__path(self.CONTEXTS_FILE))
+
+        if rows == len(self.__offsets) and contexts_size == self.__end:
+            return
+
+        loaded = len(self.__offsets)
+
+        with open(self.__path(self.CONTEXTS_FILE), "rb") as contexts_file:
+            contexts_file.seek(self.__end)
+
+            for line in contexts_file:
+                if len(self.__offsets) == rows or not line.endswith(b"\n"):
+                    break
+
+                self.__content_hashes.add(self.__content_hash(json.loads(line)["context"]))
+                self.__offsets.append(self.__end)
+                self.__end += len(line)
+
+        if is_recovering and (self.__end < contexts_size or len(self.__offsets) < rows):
+            self.log.warning("Discarding an incomplete append in %s.", self.directory)
+            os.truncate(self.__path(self.CONTEXTS_FILE), self.__end)
+            os.truncate(self.__path(self.EMBEDDINGS_FILE),
+                        len(self.__offsets) * 4 * self.dimension)
+
+        if len(self.__offsets) > loaded:
+            self.__map()
+
+    def __map(self):
+        if self.__offsets:
+            self.__matrix = np.memmap(self.__path(self.EMBEDDINGS_FILE), dtype=np.float32,
+                                      mode="r", shape=(len(self.__offsets), self.dimension))
+        else:
+            self.__matrix = np.empty((0, self.dimension or 0), dtype=np.float32)
+
+    def __snapshot(self):
+        """
+        Gets the mapped embeddings and the offsets of their chunks. The offsets are only
+        appended to, so the ones of the mapped rows stay valid while chunks are appended.
+        """
+        with self.__lock:
+            self.__load()
+            return self.__matrix, self.__offsets
+
+    def __read_contexts(self, offsets):
+        contexts = []
+
+        with open(self.__path(self.CONTEXTS_FILE), "rb") as contexts_file:
+            for offset in offsets:
+                contexts_file.seek(offset)
+                contexts.append(json.loads(contexts_file.readline())["context"])
+
+        return contexts
+
+    def __nearest(self, scores, offsets, limit):
+        limit = min(limit, scores.shape[-1])
+        nearest = np.argpartition(-scores, limit - 1)[:limit] if limit < scores.shape[-1] \
+            else np.arange(scores.shape[-1])
+        nearest = nearest[np.argsort(-scores[nearest], kind="stable")]
+        contexts = self.__read_contexts([offsets[index] for index in nearest])
+
+        return [(context, float(1 - scores[index])) for context, index in zip(contexts, nearest)]
+
+    def persist_contexts(self, embedding_records: list):
+        """
+        Appends the embedding records whose chunk text is not stored yet.
+
+        Parameters:
+            embedding_records (list): The (chunk_id, start_word, end_word, chunk, embedding)
+                tuples.
+
+        Returns:
+            int: The number of appended records.
+        """
+        with self.__lock:
+            self.__load()
+
+            with self.__append_lock():
+                self.__load_appended(False)
+
+                records = {}
+                for embedding_record in embedding_records:
+                    content_hash = self.__content_hash(embedding_record[3])
+                    if content_hash not in self.__content_hashes:
+                        records.setdefault(content_hash, embedding_record)
+
+                if not records:
+                    return 0
+
+                embeddings = self.__normalize([record[4] for record in records.values()])
+
+                if self.dimension is None:
+                    self.dimension = embeddings.shape[1]
+                    with open(self.__path(self.METADATA_FILE), "w", encoding="utf-8") \
+                            as metadata_file:
+                        json.dump({"dimension": self.dimension}, metadata_file)
+
+                with open(self.__path(self.EMBEDDINGS_FILE), "ab") as embeddings_file:
+                    embeddings_file.write(embeddings.tobytes())
+
+                with open(self.__path(self.CONTEXTS_FILE), "ab") as contexts_file:
+                    for content_hash, record in records.items():
+                        line = (json.dumps({"chunk_id": record[0], "start_word": record[1],
+                                            "end_word": record[2], "context": record[3]})
+                                + "\n").encode("utf-8")
+                        contexts_file.write(line)
+                        self.__offsets.append(self.__end)
+                        self.__content_hashes.add(content_hash)
+                        self.__end += len(line)
+
+            self.__map()
+
+            return len(records)
+
+    # pylint: disable=unused-argument
+    def find_nearest_contexts(self, embedding, limit: int = 1, ef_search: int = None,
+                              probes: int = None):
+        """
+        Finds the contexts nearest to an embedding by cosine distance.
+
+        Parameters:
+            embedding (numpy.ndarray): The embedding to search for.
+            limit (int): The maximum number of contexts to return.
+            ef_search (int): Ignored, the search being exact.
+            probes (int): Ignored, the search being exact.
+
+        Returns:
+            list: The (context, distance) rows, nearest first.
+        """
+        matrix, offsets = self.__snapshot()
+
+        if not offsets:
+            return []
+
+        return self.__nearest(matrix @ self.__normalize(embedding), offsets, limit)
+
+    def find_nearest_contexts_batch(self, embeddings: list, limit: int = 1,
+                                    ef_search: int = None, probes: int = None):
+        """
+        Finds the contexts nearest to several embeddings by cosine distance with a single
+        matrix product.
+
+        Parameters:
+            embeddings (list): The numpy.ndarray embeddings to search for.
+            limit (int): The maximum number of contexts to return per embedding.
+            ef_search (int): Ignored, the search being exact.
+            probes (int): Ignored, the search being exact.
+
+        Returns:
+            list: The (context, distance) rows of each embedding, nearest first, in the same
+                order as the embeddings.
+        """
+        matrix, offsets = self.__snapshot()
+
+        if not offsets or not len(embeddings): # pylint: disable=use-implicit-booleaness-not-len
+            return [[] for _ in embeddings]
+
+        scores = self.__normalize(np.stack(embeddings)) @ matrix.T
+
+        return [self.__nearest(row, offsets, limit) for row in scores]
+    # pylint: enable=unused-argument
+
+    def close(self):
+        """
+        Unmaps the embeddings. They are mapped again on next use.
+        """
+        with self.__lock:
+            self.__matrix = np.empty((0, self.dimension or 0), dtype=np.float32)
+            self.__offsets = []
+            self.__content_hashes = set()
+            self.__end = 0
+            self.__is_loaded = False
+# pylint: enable=too-many-instance-attributes
+
+def create_vector_store(store_type: str, db_manager: VectorStore, directory: str):
+    """
+    Creates the vector store selected by VectorStoreConfig.
+
+    Parameters:
+        store_type (str): The type of the store, i.e. postgres or memmap.
+        db_manager (DBMgr): The database manager, used as the postgres store.
+        directory (str): The directory of the memmap store.
+
+    Returns:
+        VectorStore: The vector store.
+
+    Raises:
+        ValueError: If the store type is unknown.
+    """
+    if store_type == "postgres":
+        return db_manager
+
+    if store_type == "memmap":
+        return MemmapVectorStore(directory)
+
+    raise ValueError(f"Unknown vector store: {store_type}")
@@ -0,0 +1,18 @@
+"""
+This module is the job package. It contains the job manager that runs the ingestion jobs in
+the background.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+from .job_manager import JobMgr, IngestionJob, JobQueueFullException
+from ..config import ingestion_config
+
+job_manager = JobMgr(
+    max_workers=ingestion_config.job_workers,
+    max_queued=ingestion_config.job_queue_size,
+    retention=ingestion_config.job_retention
+)
+
+__all__ = ['job_manager', 'IngestionJob', 'JobQueueFullException']
@@ -0,0 +1,263 @@
+"""
+A module to run ingestion jobs in the background and track their progress.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from query_ai.logger import get_logger
+
+
+# pylint: disable=too-many-instance-attributes
+class IngestionJob:
+    """
+    A class to track the progress of a context ingestion.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    def __init__(self):
+        """
+        Initializes a queued job with a unique id.
+        """
+        self.job_id = uuid.uuid4().hex
+        self.status = IngestionJob.QUEUED
+        self.paragraphs_total = 0
+        self.paragraphs_done = 0
+        self.chunks_done = 0
+        self.chunks_inserted = 0
+        self.chunks_skipped = 0
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.__lock = threading.Lock()
+
+    def start(self):
+        """
+        Marks the job as running.
+        """
+        with self.__lock:
+            self.status = IngestionJob.RUNNING
+            self.started_at = time.time()
+
+    def add_paragraphs(self, count: int):
+        """
+        Adds paragraphs to the total number of paragraphs to process.
+
+        Args:
+            count (int): The number of paragraphs found.
+        """
+        with self.__lock:
+            self.paragraphs_total += count
+
+    def advance(self, chunks: int, paragraphs: int = 1):
+        """
+        Records processed paragraphs.
+
+        Args:
+            chunks (int): The number of chunks embedded from the paragraphs.
+            paragraphs (int, optional): The number of paragraphs embedded together.
+        """
+        with self.__lock:
+            self.paragraphs_done += paragraphs
+            self.chunks_done += chunks
+
+    def record_persisted(self, inserted: int, skipped: int):
+        """
+        Records the outcome of persisting chunks.
+
+        Args:
+            inserted (int): The number of chunks inserted.
+            skipped (int): The number of chunks skipped as duplicates.
+        """
+        with self.__lock:
+            self.chunks_inserted += inserted
+            self.chunks_skipped += skipped
+
+    def complete(self):
+        """
+        Marks the job as completed.
+        """
+        with self.__lock:
+            self.status = IngestionJob.COMPLETED
+            self.finished_at = time.time()
+
+    def fail(self, error: str):
+        """
+        Marks the job as failed.
+
+        Args:
+            error (str): The reason of the failure.
+        """
+        with self.__lock:
+            self.status = IngestionJob.FAILED
+            self.error = error
+            self.finished_at = time.time()
+
+    def is_finished(self):
+        """
+        Checks if the job has completed or failed.
+
+        Returns:
+            bool: True if the job is no longer queued or running.
+        """
+        with self.__lock:
+            return self.status in (IngestionJob.COMPLETED, IngestionJob.FAILED)
+
+    def to_dict(self):
+        """
+        Gets a snapshot of the job.
+
+        Returns:
+            dict: The id, status, progress counters, error and timestamps of the job.
+        """
+        with self.__lock:
+            return {
+                "id": self.job_id,
+                "status": self.status,
+                "paragraphs_total": self.paragraphs_total,
+                "paragraphs_done": self.paragraphs_done,
+                "chunks_done": self.chunks_done,
+                "chunks_inserted": self.chunks_inserted,
+                "chunks_skipped": self.chunks_skipped,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+class JobMgr:
+    """
+    A class to run ingestion jobs on a bounded pool of background threads.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    def __init__(self, max_workers: int, max_queued: int, retention: float):
+        """
+        Initializes the job manager. The worker threads are started on the first submission.
+
+        Args:
+            max_workers (int): The number of jobs running at the same time.
+            max_queued (int): The number of jobs waiting for a worker.
+            retention (float): The seconds a finished job can still be looked up.
+        """
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.retention = retention
+        self.log = get_logger(__name__)
+        self.__executor = None
+        self.__slots = threading.BoundedSemaphore(max_workers + max_queued)
+        self.__jobs = {}
+        self.__lock = threading.Lock()
+
+    def __get_executor(self):
+        with self.__lock:
+            if self.__executor is None:
+                self.__executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                     thread_name_prefix="query_ai_job")
+            return self.__executor
+
+    def __prune(self):
+        expiry = time.time() - self.retention
+
+        with self.__lock:
+            expired = [job_id for job_id, job in self.__jobs.items()
+                       if job.is_finished() and job.finished_at < expiry]
+            for job_id in expired:
+                del self.__jobs[job_id]
+
+    def __run(self, job: IngestionJob, task):
+        try:
+            job.start()
+            task(job)
+            job.complete()
+        except Exception as exception: # pylint: disable=broad-exception-caught
+            self.log.exception("Ingestion job %s failed.", job.job_id)
+            job.fail(str(exception))
+        finally:
+            self.__slots.release()
+
+    def submit(self, task):
+        """
+        Queues a task to run in the background.
+
+        Args:
+            task (function): A function receiving the IngestionJob to report its progress to.
+
+        Returns:
+            IngestionJob: The queued job.
+
+        Raises:
+            JobQueueFullException: If all the workers are busy and the queue is full.
+        """
+        if not self.__slots.acquire(blocking=False): # pylint: disable=consider-using-with
+            raise JobQueueFullException("The ingestion queue is full.")
+
+        self.__prune()
+
+        job = IngestionJob()
+
+        with self.__lock:
+            self.__jobs[job.job_id] = job
+
+        try:
+            self.__get_executor().submit(self.__run, job, task)
+        except RuntimeError:
+            with self.__lock:
+                del self.__jobs[job.job_id]
+            self.__slots.release()
+            raise
+
+        self.log.debug("Queued ingestion job %s.", job.job_id)
+
+        return job
+
+    def get_job(self, job_id: str):
+        """
+        Gets a job by its id.
+
+        Args:
+            job_id (str): The id of the job.
+
+        Returns:
+            IngestionJob: The job, or None if it is unknown or expired.
+        """
+        self.__prune()
+
+        with self.__lock:
+            return self.__jobs.get(job_id)
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stops the worker threads.
+
+        Args:
+            wait (bool): Waits for the running and queued jobs to finish.
+        """
+        with self.__lock:
+            executor = self.__executor
+            self.__executor = None
+
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+# pylint: enable=too-many-instance-attributes
+
+class JobQueueFullException(Exception):
+    """
+    An exception raised when no more jobs can be queued.
+    """
@@ -0,0 +1,36 @@
+"""
+This module is the metrics package. It contains the registry of the metrics exposed on the
+/metrics endpoint and the metrics recorded by the application.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+from .metrics_registry import MetricsRegistry, Counter, Histogram
+
+metrics = MetricsRegistry()
+
+stage_duration = metrics.histogram(
+    "query_ai_stage_duration_seconds",
+    "The seconds spent in each stage, i.e. db_connect, db_execute, tokenize, "
+    "embedding_forward, retrieval, validation and generation.",
+    ("stage",))
+
+chunks_total = metrics.counter(
+    "query_ai_chunks_total",
+    "The chunks persisted by outcome, i.e. inserted or skipped as duplicates.",
+    ("outcome",))
+
+request_duration = metrics.histogram(
+    "query_ai_request_duration_seconds",
+    "The seconds spent handling the requests by method, endpoint and status.",
+    ("method", "endpoint", "status"))
+
+admission_rejected_total = metrics.counter(
+    "query_ai_admission_rejected_total",
+    "The requests rejected by limit, i.e. query or context, and status, i.e. 429 when the "
+    "queue is full or 503 when they waited too long.",
+    ("limit", "status"))
+
+__all__ = ['metrics', 'stage_duration', 'chunks_total', 'request_duration',
+           'admission_rejected_total', 'MetricsRegistry', 'Counter', 'Histogram']
@@ -0,0 +1,468 @@
+"""
+A module providing thread-safe counters and histograms rendered in the Prometheus text
+exposition format.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def format_value(value):
+    """
+    Formats a sample value, e.g. 3 instead of 3.0 and +Inf for infinity.
+
+    Args:
+        value (float): The value to format.
+
+    Returns:
+        str: The formatted value.
+    """
+    if value == float("inf"):
+        return "+Inf"
+
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def format_labels(label_names, label_values):
+    """
+    Formats the labels of a sample, escaping the backslashes, double quotes and newlines.
+
+    Args:
+        label_names (tuple): The names of the labels.
+        label_values (tuple): The values of the labels in the same order.
+
+    Returns:
+        str: The labels between braces, or an empty string if there are none.
+    """
+    if not label_names:
+        return ""
+
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in label_values)
+
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(label_names, escaped)) + "}"
+
+
+class Counter:
+    """
+    A counter that only goes up, with a value per combination of labels.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    def __init__(self, name: str, description: str, label_names: tuple = ()):
+        """
+        Initializes the counter.
+
+        Args:
+            name (str): The name of the metric.
+            description (str): The help text of the metric.
+            label_names (tuple, optional): The names of the labels.
+        """
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.__values = {}
+        self.__lock = threading.Lock()
+
+    def __key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} needs the labels {self.label_names}: {tuple(labels)}")
+
+        return tuple(labels[name] for name in self.label_names)
+
+    def inc(self, amount: float = 1, **labels):
+        """
+        Increments the counter.
+
+        Args:
+            amount (float, optional): The non-negative amount to add.
+            **labels: The value of each label.
+
+        Raises:
+            ValueError: If the amount is negative or the labels do not match.
+        """
+        if amount < 0:
+            raise ValueError(f"{self.name} cannot be decreased: {amount}")
+
+        key = self.__key(labels)
+
+        with self.__lock:
+            self.__values[key] = self.__values.get(key, 0) + amount
+
+    def get(self, **labels):
+        """
+        Gets the value of the counter.
+
+        Args:
+            **labels: The value of each label.
+
+        Returns:
+            float: The current value, 0 if it was never incremented.
+        """
+        key = self.__key(labels)
+
+        with self.__lock:
+            return self.__values.get(key, 0)
+
+    def reset(self):
+        """
+        Sets the counter back to 0 for every combination of labels.
+        """
+        with self.__lock:
+            self.__values.clear()
+
+    def drain(self):
+        """
+        Takes the values counted since the last drain and sets the counter back to 0.
+
+        Returns:
+            dict: The value per tuple of label values.
+        """
+        with self.__lock:
+            values = self.__values
+            self.__values = {}
+
+        return values
+
+    def merge(self, values: dict):
+        """
+        Adds the values drained from the same counter, e.g. in another process.
+
+        Args:
+            values (dict): The value per tuple of label values.
+        """
+        with self.__lock:
+            for key, value in values.items():
+                self.__values[key] = self.__values.get(key, 0) + value
+
+    def render(self):
+        """
+        Renders the counter in the Prometheus text exposition format.
+
+        Returns:
+            list: The lines of the metric.
+        """
+        with self.__lock:
+            values = sorted(self.__values.items())
+
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"] + \
+            [f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}"
+             for key, value in values]
+
+
+class Histogram:
+    """
+    A histogram counting the observed values in cumulative buckets, with a distribution per
+    combination of labels.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    def __init__(self, name: str, description: str, label_names: tuple = (),
+                 buckets: tuple = DEFAULT_BUCKETS):
+        """
+        Initializes the histogram.
+
+        Args:
+            name (str): The name of the metric.
+            description (str): The help text of the metric.
+            label_names (tuple, optional): The names of the labels.
+            buckets (tuple, optional): The increasing upper bounds of the buckets. The +Inf
+                bucket is always added.
+        """
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self.__distributions = {}
+        self.__lock = threading.Lock()
+
+    def __key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} needs the labels {self.label_names}: {tuple(labels)}")
+
+        return tuple(labels[name] for name in self.label_names)
+
+    def observe(self, value: float, **labels):
+        """
+        Records a value.
+
+        Args:
+            value (float): The observed value, e.g. a duration in seconds.
+            **labels: The value of each label.
+        """
+        key = self.__key(labels)
+        bucket = bisect_left(self.buckets, value)
+
+        with self.__lock:
+            distribution = self.__distributions.get(key)
+
+            if distribution is None:
+                distribution = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+                self.__distributions[key] = distribution
+
+            distribution["counts"][bucket] += 1
+            distribution["sum"] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Records the seconds spent in a with block, including when it raises.
+
+        Args:
+            **labels: The value of each label.
+        """
+        self.__key(labels)
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def get(self, **labels):
+        """
+        Gets the number and the sum of the observed values.
+
+        Args:
+            **labels: The value of each label.
+
+        Returns:
+            tuple: The count and the sum, (0, 0.0) if nothing was observed.
+        """
+        key = self.__key(labels)
+
+        with self.__lock:
+            distribution = self.__distributions.get(key)
+
+            if distribution is None:
+                return 0, 0.0
+
+            return sum(distribution["counts"]), distribution["sum"]
+
+    def quantile(self, quantile: float, **labels):
+        """
+        Estimates a quantile of the observed values like the histogram_quantile function of
+        Prometheus, i.e. by linear interpolation inside the bucket holding the quantile.
+
+        Args:
+            quantile (float): The quantile between 0 and 1, e.g. 0.99.
+            **labels: The value of each label.
+
+        Returns:
+            float: The estimated quantile, the largest finite bucket bound if it falls in the
+                +Inf bucket, or None if nothing was observed.
+        """
+        key = self.__key(labels)
+
+        with self.__lock:
+            distribution = self.__distributions.get(key)
+            counts = list(distribution["counts"]) if distribution else []
+
+        if not counts or not sum(counts):
+            return None
+
+        rank = quantile * sum(counts)
+        cumulative = 0
+
+        for index, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+
+                lower_bound = self.buckets[index - 1] if index else 0.0
+                return lower_bound + (self.buckets[index] - lower_bound) \
+                    * (rank - cumulative) / count
+
+            cumulative += count
+
+        return self.buckets[-1]
+
+    def reset(self):
+        """
+        Removes all the observed values.
+        """
+        with self.__lock:
+            self.__distributions.clear()
+
+    def drain(self):
+        """
+        Takes the values observed since the last drain and removes them.
+
+        Returns:
+            dict: The bucket counts and the sum per tuple of label values.
+        """
+        with self.__lock:
+            distributions = self.__distributions
+            self.__distributions = {}
+
+        return {key: (distribution["counts"], distribution["sum"])
+                for key, distribution in distributions.items()}
+
+    def merge(self, distributions: dict):
+        """
+        Adds the values drained from the same histogram, e.g. in another process.
+
+        Args:
+            distributions (dict): The bucket counts and the sum per tuple of label values.
+        """
+        with self.__lock:
+            for key, (counts, total) in distributions.items():
+                distribution = self.__distributions.get(key)
+
+                if distribution is None:
+                    distribution = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0}
+                    self.__distributions[key] = distribution
+
+                distribution["counts"] = [count + added for count, added
+                                          in zip(distribution["counts"], counts)]
+                distribution["sum"] += total
+
+    def render(self):
+        """
+        Renders the histogram in the Prometheus text exposition format.
+
+        Returns:
+            list: The lines of the metric.
+        """
+        with self.__lock:
+            distributions = sorted((key, list(distribution["counts"]), distribution["sum"])
+                                   for key, distribution in self.__distributions.items())
+
+        label_names = self.label_names + ("le",)
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+
+        for key, counts, total in distributions:
+            cumulative = 0
+
+            for upper_bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = format_labels(label_names, key + (format_value(upper_bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+
+            labels = format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+
+        return lines
+
+
+class MetricsRegistry:
+    """
+    A class holding the metrics of the application by name.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        """
+        Initializes an empty registry.
+        """
+        self.__metrics = {}
+        self.__lock = threading.Lock()
+
+    def __register(self, metric_class, name, *args):
+        with self.__lock:
+            metric = self.__metrics.get(name)
+
+            if metric is None:
+                metric = metric_class(name, *args)
+                self.__metrics[name] = metric
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"{name} is already registered as a {type(metric).__name__}.")
+
+            return metric
+
+    def counter(self, name: str, description: str, label_names: tuple = ()):
+        """
+        Gets the counter with the given name, registering it on first use.
+
+        Args:
+            name (str): The name of the metric.
+            description (str): The help text of the metric.
+            label_names (tuple, optional): The names of the labels.
+
+        Returns:
+            Counter: The registered counter.
+        """
+        return self.__register(Counter, name, description, label_names)
+
+    def histogram(self, name: str, description: str, label_names: tuple = (),
+                  buckets: tuple = DEFAULT_BUCKETS):
+        """
+        Gets the histogram with the given name, registering it on first use.
+
+        Args:
+            name (str): The name of the metric.
+            description (str): The help text of the metric.
+            label_names (tuple, optional): The names of the labels.
+            buckets (tuple, optional): The upper bounds of the buckets.
+
+        Returns:
+            Histogram: The registered histogram.
+        """
+        return self.__register(Histogram, name, description, label_names, buckets)
+
+    def reset(self):
+        """
+        Resets all the metrics, e.g. between the runs of a benchmark.
+        """
+        with self.__lock:
+            metrics = list(self.__metrics.values())
+
+        for metric in metrics:
+            metric.reset()
+
+    def drain(self):
+        """
+        Takes the values recorded since the last drain, e.g. to send them from a worker
+        process to the server process.
+
+        Returns:
+            dict: The drained values per metric name, without the metrics left unchanged.
+        """
+        with self.__lock:
+            metrics = list(self.__metrics.items())
+
+        return {name: values for name, values in
+                ((name, metric.drain()) for name, metric in metrics) if values}
+
+    def merge(self, drained: dict):
+        """
+        Adds the values drained from a registry with the same metrics. The metrics that are
+        not registered here are ignored.
+
+        Args:
+            drained (dict): The drained values per metric name.
+        """
+        with self.__lock:
+            metrics = dict(self.__metrics)
+
+        for name, values in drained.items():
+            if name in metrics:
+                metrics[name].merge(values)
+
+    def render(self):
+        """
+        Renders all the metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics, sorted by name.
+        """
+        with self.__lock:
+            metrics = sorted(self.__metrics.items())
+
+        return "".join(line + "\n" for _, metric in metrics for line in metric.render())
@@ -0,0 +1,132 @@
+"""
+A module to group concurrent model requests into batches.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from query_ai.logger import get_logger
+
+
+# pylint: disable=too-many-instance-attributes, too-few-public-methods
+class BatchScheduler:
+    """
+    A class that queues items submitted by concurrent callers and processes them in batches.
+
+    A batch is processed as soon as it has max_batch_size items, or max_wait seconds after its
+    first item was queued. Each caller waits for and gets the result of its own item.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    def __init__(self, process_batch, max_batch_size: int, max_wait: float, name: str):
+        """
+        Initializes the scheduler. The batching thread is started on the first submission.
+
+        Args:
+            process_batch (function): Receives a list of items and returns the list of their
+                results in the same order. If it raises or returns another number of results,
+                every caller of the batch gets the exception.
+            max_batch_size (int): The maximum number of items per batch. A size of 1 or less
+                processes every item in the calling thread.
+            max_wait (float): The seconds to wait for more items after the first one.
+            name (str): The name of the batching thread.
+        """
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self.log = get_logger(__name__)
+        self.__process_batch = process_batch
+        self.__queue = queue.Queue()
+        self.__thread = None
+        self.__lock = threading.Lock()
+
+    def __ensure_thread(self):
+        with self.__lock:
+            if self.__thread is None or not self.__thread.is_alive():
+                self.__thread = threading.Thread(target=self.__run, name=self.name, daemon=True)
+                self.__thread.start()
+
+    def __collect_batch(self):
+        batch = [self.__queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.__queue.get(timeout=remaining) if remaining > 0
+                             else self.__queue.get_nowait())
+            except queue.Empty:
+                break
+
+        return batch
+
+    def __run(self):
+        while True:
+            batch = self.__collect_batch()
+            items = [item for item, _ in batch]
+
+            self.log.debug("Processing a batch of %d items in %s.", len(items), self.name)
+
+            try:
+                results = list(self.__process_batch(items))
+
+                if len(results) != len(batch):
+                    raise ValueError(f"{self.name} got {len(results)} results for a batch of "
+                                     f"{len(batch)} items.")
+            except Exception as exception: # pylint: disable=broad-exception-caught
+                self.log.error("Processing a batch of %d items failed in %s: %s", len(items),
+                               self.name, exception)
+                for _, future in batch:
+                    future.set_exception(exception)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def submit(self, item):
+        """
+        Queues an item and waits for its result.
+
+        Args:
+            item: The item to process.
+
+        Returns:
+            The result of the item.
+        """
+        if self.max_batch_size <= 1:
+            return self.__process_batch([item])[0]
+
+        future = Future()
+        self.__ensure_thread()
+        self.__queue.put((item, future))
+
+        return future.result()
+# pylint: enable=too-many-instance-attributes, too-few-public-methods
+
+def process_in_batches(process_batch, items: list, batch_size: int):
+    """
+    Processes the items in consecutive batches in the calling thread.
+
+    Args:
+        process_batch (function): Receives a list of items and returns the list of their
+            results in the same order.
+        items (list): The items to process.
+        batch_size (int): The maximum number of items per batch.
+
+    Returns:
+        list: The results of the items in the same order.
+    """
+    batch_size = max(batch_size, 1)
+    results = []
+
+    for offset in range(0, len(items), batch_size):
+        results.extend(process_batch(items[offset:offset + batch_size]))
+
+    return results
@@ -0,0 +1,194 @@
+"""
+A module providing the runtimes that compute the hidden states of the embedding model.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import os
+
+import torch
+
+from query_ai.config import embedding_config
+from query_ai.logger import get_logger
+
+
+# pylint: disable=too-few-public-methods
+class TorchEmbeddingBackend:
+    """
+    A backend running the embedding model with PyTorch.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    def __init__(self, model):
+        """
+        Initializes the backend.
+
+        Args:
+        model (transformers.PreTrainedModel): The embedding model.
+        """
+        self.model = model
+
+    def last_hidden_state(self, inputs):
+        """
+        Runs the embedding model.
+
+        Args:
+        inputs (dict): The PyTorch tensors returned by the tokenizer.
+
+        Returns:
+        torch.Tensor: The last hidden state of the model.
+        """
+        with torch.no_grad():
+            return self.model(**inputs).last_hidden_state
+
+class OnnxEmbeddingBackend:
+    """
+    A backend running the embedding model with ONNX Runtime on the CPU.
+
+    The model is exported to ONNX the first time and the exported file is reused afterward.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    INPUT_NAMES = ["input_ids", "attention_mask"]
+    OUTPUT_NAME = "last_hidden_state"
+
+    def __init__(self, model, tokenizer, model_path: str, num_threads: int = 0):
+        """
+        Initializes the backend, exporting the model if model_path does not exist yet.
+
+        Args:
+        model (transformers.PreTrainedModel): The PyTorch embedding model to export.
+        tokenizer (transformers.PreTrainedTokenizer): The tokenizer of the model.
+        model_path (str): The path of the ONNX file.
+        num_threads (int): The number of threads per inference. 0 lets ONNX Runtime decide.
+
+        Raises:
+        ImportError: If onnxruntime is not installed.
+        """
+        self.log = get_logger(__name__)
+
+        try:
+            # pylint: disable=import-outside-toplevel
+            import onnxruntime
+        except ImportError as error:
+            raise ImportError("The onnx embedding backend requires onnxruntime. "
+                              "Install it with: poetry install --extras onnx") from error
+
+        if not os.path.exists(model_path):
+            export_onnx(model, tokenizer, model_path)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = num_threads
+
+        self.log.info("Loading the ONNX embedding model %s.", model_path)
+        self.session = onnxruntime.InferenceSession(model_path, options,
+                                                    providers=["CPUExecutionProvider"])
+
+    def last_hidden_state(self, inputs):
+        """
+        Runs the embedding model.
+
+        Args:
+        inputs (dict): The PyTorch tensors returned by the tokenizer.
+
+        Returns:
+        torch.Tensor: The last hidden state of the model.
+        """
+        feed = {name: inputs[name].numpy() for name in OnnxEmbeddingBackend.INPUT_NAMES}
+        output = self.session.run([OnnxEmbeddingBackend.OUTPUT_NAME], feed)[0]
+
+        return torch.from_numpy(output)
+# pylint: enable=too-few-public-methods
+
+class _LastHiddenState(torch.nn.Module):
+    """
+    Wraps a model to return only its last hidden state, the single output of the export.
+    """
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        """
+        Runs the wrapped model.
+        """
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+def export_onnx(model, tokenizer, model_path: str):
+    """
+    Exports the embedding model to ONNX with a dynamic batch size and sequence length.
+
+    Args:
+    model (transformers.PreTrainedModel): The PyTorch embedding model.
+    tokenizer (transformers.PreTrainedTokenizer): The tokenizer of the model.
+    model_path (str): The path of the ONNX file to write.
+    """
+    get_logger(__name__).info("Exporting the embedding model to %s.", model_path)
+
+    sample = tokenizer(["An example text.", "Padding"], return_tensors="pt", padding=True)
+    dynamic_axes = {name: {0: "batch", 1: "sequence"}
+                    for name in OnnxEmbeddingBackend.INPUT_NAMES
+                    + [OnnxEmbeddingBackend.OUTPUT_NAME]}
+
+    directory = os.path.dirname(model_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    temporary_path = f"{model_path}.tmp"
+
+    with torch.no_grad():
+        torch.onnx.export(_LastHiddenState(model).eval(),
+                          tuple(sample[name] for name in OnnxEmbeddingBackend.INPUT_NAMES),
+                          temporary_path,
+                          input_names=OnnxEmbeddingBackend.INPUT_NAMES,
+                          output_names=[OnnxEmbeddingBackend.OUTPUT_NAME],
+                          dynamic_axes=dynamic_axes,
+                          opset_version=17,
+                          dynamo=False)
+
+    os.replace(temporary_path, model_path)
+
+def onnx_model_path(onnx_dir: str, model_name: str):
+    """
+    Gets the path of the exported ONNX file of a model.
+
+    Args:
+    onnx_dir (str): The directory of the exported models.
+    model_name (str): The name of the model.
+
+    Returns:
+    str: The path of the ONNX file.
+    """
+    return os.path.join(onnx_dir, f"{model_name.replace('/', '--')}.onnx")
+
+def create_embedding_backend(model, tokenizer):
+    """
+    Creates the embedding backend selected by EmbeddingConfig.backend.
+
+    Args:
+    model (transformers.PreTrainedModel): The PyTorch embedding model.
+    tokenizer (transformers.PreTrainedTokenizer): The tokenizer of the model.
+
+    Returns:
+    The embedding backend.
+
+    Raises:
+    ValueError: If the backend is unknown.
+    """
+    if embedding_config.backend == "torch":
+        return TorchEmbeddingBackend(model)
+
+    if embedding_config.backend == "onnx":
+        return OnnxEmbeddingBackend(model, tokenizer,
+                                    onnx_model_path(embedding_config.onnx_dir,
+                                                    embedding_config.model_name),
+                                    embedding_config.onnx_threads)
+
+    raise ValueError(f"Unknown embedding backend: {embedding_config.backend}")
@@ -5,17 +5,30 @@ Author: Ron Webb
 Since: 1.0.0
 """
 
+import bisect
+import re
+import threading
+import time
+
 import torch
 
-from transformers import (AutoTokenizer, AutoModel, pipeline, AutoModelForSeq2SeqLM)
+from transformers import (AutoTokenizer, AutoModel, pipeline, AutoModelForSeq2SeqLM,
+                          TextIteratorStreamer)
 
 from query_ai.config import embedding_config, generator_config
-from query_ai.database import DBMgr
+from query_ai.database import VectorStore
 from query_ai.database.db_manager import DBException
 
 from query_ai.logger import get_logger
+from query_ai.metrics import stage_duration
+from query_ai.model.batch_scheduler import BatchScheduler, process_in_batches
+from query_ai.model.embedding_backend import create_embedding_backend
+from query_ai.util.cache import LRUCache
+
+_WORD_PATTERN = re.compile(r"\S+")
 
 
+# pylint: disable=too-many-instance-attributes, too-many-public-methods
 class ModelMgr:
     """
     A class to manage models.
@@ -24,70 +37,381 @@ class ModelMgr:
     Since: 1.0.0
     """
 
-    def __init__(self):
+    def __init__(self, quantize_embedding: bool = None, quantize_generator: bool = None):
         """
-        Initializes the ModelMgr with specified model names.
+        Initializes the ModelMgr. The models are loaded on first use, or by warmup.
 
         Args:
-        embedding_model_name (str): The name of the embedding model.
-        qa_model_name (str): The name of the question answering model.
+        quantize_embedding (bool): Applies dynamic int8 quantization to the Linear layers of the
+            embedding model. Defaults to EmbeddingConfig.quantize.
+        quantize_generator (bool): Applies dynamic int8 quantization to the Linear layers of the
+            generator model. Defaults to GeneratorConfig.quantize.
         """
         self.log = get_logger(__name__)
-        self.embedding_tokenizer = AutoTokenizer.from_pretrained(embedding_config.model_name)
-        self.embedding_model = AutoModel.from_pretrained(embedding_config.model_name)
-        self.generator_tokenizer = AutoTokenizer.from_pretrained(generator_config.model_name)
-        self.generator_model = AutoModelForSeq2SeqLM.from_pretrained(generator_config.model_name)
-        self.generator_pipeline = pipeline("text2text-generation",
-                                           model=self.generator_model,
-                                           tokenizer=self.generator_tokenizer)
+        self.quantize_embedding = embedding_config.quantize if quantize_embedding is None \
+            else quantize_embedding
+        self.quantize_generator = generator_config.quantize if quantize_generator is None \
+            else quantize_generator
+        self.__embedding = None
+        self.__generator = None
+        self.__load_lock = threading.Lock()
+        self.__ready = threading.Event()
+        self.embedding_cache = LRUCache(embedding_config.cache_size, embedding_config.cache_ttl)
+        self.answer_cache = LRUCache(generator_config.answer_cache_size,
+                                     generator_config.answer_cache_ttl)
+        self.generation_scheduler = BatchScheduler(self.__generate_batch,
+                                                   generator_config.max_batch_size,
+                                                   generator_config.max_batch_wait,
+                                                   "query_ai_generation")
+        self.validation_scheduler = BatchScheduler(self.__score_prompts,
+                                                   generator_config.max_batch_size,
+                                                   generator_config.max_batch_wait,
+                                                   "query_ai_validation")
+
+    def __load_embedding(self):
+        with self.__load_lock:
+            if self.__embedding is None:
+                start = time.perf_counter()
+                tokenizer = AutoTokenizer.from_pretrained(embedding_config.model_name)
+                model = AutoModel.from_pretrained(embedding_config.model_name)
+
+                if self.quantize_embedding:
+                    if embedding_config.backend == "torch":
+                        self.log.info("Quantizing %s to int8.", embedding_config.model_name)
+                        model = quantize_dynamic_int8(model)
+                    else:
+                        self.log.warning("Only the torch embedding backend can be quantized.")
+
+                self.__embedding = {"tokenizer": tokenizer, "model": model,
+                                    "backend": create_embedding_backend(model, tokenizer)}
+                self.log.info("Loaded %s in %.2fs.", embedding_config.model_name,
+                              time.perf_counter() - start)
+
+            return self.__embedding
+
+    def __load_generator(self):
+        with self.__load_lock:
+            if self.__generator is None:
+                start = time.perf_counter()
+                tokenizer = AutoTokenizer.from_pretrained(generator_config.model_name)
+                model = AutoModelForSeq2SeqLM.from_pretrained(generator_config.model_name)
+
+                if self.quantize_generator:
+                    self.log.info("Quantizing %s to int8.", generator_config.model_name)
+                    model = quantize_dynamic_int8(model)
+
+                self.__generator = {"tokenizer": tokenizer, "model": model,
+                                    "pipeline": pipeline("text2text-generation", model=model,
+                                                         tokenizer=tokenizer)}
+                self.log.info("Loaded %s in %.2fs.", generator_config.model_name,
+                              time.perf_counter() - start)
+
+            return self.__generator
+
+    @property
+    def embedding_tokenizer(self):
+        """
+        The tokenizer of the embedding model, loaded on first use.
+        """
+        return (self.__embedding or self.__load_embedding())["tokenizer"]
+
+    @property
+    def embedding_model(self):
+        """
+        The embedding model, loaded on first use.
+        """
+        return (self.__embedding or self.__load_embedding())["model"]
+
+    @property
+    def embedding_backend(self):
+        """
+        The backend running the embedding model, loaded on first use.
+        """
+        return (self.__embedding or self.__load_embedding())["backend"]
+
+    @property
+    def generator_tokenizer(self):
+        """
+        The tokenizer of the generator model, loaded on first use.
+        """
+        return (self.__generator or self.__load_generator())["tokenizer"]
+
+    @property
+    def generator_model(self):
+        """
+        The generator model, loaded on first use.
+        """
+        return (self.__generator or self.__load_generator())["model"]
+
+    @property
+    def generator_pipeline(self):
+        """
+        The text2text-generation pipeline of the generator model, loaded on first use.
+        """
+        return (self.__generator or self.__load_generator())["pipeline"]
+
+    def warmup(self):
+        """
+        Loads the models and runs them once, so that the first request does not pay for it.
+        """
+
+        start = time.perf_counter()
+
+        self.get_embedding("Warm up the embedding model.")
+        self.generator_pipeline("Warm up the generator model.",
+                                max_length=generator_config.token_length)
+
+        if generator_config.validation_mode == "logits":
+            self.score_question("The models are warming up.", "Are the models warming up?")
+
+        self.__ready.set()
+        self.log.info("Warmed up the models in %.2fs.", time.perf_counter() - start)
+
+    def is_ready(self):
+        """
+        Checks if warmup has completed.
+
+        Returns:
+        bool: True if the models are loaded and warmed up.
+        """
+
+        return self.__ready.is_set()
 
     def get_embedding(self, text: str):
         """
         Get the embedding of the text.
 
+        The embeddings are cached by model name and whitespace-normalized text, so a repeated
+        text skips both the tokenizer and the forward pass.
+
         Args:
         text (str): The text to embed.
 
         Returns:
-        numpy.ndarray: The embedding of the text.
+        numpy.ndarray: The embedding of the text. It is shared with the cache and must not be
+            modified.
         """
 
-        self.log.debug("Getting embedding for text:\n%s", text)
+        normalized_text = " ".join(text.split())
+        cache_key = (embedding_config.model_name, normalized_text)
+        embedding = self.embedding_cache.get(cache_key)
 
-        inputs = self.embedding_tokenizer(text, return_tensors="pt", padding=True, truncation=True,
-                                          max_length=embedding_config.token_length)
-        with torch.no_grad():
-            outputs = self.embedding_model(**inputs)
+        if embedding is not None:
+            self.log.debug("Using the cached embedding for text:\n%s", normalized_text)
+            return embedding
+
+        self.log.debug("Getting embedding for text:\n%s", normalized_text)
+
+        with stage_duration.time(stage="tokenize"):
+            inputs = self.embedding_tokenizer(normalized_text, return_tensors="pt", padding=True,
+                                              truncation=True,
+                                              max_length=embedding_config.token_length)
+
+        with stage_duration.time(stage="embedding_forward"):
+            last_hidden_state = self.embedding_backend.last_hidden_state(inputs)
+
+        embedding = last_hidden_state.mean(dim=1).squeeze().numpy()
+        self.embedding_cache.put(cache_key, embedding)
+
+        return embedding
+
+    def get_cached_embeddings(self, texts: list, batch_size=embedding_config.batch_size):
+        """
+        Get the embeddings of several texts like get_embedding, embedding the texts that are
+        not cached yet with batched forward passes.
+
+        Args:
+        texts (list): The texts to embed.
+        batch_size (int, optional): The number of texts per forward pass.
+
+        Returns:
+        list: The numpy.ndarray embeddings in the same order as the texts. They are shared with
+            the cache and must not be modified.
+        """
+
+        cache_keys = [(embedding_config.model_name, " ".join(text.split())) for text in texts]
+        embeddings = [self.embedding_cache.get(cache_key) for cache_key in cache_keys]
+        missing = {cache_key[1]: cache_key for cache_key, embedding in zip(cache_keys, embeddings)
+                   if embedding is None}
+
+        if missing:
+            computed = dict(zip(missing, self.embed_batch(list(missing), batch_size)))
+
+            for normalized_text, embedding in computed.items():
+                self.embedding_cache.put(missing[normalized_text], embedding)
+
+            embeddings = [computed[cache_key[1]] if embedding is None else embedding
+                          for cache_key, embedding in zip(cache_keys, embeddings)]
+
+        return embeddings
+
+    def get_cache_stats(self):
+        """
+        Get the statistics of the caches.
+
+        Returns:
+        dict: The statistics of each cache by name. See LRUCache.get_stats.
+        """
+
+        return {"embedding": self.embedding_cache.get_stats(),
+                "answer": self.answer_cache.get_stats()}
+
+    def clear_answer_cache(self):
+        """
+        Removes the cached answers, e.g. after new contexts were stored that could change the
+        retrieved context of a question.
+        """
+
+        self.log.debug("Clearing the answer cache.")
+        self.answer_cache.clear()
+
+    def __embed_in_batches(self, items: list, batch_size: int, encode):
+        embeddings = [None] * len(items)
+        order = sorted(range(len(items)), key=lambda index: len(items[index]))
+
+        for offset in range(0, len(order), batch_size):
+            indexes = order[offset:offset + batch_size]
+
+            self.log.debug("Getting embeddings for a batch of %d texts.", len(indexes))
+
+            with stage_duration.time(stage="tokenize"):
+                inputs = encode([items[index] for index in indexes])
+
+            with stage_duration.time(stage="embedding_forward"):
+                last_hidden_state = self.embedding_backend.last_hidden_state(inputs)
+
+            pooled = mean_pooling(last_hidden_state, inputs["attention_mask"])
+
+            for index, embedding in zip(indexes, pooled.numpy()):
+                embeddings[index] = embedding
+
+        return embeddings
 
-        return outputs.last_hidden_state.mean(dim=1).squeeze().numpy()
+    def __encode_token_ids(self, token_ids: list):
+        tokenizer = self.embedding_tokenizer
+        pad_token_id = tokenizer.pad_token_id or 0
+        rows = [tokenizer.build_inputs_with_special_tokens(list(ids)) for ids in token_ids]
+        longest = max(len(row) for row in rows)
+
+        return {
+            "input_ids": torch.tensor([row + [pad_token_id] * (longest - len(row))
+                                       for row in rows]),
+            "attention_mask": torch.tensor([[1] * len(row) + [0] * (longest - len(row))
+                                            for row in rows]),
+        }
+
+    def embed_batch(self, texts: list, batch_size=embedding_config.batch_size):
+        """
+        Get the embeddings of several texts using batched forward passes.
+
+        The texts are sorted by length before batching to minimize padding, and the padded
+        positions are excluded from the mean pooling so that a text gets the same embedding
+        regardless of the batch it is in.
+
+        Args:
+        texts (list): The texts to embed.
+        batch_size (int, optional): The number of texts per forward pass.
+
+        Returns:
+        list: The numpy.ndarray embeddings in the same order as the texts.
+        """
+
+        return self.__embed_in_batches(
+            texts, batch_size,
+            lambda batch: self.embedding_tokenizer(batch, return_tensors="pt", padding=True,
+                                                   truncation=True,
+                                                   max_length=embedding_config.token_length))
+
+    def get_token_window_size(self):
+        """
+        Get the number of text tokens that fit in a single forward pass of the embedding model,
+        i.e. the smallest of the configured token length and the limits of the tokenizer and
+        the model, without the special tokens the tokenizer adds.
+
+        Returns:
+        int: The maximum number of tokens of a chunk.
+        """
+
+        tokenizer = self.embedding_tokenizer
+        max_length = min(embedding_config.token_length, tokenizer.model_max_length,
+                         getattr(self.embedding_model.config, "max_position_embeddings",
+                                 embedding_config.token_length))
+
+        return max_length - tokenizer.num_special_tokens_to_add(pair=False)
+
+    def get_token_embeddings(self, text: str, stride: int = None,
+                             batch_size=embedding_config.batch_size):
+        """
+        Tokenizes the text once and gets the embedding of each overlapping window of tokens.
+
+        The windows are as long as the embedding model allows, so no token is truncated, and
+        their text and word indexes are derived from the character offsets of their tokens.
+
+        Args:
+        text (str): The text to embed.
+        stride (int, optional): The number of tokens shared by consecutive windows. Defaults to
+            EmbeddingConfig.db_record_token_stride.
+        batch_size (int, optional): The number of windows per forward pass.
+
+        Returns:
+        list: A list of tuples containing the chunk index, start word index, end word index,
+            chunk text, and its embedding.
+        """
+
+        with stage_duration.time(stage="tokenize"):
+            encoding = self.embedding_tokenizer(text, add_special_tokens=False, truncation=False,
+                                                return_offsets_mapping=True)
+        token_ids = encoding["input_ids"]
+
+        if not token_ids and text.strip():
+            self.log.warning("No tokens were found in the text:\n%s", text)
+
+        chunks = split_into_token_chunks(text, encoding["offset_mapping"],
+                                         self.get_token_window_size(),
+                                         embedding_config.db_record_token_stride if stride is None
+                                         else stride)
+        embeddings = self.__embed_in_batches([token_ids[start:end] for *_, start, end in chunks],
+                                             batch_size, self.__encode_token_ids)
+
+        return [chunk[:4] + (embedding,) for chunk, embedding in zip(chunks, embeddings)]
 
     def get_embeddings(self, text: str, chunk_size=embedding_config.db_record_chunk_size,
-                       overlap=embedding_config.db_record_overlap):
+                       overlap=embedding_config.db_record_overlap,
+                       batch_size=embedding_config.batch_size, chunking: str = None):
         """
         Splits the text into overlapping chunks and gets the embedding for each chunk.
 
         Args:
         text (str): The text to embed.
-        chunk_size (int, optional): The size of each chunk. Defaults to embedding_token_length.
-        overlap (int, optional): The number of words to overlap between chunks. Defaults to 50.
+        chunk_size (int, optional): The number of words in each chunk of the words chunking.
+        overlap (int, optional): The number of words to overlap between chunks of the words
+            chunking. Defaults to 50.
+        batch_size (int, optional): The number of chunks per forward pass.
+        chunking (str, optional): Splits the text by words or by tokens (see
+            get_token_embeddings). Defaults to EmbeddingConfig.chunking.
 
         Returns:
         list: A list of tuples containing the chunk index, start index, end index, chunk text,
             and its embedding.
+
+        Raises:
+        ValueError: If the chunking is unknown.
         """
 
-        words = text.split()
-        output = []
-        i = 0
-        while i * (chunk_size - overlap) < len(words):
-            start = i * (chunk_size - overlap)
-            end = min(start + chunk_size, len(words))
-            chunk = " ".join(words[start:end])
-            embedding = self.get_embedding(chunk)
-            output.append((i, start, end, chunk, embedding))
-            i += 1
+        chunking = chunking or embedding_config.chunking
+
+        if chunking == "tokens":
+            if getattr(self.embedding_tokenizer, "is_fast", False):
+                return self.get_token_embeddings(text, batch_size=batch_size)
+
+            self.log.warning("The tokens chunking needs a fast tokenizer, splitting by words.")
+        elif chunking != "words":
+            raise ValueError(f"Unknown chunking: {chunking}")
+
+        chunks = split_into_chunks(text, chunk_size, overlap)
+        embeddings = self.embed_batch([chunk[3] for chunk in chunks], batch_size)
 
-        return output
+        return [chunk + (embedding,) for chunk, embedding in zip(chunks, embeddings)]
 
     def format_conversation(self, conversation, suffix):
         """
@@ -110,45 +434,95 @@ class ModelMgr:
 
         return formatted_conversation
 
+    def __generate_batch(self, prompts):
+        if len(prompts) == 1:
+            return [self.generator_pipeline(prompts[0],
+                                            #truncation=True,
+                                            max_length=generator_config.token_length,
+                                            )[0]]
+
+        outputs = self.generator_pipeline(prompts,
+                                          max_length=generator_config.token_length,
+                                          batch_size=len(prompts))
+
+        return [output[0] if isinstance(output, list) else output for output in outputs]
+
     def __pipeline(self, chat, suffix):
         formatted_chat = self.format_conversation(chat, suffix)
 
-        result = self.generator_pipeline(formatted_chat,
-                                         #truncation=True,
-                                         max_length=generator_config.token_length,
-                                         )[0]
-
-        return result
+        return self.generation_scheduler.submit(formatted_chat)
 
-    def __ask_question(self, context, question):
+    def __answer_chat(self, context, question):
         message = f"""You are a chatbot that can answer questions based on the given context.
 Context: 
 
 {context}
 """
-        chat = [
+        return [
             {'role': 'system', 'content' : message},
             {'role': 'assistant', 'content' : "Must answer politely and informatively."},
             {'role': 'assistant', 'content' : "Respond 'I don't know' if out of context."},
             {'role': 'user', 'content' : question},
         ]
 
-        return self.__pipeline(chat, "assistant:")
+    def __ask_question(self, context, question):
+        with stage_duration.time(stage="generation"):
+            return self.__pipeline(self.__answer_chat(context, question), "assistant:")
+
+    def __stream_generation(self, prompt):
+        """
+        Yields the decoded text of the generator model as it is produced. The generation runs
+        in its own thread, outside of the generation scheduler, and its error, if any, is
+        raised once the text produced so far has been yielded.
+        """
+
+        tokenizer = self.generator_tokenizer
+        with stage_duration.time(stage="tokenize"):
+            inputs = tokenizer(prompt, return_tensors="pt")
+
+        streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        errors = []
+
+        def generate():
+            try:
+                with torch.no_grad(), stage_duration.time(stage="generation"):
+                    self.generator_model.generate(input_ids=inputs["input_ids"],
+                                                  attention_mask=inputs.get("attention_mask"),
+                                                  max_length=generator_config.token_length,
+                                                  streamer=streamer)
+            except Exception as exception: # pylint: disable=broad-exception-caught
+                errors.append(exception)
+                streamer.end()
+
+        thread = threading.Thread(target=generate, name="query_ai_stream", daemon=True)
+        thread.start()
+
+        for text in streamer:
+            if text:
+                yield text
+
+        thread.join()
+
+        if errors:
+            raise errors[0]
 
     def __retrieve_context(self, db_manager, question):
         question_embedding = self.get_embedding(question)
 
-        return db_manager.execute(
-            stmt="SELECT context, embedding <=> %s AS distance FROM qa_embeddings "
-                 "ORDER BY distance LIMIT 1",
-            stmt_vars=(question_embedding,),
-            output_logic=lambda ___connection, ___cursor: ___cursor.fetchall()
-        )
+        with stage_duration.time(stage="retrieval"):
+            return db_manager.find_nearest_contexts(question_embedding)
 
     def __generate_result(self, context, question):
 
         context_first_field = 0
         retrieved_context = context[context_first_field]
+        cache_key = (question, retrieved_context, generator_config.model_name)
+        cached_result = self.answer_cache.get(cache_key)
+
+        if cached_result is not None:
+            self.log.debug("Using the cached answer for question:\n%s", question)
+            return dict(cached_result)
+
         is_valid_question = self.validate_question(retrieved_context, question)
         result = {}
 
@@ -163,16 +537,19 @@ Context:
 
         result["question"] = question
         result["context"] = retrieved_context
+        result["valid"] = bool(is_valid_question)
+
+        self.answer_cache.put(cache_key, dict(result))
 
         return result
 
-    def generate_answer(self, question: str, db_manager: DBMgr = None,
+    def generate_answer(self, question: str, db_manager: VectorStore = None,
                         provided_context: str = None):
         """
-        Answer a question using the generator model and database manager.
+        Answer a question using the generator model and vector store.
 
         Args:
-        db_manager (DBMgr): The database manager to retrieve relevant contexts.
+        db_manager (VectorStore): The vector store to retrieve relevant contexts.
         question (str): The question to answer.
 
         Returns:
@@ -204,18 +581,186 @@ Context:
 
         return results
 
-    def validate_question(self, context, question):
+    def __stream_result(self, context, question):
+        retrieved_context, distance = context[0], float(context[1])
+        cache_key = (question, retrieved_context, generator_config.model_name)
+        cached_result = self.answer_cache.get(cache_key)
+
+        yield "context", {"context": retrieved_context, "distance": distance,
+                          "cached": cached_result is not None}
+
+        if cached_result is not None:
+            self.log.debug("Streaming the cached answer for question:\n%s", question)
+            yield "validation", {"valid": cached_result.get("valid", True)}
+            yield "token", {"text": cached_result["generated_text"]}
+            yield "answer", {"answer": cached_result["generated_text"]}
+            return
+
+        is_valid_question = bool(self.validate_question(retrieved_context, question))
+
+        yield "validation", {"valid": is_valid_question}
+
+        if is_valid_question:
+            texts = []
+            prompt = self.format_conversation(self.__answer_chat(retrieved_context, question),
+                                              "assistant:")
+
+            for text in self.__stream_generation(prompt):
+                texts.append(text)
+                yield "token", {"text": text}
+
+            response = "".join(texts).strip()
+        else:
+            response = "I don't know"
+            yield "token", {"text": response}
+
+        self.log.debug("Response:\n%s", response)
+
+        self.answer_cache.put(cache_key, {"generated_text": response, "question": question,
+                                          "context": retrieved_context,
+                                          "valid": is_valid_question})
+
+        yield "answer", {"answer": response}
+
+    def stream_answer(self, question: str, db_manager: VectorStore = None,
+                      provided_context: str = None):
         """
-        Validates the question if it is valid for the given context.
+        Answer a question like generate_answer, yielding events as soon as they are known
+        instead of waiting for the whole answer.
+
+        For each relevant context, the events are: context (the retrieved context and its
+        distance), validation (whether the question can be answered from the context), token
+        (the next decoded text of the answer, repeated) and answer (the whole answer). An
+        error event replaces them if the database cannot be accessed, and the events end with
+        done.
 
         Args:
-        context (str): The context in which the question must be based on.
-        question (str): The question related to the context.
+        question (str): The question to answer.
+        db_manager (VectorStore): The vector store to retrieve relevant contexts.
+        provided_context (str): The context to use instead of the database.
+
+        Yields:
+        tuple: The name and the data (dict) of the next event.
+        """
+
+        relevant_contexts = []
+        has_error = False
+
+        if provided_context:
+            distance = 0
+            relevant_contexts = [(provided_context, distance)]
+        elif db_manager:
+            try:
+                relevant_contexts = self.__retrieve_context(db_manager, question)
+            except DBException:
+                has_error = True
+                yield "error", {"error": "Sorry, I cannot access my database. Try again later."}
+
+        for context in relevant_contexts:
+            yield from self.__stream_result(context, question)
+
+        if not relevant_contexts and not has_error:
+            self.log.debug("The database is empty.")
+            yield "answer", {"answer": "The context database is empty."}
+
+        yield "done", {}
+
+    def generate_answers(self, questions: list, db_manager: VectorStore = None,
+                         provided_contexts: list = None):
+        """
+        Answer several questions like generate_answer, running each step for all of them at
+        once: the questions are embedded in batches, their nearest contexts are found in a
+        single query, and the validations and answers are generated in batches.
+
+        Args:
+        questions (list): The questions to answer.
+        db_manager (VectorStore): The vector store to retrieve relevant contexts.
+        provided_contexts (list): The context of each question, or None to retrieve it.
 
         Returns:
-        int: 1 if the response is valid within the context, 0 otherwise.
+        list: The result of each question in the same order, i.e. a dictionary containing the
+            answer and its context.
         """
 
+        provided_contexts = provided_contexts or [None] * len(questions)
+        contexts = [(context, 0) if context else None for context in provided_contexts]
+        results = [None] * len(questions)
+        retrieved = [index for index, context in enumerate(contexts) if context is None]
+
+        if retrieved and db_manager:
+            try:
+                embeddings = self.get_cached_embeddings([questions[index] for index in retrieved])
+
+                with stage_duration.time(stage="retrieval"):
+                    nearest = db_manager.find_nearest_contexts_batch(embeddings)
+            except DBException:
+                nearest = None
+
+            for position, index in enumerate(retrieved):
+                if nearest is None:
+                    results[index] = {"generated_text": "Sorry, I cannot access my database. "
+                                                        "Try again later.",
+                                      "question": questions[index], "context": ""}
+                elif nearest[position]:
+                    contexts[index] = nearest[position][0]
+
+        pending = []
+
+        for index, context in enumerate(contexts):
+            if results[index] is not None:
+                continue
+
+            if context is None:
+                results[index] = {"generated_text": "The context database is empty.",
+                                  "question": questions[index], "context": ""}
+                continue
+
+            cached_result = self.answer_cache.get((questions[index], context[0],
+                                                   generator_config.model_name))
+
+            if cached_result is None:
+                pending.append((index, context[0]))
+            else:
+                results[index] = dict(cached_result)
+
+        for index, result in self.__generate_results(questions, pending):
+            results[index] = result
+
+        return results
+
+    def __generate_results(self, questions, pending):
+        """
+        Validates and answers the (question index, context) pairs in batches and caches their
+        results.
+        """
+
+        if not pending:
+            return []
+
+        validations = self.validate_questions([(context, questions[index])
+                                               for index, context in pending])
+        answered = [pair for pair, is_valid in zip(pending, validations) if is_valid]
+        prompts = [self.format_conversation(self.__answer_chat(context, questions[index]),
+                                            "assistant:") for index, context in answered]
+        with stage_duration.time(stage="generation"):
+            answers = dict(zip((index for index, _ in answered),
+                               process_in_batches(self.__generate_batch, prompts,
+                                                  generator_config.max_batch_size)))
+        results = []
+
+        for (index, context), is_valid in zip(pending, validations):
+            result = dict(answers[index]) if is_valid else {"generated_text": "I don't know"}
+            result["question"] = questions[index]
+            result["context"] = context
+            result["valid"] = bool(is_valid)
+
+            self.answer_cache.put((questions[index], context, generator_config.model_name),
+                                  dict(result))
+            results.append((index, result))
+
+        return results
+
+    def __validation_chat(self, context, question):
         message = f"""You are an analyst that validates if question can be answered from the
 given context.
 
@@ -227,18 +772,220 @@ Question:
 
 {question}
         """
-        chat = [
+        return [
             {'role': 'system', 'content' : message},
             {'role': 'analyst', 'content' : "Must answer 1 if yes, 0 if no."},
         ]
-        result = self.__pipeline(chat, "analyst:")
-        is_valid_question = result['generated_text'].strip()
 
-        self.log.debug("Validation result: %s", is_valid_question)
+    def __label_token_id(self, label):
+        token_ids = self.generator_tokenizer.encode(label, add_special_tokens=False)
 
-        int_output = int(is_valid_question)
+        return token_ids[0]
+
+    def __score_prompts(self, prompts):
+        """
+        Scores the validation prompts with a single forward pass of the generator model.
+
+        Only the logits of the first decoder step are used. The probability of answering "1" is
+        the softmax of the "0" and "1" logits divided by the validation temperature.
+        """
+
+        with stage_duration.time(stage="tokenize"):
+            inputs = self.generator_tokenizer(prompts, return_tensors="pt", padding=True,
+                                              truncation=True,
+                                              max_length=generator_config.token_length)
+
+        decoder_input_ids = torch.full((len(prompts), 1),
+                                       self.generator_model.config.decoder_start_token_id)
+
+        with torch.no_grad():
+            logits = self.generator_model(input_ids=inputs["input_ids"],
+                                          attention_mask=inputs["attention_mask"],
+                                          decoder_input_ids=decoder_input_ids).logits
+
+        label_ids = [self.__label_token_id("0"), self.__label_token_id("1")]
+        label_logits = logits[:, -1, label_ids] / generator_config.validation_temperature
+
+        return torch.softmax(label_logits, dim=-1)[:, 1].tolist()
+
+    def score_question(self, context, question):
+        """
+        Scores how likely the question can be answered from the given context.
+
+        Args:
+        context (str): The context in which the question must be based on.
+        question (str): The question related to the context.
+
+        Returns:
+        float: The probability, between 0 and 1, that the question is within the context.
+        """
+
+        prompt = self.format_conversation(self.__validation_chat(context, question), "analyst:")
+
+        return self.validation_scheduler.submit(prompt)
+
+    def validate_questions(self, pairs: list):
+        """
+        Validates several questions like validate_question, with batched forward passes of up
+        to GeneratorConfig.max_batch_size prompts.
+
+        Args:
+        pairs (list): The (context, question) pairs to validate.
+
+        Returns:
+        list: 1 if the question is valid within its context, 0 otherwise, for each pair.
+        """
+
+        prompts = [self.format_conversation(self.__validation_chat(context, question),
+                                            "analyst:") for context, question in pairs]
+
+        with stage_duration.time(stage="validation"):
+            if generator_config.validation_mode == "logits":
+                probabilities = process_in_batches(self.__score_prompts, prompts,
+                                                   generator_config.max_batch_size)
+
+                return [int(probability >= generator_config.validation_threshold)
+                        for probability in probabilities]
+
+            results = process_in_batches(self.__generate_batch, prompts,
+                                         generator_config.max_batch_size)
+
+        return [int(result['generated_text'].strip().startswith("1")) for result in results]
+
+    def validate_question(self, context, question):
+        """
+        Validates the question if it is valid for the given context.
+
+        With GeneratorConfig.validation_mode set to "logits", the question is valid if its
+        score_question probability reaches GeneratorConfig.validation_threshold. With "generate",
+        the generator model writes the answer and a leading 1 means valid.
+
+        Args:
+        context (str): The context in which the question must be based on.
+        question (str): The question related to the context.
+
+        Returns:
+        int: 1 if the response is valid within the context, 0 otherwise.
+        """
+
+        if generator_config.validation_mode == "logits":
+            with stage_duration.time(stage="validation"):
+                probability = self.score_question(context, question)
+
+            self.log.debug("Validation probability: %s", probability)
+
+            int_output = int(probability >= generator_config.validation_threshold)
+        else:
+            with stage_duration.time(stage="validation"):
+                result = self.__pipeline(self.__validation_chat(context, question), "analyst:")
+
+            is_valid_question = result['generated_text'].strip()
+
+            self.log.debug("Validation result: %s", is_valid_question)
+
+            int_output = int(is_valid_question.startswith("1"))
 
         if not int_output:
             self.log.debug("The question is out of context.")
 
         return int_output
+# pylint: enable=too-many-instance-attributes, too-many-public-methods
+
+def split_into_chunks(text: str, chunk_size: int, overlap: int):
+    """
+    Splits the text into overlapping chunks of words.
+
+    Args:
+    text (str): The text to split.
+    chunk_size (int): The number of words in each chunk.
+    overlap (int): The number of words to overlap between chunks.
+
+    Returns:
+    list: A list of tuples containing the chunk index, start index, end index and chunk text.
+    """
+
+    words = text.split()
+    chunks = []
+    i = 0
+    while i * (chunk_size - overlap) < len(words):
+        start = i * (chunk_size - overlap)
+        end = min(start + chunk_size, len(words))
+        chunks.append((i, start, end, " ".join(words[start:end])))
+        i += 1
+
+    return chunks
+
+def split_into_token_chunks(text: str, offsets: list, window_size: int, stride: int):
+    """
+    Splits the tokens of a text into overlapping windows. Every token is in at least one
+    window and the last window ends at the last token.
+
+    Args:
+    text (str): The tokenized text.
+    offsets (list): The (start, end) character offsets of each token in the text.
+    window_size (int): The maximum number of tokens in each window.
+    stride (int): The number of tokens shared by consecutive windows.
+
+    Returns:
+    list: A list of tuples containing the chunk index, start word index, end word index, chunk
+        text, start token index and end token index. The end indexes are exclusive.
+
+    Raises:
+    ValueError: If the stride leaves no new token in a window.
+    """
+
+    if not 0 <= stride < window_size:
+        raise ValueError(f"The stride must be between 0 and {window_size - 1}: {stride}")
+
+    word_starts = [match.start() for match in _WORD_PATTERN.finditer(text)]
+    chunks = []
+    start = 0
+
+    while start < len(offsets):
+        end = min(start + window_size, len(offsets))
+        start_char = offsets[start][0]
+        end_char = offsets[end - 1][1]
+        chunks.append((len(chunks), max(bisect.bisect_right(word_starts, start_char) - 1, 0),
+                       bisect.bisect_left(word_starts, end_char), text[start_char:end_char],
+                       start, end))
+
+        if end == len(offsets):
+            break
+
+        start = end - stride
+
+    return chunks
+
+def quantize_dynamic_int8(model):
+    """
+    Quantizes the weights of the Linear layers of a model to int8 for CPU inference. The
+    activations are quantized on the fly, so no calibration data is needed.
+
+    Args:
+    model (torch.nn.Module): The model to quantize. It is quantized in place, so the fp32
+        weights are not held twice.
+
+    Returns:
+    torch.nn.Module: The quantized model in evaluation mode.
+    """
+
+    return torch.ao.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear},
+                                                  dtype=torch.qint8, inplace=True)
+
+def mean_pooling(last_hidden_state, attention_mask):
+    """
+    Averages the token embeddings of each sequence, ignoring the padded positions.
+
+    Args:
+    last_hidden_state (torch.Tensor): The token embeddings of shape (batch, tokens, dimension).
+    attention_mask (torch.Tensor): The attention mask of shape (batch, tokens).
+
+    Returns:
+    torch.Tensor: The sequence embeddings of shape (batch, dimension).
+    """
+
+    mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)
+    summed = (last_hidden_state * mask).sum(dim=1)
+    counts = mask.sum(dim=1).clamp(min=1e-9)
+
+    return summed / counts
@@ -0,0 +1,442 @@
+"""
+A module to run the models in forked worker processes.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import itertools
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from query_ai.config import embedding_config, generator_config
+from query_ai.logger import get_logger
+from query_ai.metrics import metrics
+
+
+# pylint: disable=R0903
+class VectorStoreReference:
+    """
+    Stands for the vector store in a call sent to a worker, which uses its own vector store.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+# pylint: enable=R0903
+
+def split_cores(cores: list, workers: int):
+    """
+    Splits the cores into contiguous sets, one per worker. With more workers than cores, the
+    workers share the cores one each in turn.
+
+    Args:
+        cores (list): The cores available to the process.
+        workers (int): The number of workers.
+
+    Returns:
+        list: The list of cores of each worker.
+    """
+    if workers >= len(cores):
+        return [[cores[index % len(cores)]] for index in range(workers)]
+
+    size, remainder = divmod(len(cores), workers)
+    core_sets = []
+    start = 0
+
+    for index in range(workers):
+        end = start + size + (1 if index < remainder else 0)
+        core_sets.append(cores[start:end])
+        start = end
+
+    return core_sets
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments
+def run_worker(model_manager, tasks, results, cores: list, threads: int, concurrency: int):
+    """
+    Runs the calls sent to a worker process until it receives None. The calls run in a pool
+    of threads, so that the concurrent generations of the worker are batched together.
+
+    Args:
+        model_manager (ModelMgr): The model manager, whose weights were loaded before forking.
+        tasks (multiprocessing.Queue): The (task_id, method, args, kwargs) calls of the worker,
+            where a task_id of None expects no result.
+        results (multiprocessing.Queue): The (task_id, kind, value) results of all the workers,
+            where kind is result, event, done or error, (None, ready, pid) once warmed up and
+            (None, metrics, drained) with the metrics recorded before each result.
+        cores (list): The cores to pin the worker to, or None to leave it unpinned.
+        threads (int): The number of torch threads of the worker.
+        concurrency (int): The number of calls the worker runs at the same time.
+    """
+    log = get_logger(__name__)
+    metrics.reset()
+
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    torch.set_num_threads(threads)
+    log.info("Started model worker %d on cores %s with %d threads.", os.getpid(), cores,
+             threads)
+
+    try:
+        model_manager.warmup()
+        put_metrics(results)
+        results.put((None, "ready", os.getpid()))
+    except Exception: # pylint: disable=broad-exception-caught
+        log.exception("Warming up the models failed in model worker %d.", os.getpid())
+
+    with ThreadPoolExecutor(max_workers=concurrency,
+                            thread_name_prefix="query_ai_worker_call") as executor:
+        for task in iter(tasks.get, None):
+            executor.submit(run_task, model_manager, results, *task)
+# pylint: enable=too-many-arguments, too-many-positional-arguments
+
+# pylint: disable=too-many-arguments, too-many-positional-arguments
+def run_task(model_manager, results, task_id, method: str, args: list, kwargs: dict):
+    """
+    Runs a call sent to a worker process and sends its result, unless its task_id is None.
+
+    Args:
+        model_manager (ModelMgr): The model manager of the worker.
+        results (multiprocessing.Queue): The results of all the workers. See run_worker.
+        task_id (int): The id of the call, or None if no result is expected.
+        method (str): The name of the ModelMgr method to call.
+        args (list): The positional arguments of the call.
+        kwargs (dict): The keyword arguments of the call.
+    """
+    # pylint: disable=import-outside-toplevel
+    from query_ai.database import vector_store
+    # pylint: enable=import-outside-toplevel
+
+    log = get_logger(__name__)
+    args = [vector_store if isinstance(arg, VectorStoreReference) else arg for arg in args]
+    kwargs = {key: vector_store if isinstance(value, VectorStoreReference) else value
+              for key, value in kwargs.items()}
+
+    try:
+        kind, result = "result", getattr(model_manager, method)(*args, **kwargs)
+
+        if method in ModelWorkerPool.STREAMING_METHODS:
+            for event in result:
+                results.put((task_id, "event", event))
+            kind, result = "done", None
+    except Exception as exception: # pylint: disable=broad-exception-caught
+        log.exception("The %s call failed in model worker %d.", method, os.getpid())
+
+        try:
+            pickle.dumps(exception)
+        except Exception: # pylint: disable=broad-exception-caught
+            exception = WorkerPoolException(f"{type(exception).__name__}: {exception}")
+
+        kind, result = "error", exception
+
+    put_metrics(results)
+
+    if task_id is not None:
+        results.put((task_id, kind, result))
+# pylint: enable=too-many-arguments, too-many-positional-arguments
+
+def put_metrics(results):
+    """
+    Sends the metrics recorded by a worker since it last sent them, so that the server
+    process exposes them on /metrics. They are sent before the result of a call, hence they
+    are merged by the time the call returns.
+
+    Args:
+        results (multiprocessing.Queue): The results of all the workers.
+    """
+    drained = metrics.drain()
+
+    if drained:
+        results.put((None, "metrics", drained))
+
+# pylint: disable=too-many-instance-attributes
+class ModelWorkerPool:
+    """
+    A class that runs the models in worker processes, each with its own ModelMgr, torch
+    threads and core set, and dispatches the calls of the endpoints to them.
+
+    The weights are loaded once in the server process and the workers are forked afterward,
+    so they share the weights copy-on-write. The server process must not run the models
+    itself: it keeps a single torch thread so that no OpenMP thread pool is forked.
+
+    A call is sent to the worker with the fewest calls in progress, and each worker runs up to
+    its concurrency of calls at the same time. The calls of a worker that
+    exits, or that do not answer within the timeout, fail with WorkerPoolException, and the
+    worker is not replaced. The metrics recorded by the workers are merged into the metrics of
+    the server process.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    STREAMING_METHODS = ("stream_answer",)
+
+    # pylint: disable=too-many-arguments, too-many-positional-arguments
+    def __init__(self, model_manager, workers: int, threads: int = 0, pin_cores: bool = True,
+                 timeout: float = 300, concurrency: int = 0):
+        """
+        Initializes the pool. The workers are started by start.
+
+        Args:
+            model_manager (ModelMgr): The model manager to run in the workers.
+            workers (int): The number of worker processes.
+            threads (int, optional): The torch threads per worker, or 0 for the number of
+                cores of its core set.
+            pin_cores (bool, optional): Pins each worker to its own set of cores.
+            timeout (float, optional): The seconds to wait for the result of a call, or for
+                the next event of a stream.
+            concurrency (int, optional): The calls each worker runs at the same time, or 0 for
+                the maximum batch size of the generator.
+        """
+        self.model_manager = model_manager
+        self.workers = workers
+        self.threads = threads
+        self.pin_cores = pin_cores
+        self.timeout = timeout
+        self.concurrency = concurrency or generator_config.max_batch_size
+        self.log = get_logger(__name__)
+        self.__processes = []
+        self.__tasks = []
+        self.__in_progress = []
+        self.__results = None
+        self.__pending = {}
+        self.__ready = set()
+        self.__task_ids = itertools.count()
+        self.__lock = threading.Lock()
+        self.__stopping = threading.Event()
+        self.__stopped = threading.Event()
+    # pylint: enable=too-many-arguments, too-many-positional-arguments
+
+    def start(self):
+        """
+        Loads the weights, prepares the vector store, forks the workers and starts collecting
+        their results. Call it before starting any other thread.
+
+        Raises:
+        WorkerPoolException: If the embedding model runs with ONNX Runtime, whose sessions
+            are not safe to fork.
+        """
+        if embedding_config.backend == "onnx":
+            raise WorkerPoolException("The model workers do not support the onnx backend.")
+
+        context = multiprocessing.get_context("fork")
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") \
+            else list(range(os.cpu_count() or 1))
+
+        torch.set_num_threads(1)
+        os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+        self.log.info("Loading the models before forking %d workers.", self.workers)
+        _ = self.model_manager.embedding_backend, self.model_manager.generator_pipeline
+        self.__prepare_vector_store()
+
+        self.__results = context.Queue()
+
+        for index, core_set in enumerate(split_cores(cores, self.workers)):
+            tasks = context.Queue()
+            process = context.Process(target=run_worker, name=f"query_ai_worker_{index}",
+                                      args=(self.model_manager, tasks, self.__results,
+                                            core_set if self.pin_cores else None,
+                                            self.threads or len(core_set),
+                                            self.concurrency),
+                                      daemon=True)
+            process.start()
+            self.__processes.append(process)
+            self.__tasks.append(tasks)
+            self.__in_progress.append(0)
+
+        threading.Thread(target=self.__collect, name="query_ai_worker_results",
+                         daemon=True).start()
+
+    def __prepare_vector_store(self):
+        # pylint: disable=import-outside-toplevel
+        from query_ai.database import vector_store, DBException
+        # pylint: enable=import-outside-toplevel
+
+        try:
+            vector_store.prepare()
+        except DBException:
+            self.log.exception("Preparing the vector store before forking the workers failed, "
+                               "each worker prepares it on its first search.")
+
+    def __collect(self):
+        while not self.__stopped.is_set():
+            # Checked on every result too, since the other workers may keep the queue busy.
+            self.__fail_exited_workers()
+
+            try:
+                task_id, kind, value = self.__results.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            if kind == "ready":
+                self.__ready.add(value)
+                continue
+            if kind == "metrics":
+                metrics.merge(value)
+                continue
+
+            with self.__lock:
+                worker, results = self.__pending.get(task_id, (None, None))
+
+                if kind != "event":
+                    self.__pending.pop(task_id, None)
+                    if worker is not None:
+                        self.__in_progress[worker] -= 1
+
+            if results is not None:
+                results.put((kind, value))
+
+    def __fail_exited_workers(self):
+        if self.__stopping.is_set():
+            return
+
+        with self.__lock:
+            exited = [index for index, process in enumerate(self.__processes)
+                      if self.__in_progress[index] is not None and not process.is_alive()]
+            failed = []
+
+            for index in exited:
+                self.log.error("Model worker %d exited with code %s.", index,
+                               self.__processes[index].exitcode)
+                self.__in_progress[index] = None
+                failed.extend(task_id for task_id, (worker, _) in self.__pending.items()
+                              if worker == index)
+
+            failed = [self.__pending.pop(task_id)[1] for task_id in failed]
+
+        for results in failed:
+            results.put(("error", WorkerPoolException("The model worker exited.")))
+
+    def __submit(self, method, args, kwargs, worker=None):
+        args = [VectorStoreReference() if self.__is_vector_store(arg) else arg for arg in args]
+        kwargs = {key: VectorStoreReference() if self.__is_vector_store(value) else value
+                  for key, value in kwargs.items()}
+        results = queue.Queue()
+
+        with self.__lock:
+            if worker is None:
+                available = [index for index, count in enumerate(self.__in_progress)
+                             if count is not None]
+
+                if not available:
+                    raise WorkerPoolException("No model worker is running.")
+
+                worker = min(available, key=lambda index: self.__in_progress[index])
+
+            task_id = next(self.__task_ids)
+            self.__pending[task_id] = (worker, results)
+            self.__in_progress[worker] += 1
+
+        self.__tasks[worker].put((task_id, method, args, kwargs))
+
+        return results
+
+    @staticmethod
+    def __is_vector_store(value):
+        # pylint: disable=import-outside-toplevel
+        from query_ai.database import VectorStore
+        # pylint: enable=import-outside-toplevel
+
+        return isinstance(value, VectorStore)
+
+    def __next(self, results, method):
+        try:
+            kind, value = results.get(timeout=self.timeout)
+        except queue.Empty as exception:
+            raise WorkerPoolException(f"The {method} call did not answer within "
+                                      f"{self.timeout} seconds.") from exception
+
+        if kind == "error":
+            raise value
+
+        return kind, value
+
+    def __result(self, results, method):
+        return self.__next(results, method)[1]
+
+    def __call(self, method, *args, **kwargs):
+        return self.__result(self.__submit(method, args, kwargs), method)
+
+    def get_embeddings(self, *args, **kwargs):
+        """
+        Gets the embeddings of the chunks of a text in a worker. See ModelMgr.get_embeddings.
+        """
+        return self.__call("get_embeddings", *args, **kwargs)
+
+    def generate_answer(self, *args, **kwargs):
+        """
+        Answers a question in a worker. See ModelMgr.generate_answer.
+        """
+        return self.__call("generate_answer", *args, **kwargs)
+
+    def generate_answers(self, *args, **kwargs):
+        """
+        Answers several questions in a worker. See ModelMgr.generate_answers.
+        """
+        return self.__call("generate_answers", *args, **kwargs)
+
+    def stream_answer(self, *args, **kwargs):
+        """
+        Answers a question in a worker, yielding its events as they arrive. See
+        ModelMgr.stream_answer.
+        """
+        results = self.__submit("stream_answer", args, kwargs)
+
+        while True:
+            kind, value = self.__next(results, "stream_answer")
+
+            if kind == "done":
+                return
+
+            yield value
+
+    def clear_answer_cache(self):
+        """
+        Asks every worker to clear its answer cache, without waiting for them.
+        """
+        with self.__lock:
+            tasks = [self.__tasks[index] for index, count in enumerate(self.__in_progress)
+                     if count is not None]
+
+        for worker_tasks in tasks:
+            worker_tasks.put((None, "clear_answer_cache", [], {}))
+
+    def is_ready(self):
+        """
+        Checks if a worker has warmed up its models and is still running.
+
+        Returns:
+        bool: True if a worker is ready to answer.
+        """
+        return any(process.pid in self.__ready and process.is_alive()
+                   for process in self.__processes)
+
+    def shutdown(self, timeout: float = 30):
+        """
+        Stops the workers after their current calls.
+
+        Args:
+            timeout (float, optional): The seconds to wait for each worker.
+        """
+        self.__stopping.set()
+
+        for tasks in self.__tasks:
+            tasks.put(None)
+
+        for process in self.__processes:
+            process.join(timeout)
+
+        self.__stopped.set()
+# pylint: enable=too-many-instance-attributes
+
+class WorkerPoolException(Exception):
+    """
+    An exception raised when a call cannot be run by a model worker.
+    """
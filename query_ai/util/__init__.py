@@ -5,16 +5,11 @@ Author: Ron Webb
 Since: 1.0.0
 """
 
-import nltk
 from dotenv import load_dotenv
-from .text_util import TextUtil
+from .text_util import TextUtil, LineTooLongException
 
 load_dotenv()
 
-nltk.download('stopwords', quiet=True)
-nltk.download('wordnet', quiet=True)
-nltk.download('punkt', quiet=True)
-
 text_util = TextUtil()
 
-__all__ = ['text_util']
+__all__ = ['text_util', 'LineTooLongException']
@@ -0,0 +1,117 @@
+"""
+A module to bound the number of requests processed and waiting at the same time.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import threading
+from contextlib import contextmanager
+
+
+class AdmissionController:
+    """
+    A class that admits up to max_concurrent callers at the same time, and lets up to
+    max_queued more callers wait for their turn. The other callers are rejected at once, and
+    the waiting ones after queue_timeout seconds, instead of piling up.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queued: int, queue_timeout: float):
+        """
+        Initializes the controller.
+
+        Args:
+            name (str): The name of the controller.
+            max_concurrent (int): The number of callers admitted at the same time. A value of 0
+                or less admits every caller.
+            max_queued (int): The number of callers waiting for their turn.
+            queue_timeout (float): The seconds a caller may wait for its turn.
+        """
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.__condition = threading.Condition()
+        self.__active = 0
+        self.__waiting = 0
+
+    def __has_turn(self):
+        return self.__active < self.max_concurrent
+
+    def acquire(self):
+        """
+        Waits for the turn of the caller, who must call release when done.
+
+        Raises:
+            AdmissionQueueFullException: If the caller cannot be admitted nor queued.
+            AdmissionTimeoutException: If the caller waited queue_timeout seconds.
+        """
+        with self.__condition:
+            if self.max_concurrent <= 0:
+                self.__active += 1
+                return
+
+            if self.__has_turn() and not self.__waiting:
+                self.__active += 1
+                return
+
+            if self.__waiting >= self.max_queued:
+                raise AdmissionQueueFullException(f"Too many {self.name} requests.")
+
+            self.__waiting += 1
+
+            try:
+                if not self.__condition.wait_for(self.__has_turn, self.queue_timeout):
+                    raise AdmissionTimeoutException(
+                        f"Timed out waiting for a {self.name} request slot.")
+
+                self.__active += 1
+            finally:
+                self.__waiting -= 1
+
+    def release(self):
+        """
+        Ends the turn of a caller and lets the next waiting caller in.
+        """
+        with self.__condition:
+            self.__active -= 1
+            self.__condition.notify()
+
+    @contextmanager
+    def admit(self):
+        """
+        Holds a turn for the duration of a with block. See acquire.
+        """
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def get_stats(self):
+        """
+        Gets the number of admitted and waiting callers.
+
+        Returns:
+            dict: The active and waiting callers.
+        """
+        with self.__condition:
+            return {"active": self.__active, "waiting": self.__waiting}
+
+class AdmissionRejectedException(Exception):
+    """
+    An exception raised when a caller is not admitted.
+    """
+
+class AdmissionQueueFullException(AdmissionRejectedException):
+    """
+    An exception raised when all the turns are taken and the queue is full.
+    """
+
+class AdmissionTimeoutException(AdmissionRejectedException):
+    """
+    An exception raised when a caller waited too long for its turn.
+    """
@@ -0,0 +1,109 @@
+"""
+A module providing a bounded, thread-safe least recently used cache.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    A bounded, thread-safe least recently used cache with an optional time to live.
+
+    Author: Ron Webb
+    Since: 1.1.0
+    """
+
+    def __init__(self, max_size: int, ttl: float = None, clock=time.monotonic):
+        """
+        Initializes the cache.
+
+        Args:
+            max_size (int): The maximum number of entries. A size of 0 disables the cache.
+            ttl (float, optional): The seconds an entry stays valid. None keeps entries until
+                they are evicted.
+            clock (function, optional): Returns the current time in seconds.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.__clock = clock
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key, default=None):
+        """
+        Gets the value of a key and marks it as the most recently used.
+
+        Args:
+            key: The key to look up.
+            default: The value to return if the key is missing or expired.
+
+        Returns:
+            The cached value, or the default.
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+
+            if entry is not None and self.ttl is not None and self.__clock() >= entry[1]:
+                del self.__entries[key]
+                self.__stats["expirations"] += 1
+                entry = None
+
+            if entry is None:
+                self.__stats["misses"] += 1
+                return default
+
+            self.__entries.move_to_end(key)
+            self.__stats["hits"] += 1
+
+            return entry[0]
+
+    def put(self, key, value):
+        """
+        Stores the value of a key, evicting the least recently used entries when full.
+
+        Args:
+            key: The key to store.
+            value: The value to store.
+        """
+        if self.max_size <= 0:
+            return
+
+        expires_at = self.__clock() + self.ttl if self.ttl is not None else None
+
+        with self.__lock:
+            self.__entries[key] = (value, expires_at)
+            self.__entries.move_to_end(key)
+
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+                self.__stats["evictions"] += 1
+
+    def clear(self):
+        """
+        Removes all the entries.
+        """
+        with self.__lock:
+            self.__entries.clear()
+
+    def get_stats(self):
+        """
+        Gets the statistics of the cache.
+
+        Returns:
+            dict: The hits, misses, evictions, expirations and current size of the cache.
+        """
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats["size"] = len(self.__entries)
+
+        return stats
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__entries)
@@ -0,0 +1,29 @@
+"""
+This script rebuilds the vector index of the embeddings, e.g. after a bulk load.
+
+Author: Ron Webb
+Since: 1.1.0
+"""
+
+import sys
+
+from query_ai.database import db_manager
+from query_ai.database.db_manager import DBException
+
+def main():
+    """
+    This function drops and builds the configured vector index.
+    :return: None
+    """
+
+    try:
+        if not db_manager.rebuild_vector_index():
+            print("No vector index was built.")
+    except DBException as e:
+        print(f"Rebuilding the vector index failed with error: {e}")
+        sys.exit(1)
+    finally:
+        db_manager.close()
+
+if __name__ == "__main__":
+    main()
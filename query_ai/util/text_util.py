@@ -5,14 +5,27 @@ Author: Ron Webb
 Since: 1.0.0
 """
 
+import codecs
 import re
-
-from nltk import word_tokenize #pylint: disable=unused-import
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
+import threading
 
 from query_ai.logger import get_logger
 
+_LINE_PATTERN = re.compile(r"[^\r\n]+")
+
+_LINE_BREAK_PATTERN = re.compile(r"\r\n|\r|\n")
+
+_NON_BLANK_LINE_PATTERN = re.compile(r"[^\r\n]*?\S[^\r\n]*")
+
+EMOJI_CHARACTER_CLASS = ("["
+                         "\U0001F600-\U0001F64F"  # emoticons
+                         "\U0001F300-\U0001F5FF"  # symbols & pictographs
+                         "\U0001F680-\U0001F6FF"  # transport & map symbols
+                         "\U0001F1E0-\U0001F1FF"  # flags (iOS)
+                         "]")
+
+_CLEAN_PATTERN = re.compile("<.*?>|" + EMOJI_CHARACTER_CLASS, flags=re.UNICODE)
+
 
 class TextUtil:
     """
@@ -25,82 +38,242 @@ class TextUtil:
 
     def __init__(self):
         """
-        Initializes the TextUtil class with stop words and a lemmatizer.
+        Initializes the TextUtil class. The stop words and the lemmatizer are loaded on first
+        use.
         """
-        self.stop_words = set(stopwords.words('english'))
-        self.lemmatizer = WordNetLemmatizer()
         self.log = get_logger(__name__)
+        self.__stop_words = None
+        self.__lemmatizer = None
+        self.__lock = threading.Lock()
 
-    def split_by_paragraph(self, text):
+    @staticmethod
+    def __ensure_nltk_resource(name, path):
         """
-        Splits a large text into paragraphs.
+        Downloads an NLTK resource if it is not installed yet.
 
-        Handles various newline characters and empty paragraphs.
+        Args:
+            name (str): The name of the resource to download.
+            path (str): The path of the resource in the NLTK data directories.
+        """
+        import nltk # pylint: disable=import-outside-toplevel
+
+        try:
+            nltk.data.find(path)
+        except LookupError:
+            nltk.download(name, quiet=True)
+
+    @property
+    def stop_words(self):
+        """
+        The English stop words, downloaded on first use if needed.
+        """
+        with self.__lock:
+            if self.__stop_words is None:
+                TextUtil.__ensure_nltk_resource('stopwords', 'corpora/stopwords')
+                from nltk.corpus import stopwords # pylint: disable=import-outside-toplevel
+                self.__stop_words = set(stopwords.words('english'))
+
+            return self.__stop_words
+
+    @property
+    def lemmatizer(self):
+        """
+        The WordNet lemmatizer, downloaded on first use if needed.
+        """
+        with self.__lock:
+            if self.__lemmatizer is None:
+                TextUtil.__ensure_nltk_resource('wordnet', 'corpora/wordnet')
+                from nltk.stem import WordNetLemmatizer # pylint: disable=import-outside-toplevel
+                self.__lemmatizer = WordNetLemmatizer()
+
+            return self.__lemmatizer
+
+    def iter_paragraphs(self, text):
+        """
+        Yields the paragraphs of a large text one at a time.
+
+        A paragraph is a line ended by any newline character (Windows, Linux, Mac). The
+        paragraphs are stripped and the empty ones are skipped. The text is read in a single
+        pass without copying it.
 
         Args:
             text (str): The input text.
 
-        Returns:
-            list: A list of strings, where each string is a paragraph.
-                  Returns an empty list if the input text is empty or None.
+        Yields:
+            str: The next non-empty paragraph.
         """
         if not text:
-            return []
+            return
 
-        # Normalize newline characters (Windows, Linux, Mac)
-        text = text.replace("\r\n", "\n").replace("\r", "\n")
+        for line in _LINE_PATTERN.finditer(text):
+            paragraph = line.group().strip()
 
-        paragraphs = text.split("\n")
+            if paragraph:
+                yield paragraph
 
-        paragraphs = [p.strip() for p in paragraphs if p.strip()] #Removes empty paragraphs
+    def iter_stream_lines(self, stream, read_size: int, max_line_size: int,
+                          split_long_lines: bool = True):
+        """
+        Yields the lines of a UTF-8 byte stream as they are read.
 
-        self.log.debug("Split text by paragraph:\n%s", paragraphs)
+        At most read_size bytes plus one unfinished line are held in memory at a time.
 
-        return paragraphs
+        Args:
+            stream: A binary file-like object, e.g. the body of a request.
+            read_size (int): The number of bytes to read at a time.
+            max_line_size (int): The maximum number of characters of an unfinished line.
+            split_long_lines (bool): Yields a longer line in pieces, cut at the last whitespace
+                if possible. Otherwise a LineTooLongException is raised.
+
+        Yields:
+            str: The next line, without its newline characters.
+
+        Raises:
+            LineTooLongException: If a line is longer than max_line_size and split_long_lines is
+                False.
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        pending = ""
+
+        while True:
+            data = stream.read(read_size)
+            lines = _LINE_BREAK_PATTERN.split(pending + decoder.decode(data, final=not data))
+            pending = lines.pop()
+
+            for line in lines:
+                pieces, line = TextUtil.__cut_long_line(line, max_line_size, split_long_lines)
+                yield from pieces
+                yield line
+
+            pieces, pending = TextUtil.__cut_long_line(pending, max_line_size, split_long_lines)
+            yield from pieces
+
+            if not data:
+                if pending:
+                    yield pending
+                return
+
+    @staticmethod
+    def __cut_long_line(line, max_line_size, split_long_lines):
+        """
+        Cuts the pieces longer than max_line_size from the start of a line.
+
+        Returns:
+            tuple: The pieces cut and the rest of the line.
+        """
+        pieces = []
 
-    def __remove_emojis(self, text):
+        while len(line) > max_line_size:
+            if not split_long_lines:
+                raise LineTooLongException(f"A line is longer than {max_line_size} characters.")
+
+            cut = line.rfind(" ", 0, max_line_size) + 1 or max_line_size
+            pieces.append(line[:cut])
+            line = line[cut:]
+
+        return pieces, line
+
+    def count_paragraphs(self, text):
         """
-        Removes emojis from the input text.
+        Counts the paragraphs that iter_paragraphs yields, without building them.
 
         Args:
             text (str): The input text.
 
         Returns:
-            str: The text with emojis removed.
+            int: The number of non-empty paragraphs.
         """
-        emoji_pattern = re.compile("["
-                                   u"\U0001F600-\U0001F64F"  # emoticons
-                                   u"\U0001F300-\U0001F5FF"  # symbols & pictographs
-                                   u"\U0001F680-\U0001F6FF"  # transport & map symbols
-                                   u"\U0001F1E0-\U0001F1FF"  # flags (iOS)
-                                   "]", flags=re.UNICODE)
+        if not text:
+            return 0
 
-        cleaned_text = emoji_pattern.sub(r'', text) # no emoji
+        return sum(1 for _ in _NON_BLANK_LINE_PATTERN.finditer(text))
 
-        self.log.debug("Removed emojis from text:\n%s", cleaned_text)
+    def split_by_paragraph(self, text):
+        """
+        Splits a large text into paragraphs.
+
+        Handles various newline characters and empty paragraphs.
 
-        return cleaned_text
+        Args:
+            text (str): The input text.
+
+        Returns:
+            list: A list of strings, where each string is a paragraph.
+                  Returns an empty list if the input text is empty or None.
+        """
+        paragraphs = list(self.iter_paragraphs(text))
+
+        self.log.debug("Split text by paragraph:\n%s", paragraphs)
+
+        return paragraphs
 
     def clean_text(self, text):
         """
         Cleans the input text by removing HTML tags and emojis.
 
+        Both are removed by a single substitution with a precompiled pattern.
+
         Args:
             text (str): The input text.
 
         Returns:
             str: The cleaned text.
         """
-        # text = text.lower()  # Lowercasing
-        # text = text.translate(str.maketrans('', '', string.punctuation))  # Remove punctuation
-        # text = re.sub(r'\d+', '', text)  # Remove numbers
-        text = re.sub(r'<.*?>', '', text) # Remove HTML tags
-        text = self.__remove_emojis(text) # Remove emojis
-        # words = word_tokenize(text)
-        # words = [word for word in words if word not in self.stop_words] # Remove Stop words
-        # words = [self.lemmatizer.lemmatize(word) for word in words] # Lemmatization
-        # cleaned_text = " ".join(words)
+        text = _CLEAN_PATTERN.sub('', text)
 
         self.log.debug("Cleaned text:\n%s", text)
 
         return text
+
+    def iter_clean_paragraphs(self, text):
+        """
+        Yields the cleaned paragraphs of a large text one at a time.
+
+        Args:
+            text (str): The input text.
+
+        Yields:
+            str: The next non-empty paragraph with its HTML tags and emojis removed.
+        """
+        for paragraph in self.iter_paragraphs(text):
+            yield self.clean_text(paragraph)
+
+    def iter_packed_paragraphs(self, paragraphs, max_words: int, boundary_pattern: str = None):
+        """
+        Groups consecutive paragraphs into packs of up to max_words words, so that many short
+        paragraphs can be embedded as a single chunk.
+
+        A paragraph that has more than max_words words is a pack on its own. A paragraph
+        matching the boundary pattern (e.g., a heading) always starts a new pack.
+
+        Args:
+            paragraphs (iterable): The paragraphs to pack, read one at a time.
+            max_words (int): The maximum number of words of a pack.
+            boundary_pattern (str, optional): A regular expression searched in each paragraph.
+
+        Yields:
+            list: The next pack of consecutive paragraphs.
+        """
+        boundary = re.compile(boundary_pattern) if boundary_pattern else None
+        pack = []
+        pack_words = 0
+
+        for paragraph in paragraphs:
+            words = len(paragraph.split())
+
+            if pack and (pack_words + words > max_words
+                         or (boundary is not None and boundary.search(paragraph))):
+                yield pack
+                pack = []
+                pack_words = 0
+
+            pack.append(paragraph)
+            pack_words += words
+
+        if pack:
+            yield pack
+
+class LineTooLongException(Exception):
+    """
+    An exception raised when a line of a stream cannot be held in memory.
+    """
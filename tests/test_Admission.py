@@ -0,0 +1,104 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from flask import Flask
+
+from query_ai.api.admission import Admission
+from query_ai.api.context import Context
+from query_ai.api.health import Health
+from query_ai.api.query import Query
+from query_ai.metrics import admission_rejected_total
+
+
+class TestAdmission(unittest.TestCase):
+    def setUp(self):
+        server_config = MagicMock()
+        server_config.get_retry_after.return_value = 7
+        server_config.get_limit.side_effect = lambda name: (1, 0, 0.05) if name == 'query' \
+            else (1, 1, 0.05)
+
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        Context(self.app)
+        Query(self.app)
+        Health(self.app)
+        self.admission = Admission(self.app, server_config)
+        self.client = self.app.test_client()
+
+    @patch('query_ai.model.model_manager.ModelMgr.generate_answer')
+    def test_admits_and_releases_requests(self, mock_generate):
+        mock_generate.return_value = [{'generated_text': 'answer'}]
+
+        for _ in range(2):
+            response = self.client.post('/api/v1/query', json={'question': 'test?',
+                                                               'context': 'context'})
+            self.assertEqual(200, response.status_code)
+
+        self.assertEqual({"active": 0, "waiting": 0},
+                         self.admission.controllers['query'].get_stats())
+
+    @patch('query_ai.model.model_manager.ModelMgr.generate_answer')
+    def test_rejects_requests_over_the_limit(self, mock_generate):
+        started = threading.Event()
+        finish = threading.Event()
+
+        def generate(*args, **kwargs):
+            started.set()
+            finish.wait(5)
+            return [{'generated_text': 'answer'}]
+
+        mock_generate.side_effect = generate
+        before = admission_rejected_total.get(limit='query', status='429')
+        thread = threading.Thread(target=lambda: self.client.post(
+            '/api/v1/query', json={'question': 'slow?', 'context': 'context'}))
+        thread.start()
+        started.wait(5)
+
+        rejected = self.client.post('/api/v1/query/batch', json={'questions': ['test?']})
+        health = self.client.get('/api/v1/health')
+
+        finish.set()
+        thread.join(5)
+
+        self.assertEqual(429, rejected.status_code)
+        self.assertEqual('7', rejected.headers['Retry-After'])
+        self.assertIn('error', rejected.get_json())
+        self.assertEqual(before + 1, admission_rejected_total.get(limit='query', status='429'))
+        self.assertEqual(200, health.status_code)
+
+    @patch('query_ai.model.model_manager.ModelMgr.stream_answer')
+    def test_holds_turn_until_streamed_response_is_closed(self, mock_stream):
+        controller = self.admission.controllers['query']
+        active = []
+
+        def stream(*args, **kwargs):
+            active.append(controller.get_stats()['active'])
+            yield 'answer', {'answer': 'streamed'}
+
+        mock_stream.side_effect = stream
+
+        response = self.client.post('/api/v1/query', json={'question': 'test?', 'context': 'context'},
+                                    headers={'Accept': 'text/event-stream'}, buffered=False)
+
+        self.assertEqual(1, controller.get_stats()['active'])
+        self.assertIn('streamed', response.get_data(as_text=True))
+        response.close()
+
+        self.assertEqual([1], active)
+        self.assertEqual(0, controller.get_stats()['active'])
+
+    def test_times_out_queued_requests(self):
+        controller = self.admission.controllers['context']
+        controller.acquire()
+
+        try:
+            response = self.client.put('/api/v1/context', json={'context': 'test'})
+        finally:
+            controller.release()
+
+        self.assertEqual(503, response.status_code)
+        self.assertEqual('7', response.headers['Retry-After'])
+
+if __name__ == '__main__':
+    unittest.main()
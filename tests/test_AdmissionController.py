@@ -0,0 +1,69 @@
+import threading
+import time
+import unittest
+
+from query_ai.util.admission_controller import AdmissionController, AdmissionQueueFullException, \
+    AdmissionTimeoutException
+
+
+class TestAdmissionController(unittest.TestCase):
+
+    def test_rejects_callers_over_the_queue_at_once(self):
+        controller = AdmissionController("query", 1, 0, 10)
+        controller.acquire()
+
+        start = time.monotonic()
+        with self.assertRaises(AdmissionQueueFullException):
+            controller.acquire()
+
+        self.assertLess(time.monotonic() - start, 1)
+        controller.release()
+
+        with controller.admit():
+            self.assertEqual({"active": 1, "waiting": 0}, controller.get_stats())
+        self.assertEqual({"active": 0, "waiting": 0}, controller.get_stats())
+
+    def test_times_out_waiting_callers(self):
+        controller = AdmissionController("query", 1, 1, 0.05)
+        controller.acquire()
+
+        with self.assertRaises(AdmissionTimeoutException):
+            controller.acquire()
+
+        self.assertEqual({"active": 1, "waiting": 0}, controller.get_stats())
+
+    def test_admits_waiting_caller_when_released(self):
+        controller = AdmissionController("context", 1, 1, 5)
+        controller.acquire()
+        admitted = threading.Event()
+
+        def wait_for_turn():
+            with controller.admit():
+                admitted.set()
+
+        thread = threading.Thread(target=wait_for_turn)
+        thread.start()
+
+        while controller.get_stats()["waiting"] == 0:
+            time.sleep(0.01)
+
+        with self.assertRaises(AdmissionQueueFullException):
+            controller.acquire()
+
+        self.assertFalse(admitted.is_set())
+        controller.release()
+        thread.join(5)
+
+        self.assertTrue(admitted.is_set())
+        self.assertEqual({"active": 0, "waiting": 0}, controller.get_stats())
+
+    def test_admits_every_caller_without_limit(self):
+        controller = AdmissionController("query", 0, 0, 0)
+
+        for _ in range(5):
+            controller.acquire()
+
+        self.assertEqual(5, controller.get_stats()["active"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import threading
+import unittest
+
+from query_ai.model.batch_scheduler import BatchScheduler
+
+
+def submit_concurrently(scheduler, items):
+    results = {}
+    barrier = threading.Barrier(len(items))
+
+    def worker(item):
+        barrier.wait()
+        try:
+            results[item] = scheduler.submit(item)
+        except Exception as exception:
+            results[item] = exception
+
+    threads = [threading.Thread(target=worker, args=(item,)) for item in items]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+class TestBatchScheduler(unittest.TestCase):
+
+    def test_groups_concurrent_items_into_batches(self):
+        batches = []
+
+        def process_batch(items):
+            batches.append(list(items))
+            return [item * 10 for item in items]
+
+        scheduler = BatchScheduler(process_batch, max_batch_size=8, max_wait=0.5, name='test')
+        results = submit_concurrently(scheduler, [1, 2, 3, 4])
+
+        self.assertEqual({1: 10, 2: 20, 3: 30, 4: 40}, results)
+        self.assertEqual(1, len(batches))
+        self.assertEqual([1, 2, 3, 4], sorted(batches[0]))
+
+    def test_respects_max_batch_size(self):
+        batches = []
+
+        def process_batch(items):
+            batches.append(len(items))
+            return items
+
+        scheduler = BatchScheduler(process_batch, max_batch_size=2, max_wait=0.5, name='test')
+        results = submit_concurrently(scheduler, list(range(5)))
+
+        self.assertEqual({item: item for item in range(5)}, results)
+        self.assertTrue(all(size <= 2 for size in batches))
+        self.assertEqual(5, sum(batches))
+
+    def test_propagates_errors_to_each_caller(self):
+        def process_batch(items):
+            raise ValueError("generation failed")
+
+        scheduler = BatchScheduler(process_batch, max_batch_size=4, max_wait=0.1, name='test')
+        results = submit_concurrently(scheduler, ['a', 'b'])
+
+        self.assertEqual(2, len(results))
+        self.assertTrue(all(isinstance(result, ValueError) for result in results.values()))
+
+    def test_fails_each_caller_when_results_are_missing(self):
+        def process_batch(items):
+            return items[:1]
+
+        scheduler = BatchScheduler(process_batch, max_batch_size=4, max_wait=0.5, name='test')
+        results = submit_concurrently(scheduler, ['a', 'b'])
+
+        self.assertEqual(2, len(results))
+        self.assertTrue(all(isinstance(result, ValueError) for result in results.values()))
+
+    def test_processes_in_calling_thread_without_batching(self):
+        threads = []
+
+        def process_batch(items):
+            threads.append(threading.current_thread())
+            return items
+
+        scheduler = BatchScheduler(process_batch, max_batch_size=1, max_wait=0.1, name='test')
+
+        self.assertEqual('item', scheduler.submit('item'))
+        self.assertEqual([threading.current_thread()], threads)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import threading
+import time
+import unittest
+
+import psycopg2
+
+from unittest.mock import MagicMock
+
+from query_ai.database.db_manager import ConnectionPool, DBException
+
+
+def new_connection():
+    connection = MagicMock()
+    connection.closed = 0
+    return connection
+
+
+class TestConnectionPool(unittest.TestCase):
+
+    def test_opens_min_size_connections(self):
+        factory = MagicMock(side_effect=new_connection)
+
+        pool = ConnectionPool(factory, min_size=2, max_size=5)
+
+        self.assertEqual(2, factory.call_count)
+        stats = pool.get_stats()
+        self.assertEqual(2, stats['size'])
+        self.assertEqual(2, stats['idle'])
+        self.assertEqual(0, stats['in_use'])
+
+    def test_reuses_released_connection(self):
+        factory = MagicMock(side_effect=new_connection)
+        pool = ConnectionPool(factory, min_size=0, max_size=5)
+
+        with pool.connection() as first:
+            self.assertEqual(1, pool.get_stats()['in_use'])
+        with pool.connection() as second:
+            pass
+
+        self.assertIs(first, second)
+        self.assertEqual(1, factory.call_count)
+        self.assertEqual(2, pool.get_stats()['acquired'])
+
+    def test_times_out_when_exhausted(self):
+        pool = ConnectionPool(new_connection, min_size=0, max_size=1, timeout=0.05)
+        pool.acquire()
+
+        with self.assertRaises(DBException):
+            pool.acquire()
+
+        self.assertEqual(1, pool.get_stats()['timeouts'])
+
+    def test_waits_for_released_connection(self):
+        pool = ConnectionPool(new_connection, min_size=0, max_size=1, timeout=5)
+        connection = pool.acquire()
+
+        releaser = threading.Timer(0.05, pool.release, args=(connection,))
+        releaser.start()
+        acquired = pool.acquire()
+        releaser.join()
+
+        self.assertIs(connection, acquired)
+        stats = pool.get_stats()
+        self.assertEqual(1, stats['waited'])
+        self.assertGreater(stats['max_wait_time'], 0)
+
+    def test_replaces_closed_connection(self):
+        factory = MagicMock(side_effect=new_connection)
+        pool = ConnectionPool(factory, min_size=1, max_size=1)
+        with pool.connection() as connection:
+            pass
+        connection.closed = 1
+
+        with pool.connection() as replacement:
+            pass
+
+        self.assertIsNot(connection, replacement)
+        self.assertEqual(1, pool.get_stats()['discarded'])
+
+    def test_health_checks_idle_connection(self):
+        pool = ConnectionPool(new_connection, min_size=1, max_size=1, health_check_interval=0)
+        with pool.connection() as connection:
+            pass
+        connection.cursor.return_value.execute.side_effect = psycopg2.OperationalError
+
+        time.sleep(0.01)
+        with pool.connection() as replacement:
+            pass
+
+        self.assertIsNot(connection, replacement)
+        connection.close.assert_called_once()
+
+    def test_discards_connection_on_operational_error(self):
+        pool = ConnectionPool(new_connection, min_size=0, max_size=1)
+
+        with self.assertRaises(psycopg2.OperationalError):
+            with pool.connection():
+                raise psycopg2.OperationalError("server closed the connection")
+
+        stats = pool.get_stats()
+        self.assertEqual(0, stats['size'])
+        self.assertEqual(0, stats['in_use'])
+
+    def test_raises_when_factory_fails(self):
+        pool = ConnectionPool(lambda: None, min_size=0, max_size=1)
+
+        with self.assertRaises(DBException):
+            pool.acquire()
+
+        self.assertEqual(0, pool.get_stats()['size'])
+
+if __name__ == '__main__':
+    unittest.main()
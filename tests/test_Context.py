@@ -2,6 +2,9 @@ import unittest
 from unittest.mock import patch
 from flask import Flask
 from query_ai.api.context import Context
+from query_ai.config import ingestion_config
+from query_ai.job import job_manager, JobQueueFullException
+from query_ai.metrics import chunks_total
 
 class TestContext(unittest.TestCase):
     def setUp(self):
@@ -10,28 +13,27 @@ class TestContext(unittest.TestCase):
         Context(self.app)
         self.client = self.app.test_client()
 
-    @patch('query_ai.database.is_existing_context')
+    @patch('query_ai.database.db_manager.DBMgr.ensure_vector_index')
     @patch('query_ai.model.model_manager.ModelMgr.get_embeddings')
-    @patch('query_ai.database.db_manager.DBMgr.execute')
-    @patch('query_ai.util.text_util.TextUtil.split_by_paragraph')
+    @patch('query_ai.database.db_manager.DBMgr.execute_in_transaction')
+    @patch('query_ai.util.text_util.TextUtil.iter_paragraphs')
     @patch('query_ai.util.text_util.TextUtil.clean_text')
-    def test_saves_new_context_successfully(self, mock_clean, mock_split, mock_execute, mock_embed, mock_exists):
+    def test_saves_new_context_successfully(self, mock_clean, mock_split, mock_transaction, mock_embed, mock_ensure_index):
         mock_split.return_value = ["paragraph1"]
         mock_clean.return_value = "cleaned paragraph"
         mock_embed.return_value = [(1, 0, 10, "chunk", [0.1, 0.2])]
-        mock_execute.return_value = False
+        mock_transaction.return_value = 1
 
         response = self.client.put('/api/v1/context', json={'context': 'test context'})
 
         self.assertEqual(201, response.status_code)
 
-    @patch('query_ai.database.db_manager.is_existing_context')
     @patch('query_ai.model.model_manager.ModelMgr.get_embeddings')
-    @patch('query_ai.database.db_manager.DBMgr.execute')
-    @patch('query_ai.util.text_util.TextUtil.split_by_paragraph')
+    @patch('query_ai.database.db_manager.DBMgr.execute_in_transaction')
+    @patch('query_ai.util.text_util.TextUtil.iter_paragraphs')
     @patch('query_ai.util.text_util.TextUtil.clean_text')
-    def test_returns_200_for_existing_context(self, mock_clean, mock_split, mock_execute, mock_embed, mock_exists):
-        mock_execute.return_value = True
+    def test_returns_200_for_existing_context(self, mock_clean, mock_split, mock_transaction, mock_embed):
+        mock_transaction.return_value = 0
         mock_split.return_value = ["paragraph1"]
         mock_clean.return_value = "cleaned paragraph"
         mock_embed.return_value = [(1, 0, 10, "chunk", [0.1, 0.2])]
@@ -40,7 +42,43 @@ class TestContext(unittest.TestCase):
 
         self.assertEqual(200, response.status_code)
 
-    @patch('query_ai.util.text_util.TextUtil.split_by_paragraph')
+    @patch('query_ai.database.db_manager.DBMgr.ensure_vector_index')
+    @patch('query_ai.model.model_manager.ModelMgr.clear_answer_cache')
+    @patch('query_ai.model.model_manager.ModelMgr.get_embeddings')
+    @patch('query_ai.database.db_manager.DBMgr.execute_in_transaction')
+    @patch('query_ai.util.text_util.TextUtil.iter_paragraphs')
+    @patch('query_ai.util.text_util.TextUtil.clean_text')
+    def test_clears_answer_cache_only_when_inserted(self, mock_clean, mock_split, mock_transaction, mock_embed, mock_clear, mock_ensure_index):
+        mock_split.return_value = ["paragraph1"]
+        mock_clean.return_value = "cleaned paragraph"
+        mock_embed.return_value = [(1, 0, 10, "chunk", [0.1, 0.2])]
+
+        mock_transaction.return_value = 0
+        self.client.put('/api/v1/context', json={'context': 'test context'})
+        mock_clear.assert_not_called()
+
+        mock_transaction.return_value = 1
+        self.client.put('/api/v1/context', json={'context': 'test context'})
+        mock_clear.assert_called_once()
+        mock_ensure_index.assert_called_once()
+
+    @patch('query_ai.database.db_manager.DBMgr.ensure_vector_index')
+    @patch('query_ai.model.model_manager.ModelMgr.get_embeddings')
+    @patch('query_ai.database.db_manager.DBMgr.execute_in_transaction')
+    @patch('query_ai.util.text_util.TextUtil.iter_paragraphs')
+    @patch('query_ai.util.text_util.TextUtil.clean_text')
+    def test_persists_all_paragraphs_in_one_transaction(self, mock_clean, mock_split, mock_transaction, mock_embed, mock_ensure_index):
+        mock_split.return_value = ["paragraph1", "paragraph2"]
+        mock_clean.side_effect = lambda paragraph: paragraph
+        mock_embed.side_effect = [[(0, 0, 1, "chunk1", [0.1])], [(0, 0, 1, "chunk2", [0.2])]]
+        mock_transaction.return_value = 2
+
+        response = self.client.put('/api/v1/context', json={'context': 'test context'})
+
+        self.assertEqual(201, response.status_code)
+        mock_transaction.assert_called_once()
+
+    @patch('query_ai.util.text_util.TextUtil.iter_paragraphs')
     def test_handles_empty_context(self, mock_split):
         mock_split.return_value = []
 
@@ -48,6 +86,48 @@ class TestContext(unittest.TestCase):
 
         self.assertEqual(400, response.status_code)
 
+    @patch('query_ai.database.db_manager.DBMgr.ensure_vector_index')
+    @patch('query_ai.model.model_manager.ModelMgr.get_embeddings')
+    @patch('query_ai.database.db_manager.DBMgr.execute_in_transaction')
+    @patch('query_ai.util.text_util.TextUtil.iter_paragraphs')
+    @patch('query_ai.util.text_util.TextUtil.clean_text')
+    def test_queues_async_ingestion_job(self, mock_clean, mock_split, mock_transaction, mock_embed, mock_ensure_index):
+        mock_split.return_value = ["paragraph1", "paragraph2"]
+        mock_clean.side_effect = lambda paragraph: paragraph
+        mock_embed.side_effect = [[(0, 0, 1, "chunk1", [0.1]), (1, 1, 2, "chunk2", [0.2])],
+                                  [(0, 0, 1, "chunk3", [0.3])]]
+        mock_transaction.return_value = 2
+
+        response = self.client.put('/api/v1/context?async=true', json={'context': 'test context'})
+
+        self.assertEqual(202, response.status_code)
+        job_id = response.get_json()['id']
+        self.assertEqual(f'/api/v1/context/jobs/{job_id}', response.headers['Location'])
+
+        job_manager.shutdown()
+
+        job = self.client.get(f'/api/v1/context/jobs/{job_id}').get_json()
+        self.assertEqual('completed', job['status'])
+        self.assertEqual(2, job['paragraphs_done'])
+        self.assertEqual(3, job['chunks_done'])
+        self.assertEqual(2, job['chunks_inserted'])
+        self.assertEqual(1, job['chunks_skipped'])
+
+    @patch('query_ai.job.job_manager.JobMgr.submit')
+    def test_rejects_async_ingestion_when_queue_is_full(self, mock_submit):
+        mock_submit.side_effect = JobQueueFullException("The ingestion queue is full.")
+
+        response = self.client.put('/api/v1/context', json={'context': 'test context'},
+                                   headers={'Prefer': 'respond-async'})
+
+        self.assertEqual(503, response.status_code)
+        self.assertIn('Retry-After', response.headers)
+
+    def test_returns_404_for_unknown_job(self):
+        response = self.client.get('/api/v1/context/jobs/unknown')
+
+        self.assertEqual(404, response.status_code)
+
     def test_rejects_missing_context_field(self):
         response = self.client.put('/api/v1/context', json={})
 
@@ -58,5 +138,99 @@ class TestContext(unittest.TestCase):
 
         self.assertEqual(415, response.status_code)
 
+    @patch.object(ingestion_config, 'stream_flush_records', 2)
+    @patch.object(ingestion_config, 'stream_read_size', 8)
+    @patch('query_ai.database.db_manager.DBMgr.ensure_vector_index')
+    @patch('query_ai.model.model_manager.ModelMgr.get_embeddings')
+    @patch('query_ai.database.db_manager.DBMgr.execute_in_transaction')
+    def test_streams_plain_text_context_in_batches(self, mock_transaction, mock_embed, mock_ensure_index):
+        mock_embed.side_effect = lambda text: [(0, 0, 1, text, [0.1])]
+        mock_transaction.return_value = 1
+        inserted = chunks_total.get(outcome="inserted")
+        skipped = chunks_total.get(outcome="skipped")
+
+        response = self.client.put('/api/v1/context/stream', content_type='text/plain',
+                                   data='First <b>paragraph</b>.\r\n\r\nSecond paragraph.\nThird paragraph.\n')
+
+        self.assertEqual(201, response.status_code)
+        self.assertEqual(['First paragraph.', 'Second paragraph.', 'Third paragraph.'],
+                         [call[0][0] for call in mock_embed.call_args_list])
+        self.assertEqual(2, mock_transaction.call_count)
+        summary = response.get_json()
+        self.assertEqual('completed', summary['status'])
+        self.assertEqual(3, summary['paragraphs_total'])
+        self.assertEqual(2, summary['chunks_inserted'])
+        self.assertEqual(1, summary['chunks_skipped'])
+        self.assertEqual(inserted + 2, chunks_total.get(outcome="inserted"))
+        self.assertEqual(skipped + 1, chunks_total.get(outcome="skipped"))
+
+    @patch('query_ai.model.model_manager.ModelMgr.get_embeddings')
+    @patch('query_ai.database.db_manager.DBMgr.execute_in_transaction')
+    def test_streams_ndjson_context(self, mock_transaction, mock_embed):
+        mock_embed.side_effect = lambda text: [(0, 0, 1, text, [0.1])]
+        mock_transaction.return_value = 0
+
+        response = self.client.put('/api/v1/context/stream', content_type='application/x-ndjson',
+                                   data='{"context": "First document.\\nSecond paragraph."}\n\n"Second document."\n')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(['First document.', 'Second paragraph.', 'Second document.'],
+                         [call[0][0] for call in mock_embed.call_args_list])
+
+    @patch.object(ingestion_config, 'pack_max_words', 4)
+    @patch.object(ingestion_config, 'pack_paragraphs', True)
+    @patch('query_ai.database.db_manager.DBMgr.ensure_vector_index')
+    @patch('query_ai.model.model_manager.ModelMgr.get_embeddings')
+    @patch('query_ai.database.db_manager.DBMgr.execute_in_transaction')
+    def test_packs_short_paragraphs(self, mock_transaction, mock_embed, mock_ensure_index):
+        mock_embed.side_effect = lambda text: [(0, 0, 1, text, [0.1])]
+        mock_transaction.return_value = 2
+
+        response = self.client.put('/api/v1/context/stream', content_type='text/plain',
+                                   data='- one\n- two\n- three\nA long last paragraph.\n')
+
+        self.assertEqual(201, response.status_code)
+        self.assertEqual(['- one\n- two', '- three', 'A long last paragraph.'],
+                         [call[0][0] for call in mock_embed.call_args_list])
+        summary = response.get_json()
+        self.assertEqual(4, summary['paragraphs_total'])
+        self.assertEqual(4, summary['paragraphs_done'])
+        self.assertEqual(3, summary['chunks_done'])
+
+    @patch.object(ingestion_config, 'pack_paragraphs', True)
+    @patch('query_ai.model.model_manager.ModelMgr.get_embeddings')
+    @patch('query_ai.database.db_manager.DBMgr.execute_in_transaction')
+    def test_packs_ndjson_documents_separately(self, mock_transaction, mock_embed):
+        mock_embed.side_effect = lambda text: [(0, 0, 1, text, [0.1])]
+        mock_transaction.return_value = 0
+
+        response = self.client.put('/api/v1/context/stream', content_type='application/x-ndjson',
+                                   data='{"context": "First document.\\nSecond paragraph."}\n"Second document."\n')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(['First document.\nSecond paragraph.', 'Second document.'],
+                         [call[0][0] for call in mock_embed.call_args_list])
+
+    @patch('query_ai.model.model_manager.ModelMgr.get_embeddings')
+    def test_rejects_invalid_ndjson_stream(self, mock_embed):
+        response = self.client.put('/api/v1/context/stream', content_type='application/x-ndjson',
+                                   data='{"text": "No context."}\n')
+
+        self.assertEqual(400, response.status_code)
+        self.assertEqual('failed', response.get_json()['status'])
+        mock_embed.assert_not_called()
+
+    @patch.object(ingestion_config, 'stream_max_line_size', 10)
+    def test_rejects_too_long_ndjson_line(self):
+        response = self.client.put('/api/v1/context/stream', content_type='application/x-ndjson',
+                                   data='{"context": "A long document."}\n')
+
+        self.assertEqual(413, response.status_code)
+
+    def test_rejects_unsupported_stream_content_type(self):
+        response = self.client.put('/api/v1/context/stream', json={'context': 'test context'})
+
+        self.assertEqual(415, response.status_code)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -16,6 +16,10 @@ class TestDBConfig(unittest.TestCase):
         self.assertEqual(config.get_port(), "5432")
         self.assertEqual(config.get_user(), "postgres")
         self.assertEqual(config.get_password(), "mypassword")
+        self.assertEqual(config.get_min_pool_size(), 1)
+        self.assertEqual(config.get_max_pool_size(), 10)
+        self.assertEqual(config.get_pool_timeout(), 30.0)
+        self.assertEqual(config.get_health_check_interval(), 30.0)
 
     @patch('os.getenv')
     def test_initializes_with_custom_values(self, mock_getenv):
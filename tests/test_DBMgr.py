@@ -6,7 +6,8 @@ from unittest.mock import patch, MagicMock
 from psycopg2 import ProgrammingError
 
 from query_ai.config import embedding_config
-from query_ai.database.db_manager import DBMgr, is_existing_context, DBException
+from query_ai.database.db_manager import DBMgr, is_existing_context, persist_contexts, find_nearest_contexts, \
+    find_nearest_contexts_batch, ivfflat_lists_for, content_hash, DBException
 
 
 class TestDBMgr(unittest.TestCase):
@@ -58,10 +59,11 @@ class TestDBMgr(unittest.TestCase):
         cursor = MagicMock()
         connection.cursor.return_value = cursor
         mock_connect.return_value = connection
+        cursor.fetchone.return_value = (False,)
 
         db_mgr.initialize()
 
-        cursor.execute.assert_any_call("CREATE EXTENSION IF NOT EXISTS vector", None)
+        cursor.execute.assert_any_call("CREATE EXTENSION IF NOT EXISTS vector")
         cursor.execute.assert_any_call("""
             CREATE TABLE IF NOT EXISTS qa_embeddings (id SERIAL PRIMARY KEY,
                 chunk_id INTEGER NOT NULL,
@@ -71,7 +73,256 @@ class TestDBMgr(unittest.TestCase):
                 embedding vector(%s)
             )
             """, (embedding_config.token_length,))
-        cursor.execute.assert_any_call("CREATE INDEX IF NOT EXISTS embedding_idx ON qa_embeddings USING ivfflat(embedding)", None)
+        cursor.execute.assert_any_call("DROP INDEX IF EXISTS embedding_idx", None)
+        cursor.execute.assert_any_call("CREATE INDEX IF NOT EXISTS qa_embeddings_embedding_hnsw_idx ON qa_embeddings "
+                                       "USING hnsw (embedding vector_cosine_ops) WITH (m = %s, ef_construction = %s)",
+                                       (16, 64))
+        cursor.execute.assert_any_call("ALTER TABLE qa_embeddings ADD COLUMN IF NOT EXISTS content_hash BYTEA", None)
+        cursor.execute.assert_any_call("UPDATE qa_embeddings SET content_hash = "
+                                       "sha256(convert_to(context, 'UTF8')) WHERE content_hash IS NULL", None)
+        cursor.execute.assert_any_call("CREATE UNIQUE INDEX IF NOT EXISTS qa_embeddings_content_hash_idx "
+                                       "ON qa_embeddings (content_hash)", None)
+
+    @patch('query_ai.database.db_manager.register_vector', new_callable=MagicMock)
+    @patch('psycopg2.connect')
+    def test_prepares_the_database_once_and_closes_its_connections(self, mock_connect, mock_register_vector):
+        db_mgr = DBMgr('test_db', 'user', 'password', 'localhost', 5432)
+        connection = MagicMock()
+        mock_connect.return_value = connection
+        DBMgr.__is_db_initialized__ = False
+
+        with patch.object(DBMgr, 'initialize', side_effect=lambda: db_mgr.execute("SELECT 1")) as mock_initialize:
+            db_mgr.prepare()
+            connection.close.assert_called()
+            connections = mock_connect.call_count
+
+            db_mgr.execute("SELECT 2")
+
+        mock_initialize.assert_called_once()
+        self.assertLess(connections, mock_connect.call_count)
+
+    @patch.dict('os.environ', {'QA_DB_INDEX_TYPE': 'ivfflat', 'QA_DB_IVFFLAT_MIN_ROWS': '1000'})
+    def test_defers_ivfflat_index_until_enough_rows(self):
+        db_mgr = DBMgr('test_db', 'user', 'password', 'localhost', 5432)
+        db_mgr.execute = MagicMock(side_effect=[False, 999])
+
+        self.assertFalse(db_mgr.ensure_vector_index())
+
+        statements = [call[0][0] for call in db_mgr.execute.call_args_list]
+        self.assertFalse(any(statement.startswith("CREATE INDEX") for statement in statements))
+
+    @patch.dict('os.environ', {'QA_DB_INDEX_TYPE': 'ivfflat'})
+    def test_creates_cosine_ivfflat_index_with_lists_from_rows(self):
+        db_mgr = DBMgr('test_db', 'user', 'password', 'localhost', 5432)
+        db_mgr.execute = MagicMock(side_effect=[False, 250000, None, None])
+
+        self.assertTrue(db_mgr.ensure_vector_index())
+
+        db_mgr.execute.assert_any_call("CREATE INDEX IF NOT EXISTS qa_embeddings_embedding_ivfflat_idx "
+                                       "ON qa_embeddings USING ivfflat (embedding vector_cosine_ops) "
+                                       "WITH (lists = %s)", stmt_vars=(250,))
+        db_mgr.execute.assert_called_with("COMMENT ON INDEX qa_embeddings_embedding_ivfflat_idx IS %s",
+                                          stmt_vars=("250000",))
+
+    @patch.dict('os.environ', {'QA_DB_INDEX_TYPE': 'ivfflat'})
+    def test_keeps_ivfflat_index_without_counting_rows(self):
+        db_mgr = DBMgr('test_db', 'user', 'password', 'localhost', 5432)
+        db_mgr.execute = MagicMock(side_effect=[True, ("250000", 499999.0)])
+
+        self.assertTrue(db_mgr.ensure_vector_index())
+
+        statements = [call[0][0] for call in db_mgr.execute.call_args_list]
+        self.assertFalse(any("count(*)" in statement or statement.startswith(("DROP", "CREATE"))
+                             for statement in statements))
+
+    @patch.dict('os.environ', {'QA_DB_INDEX_TYPE': 'ivfflat', 'QA_DB_IVFFLAT_REBUILD_GROWTH': '2'})
+    def test_reports_outgrown_ivfflat_index_without_rebuilding_it(self):
+        db_mgr = DBMgr('test_db', 'user', 'password', 'localhost', 5432)
+        db_mgr.log = MagicMock()
+        db_mgr.execute = MagicMock(side_effect=[True, ("250000", 500000.0), True, ("250000", 600000.0)])
+
+        self.assertTrue(db_mgr.ensure_vector_index())
+        self.assertTrue(db_mgr.ensure_vector_index())
+
+        statements = [call[0][0] for call in db_mgr.execute.call_args_list]
+        self.assertFalse(any(statement.startswith(("DROP", "CREATE")) for statement in statements))
+        db_mgr.log.warning.assert_called_once()
+
+    @patch.dict('os.environ', {'QA_DB_INDEX_TYPE': 'ivfflat'})
+    def test_rebuilds_ivfflat_index_concurrently_and_swaps_it(self):
+        db_mgr = DBMgr('test_db', 'user', 'password', 'localhost', 5432)
+        db_mgr.execute = MagicMock(side_effect=[None, None, 500123, None, None, None])
+        db_mgr.execute_in_transaction = MagicMock()
+        cursor = MagicMock()
+
+        self.assertTrue(db_mgr.rebuild_vector_index())
+
+        self.assertEqual([(("DROP INDEX CONCURRENTLY IF EXISTS qa_embeddings_embedding_ivfflat_idx_new",), {}),
+                          (("DROP INDEX CONCURRENTLY IF EXISTS qa_embeddings_embedding_ivfflat_idx_old",), {}),
+                          (("SELECT count(*) FROM qa_embeddings",), {}),
+                          (("CREATE INDEX CONCURRENTLY qa_embeddings_embedding_ivfflat_idx_new ON qa_embeddings "
+                            "USING ivfflat (embedding vector_cosine_ops) WITH (lists = %s)",), {"stmt_vars": (500,)}),
+                          (("COMMENT ON INDEX qa_embeddings_embedding_ivfflat_idx_new IS %s",),
+                           {"stmt_vars": ("500123",)}),
+                          (("DROP INDEX CONCURRENTLY IF EXISTS qa_embeddings_embedding_ivfflat_idx_old",), {})],
+                         [(call[0][:1], call[1]) for call in db_mgr.execute.call_args_list])
+
+        db_mgr.execute_in_transaction.call_args[0][0](None, cursor)
+        cursor.execute.assert_called_once_with(
+            "ALTER INDEX IF EXISTS qa_embeddings_embedding_ivfflat_idx RENAME TO qa_embeddings_embedding_ivfflat_idx_old; "
+            "ALTER INDEX qa_embeddings_embedding_ivfflat_idx_new RENAME TO qa_embeddings_embedding_ivfflat_idx")
+
+    @patch.dict('os.environ', {'QA_DB_INDEX_TYPE': 'ivfflat', 'QA_DB_IVFFLAT_MIN_ROWS': '1000'})
+    def test_assumes_ivfflat_index_without_row_count_built_with_min_rows(self):
+        db_mgr = DBMgr('test_db', 'user', 'password', 'localhost', 5432)
+        db_mgr.execute = MagicMock(side_effect=[True, (None, 1999.0), True, (None, 2000.0)])
+
+        self.assertTrue(db_mgr.ensure_vector_index())
+        self.assertEqual(2, db_mgr.execute.call_count)
+
+        with self.assertLogs('query_ai.database.db_manager', level='WARNING'):
+            self.assertTrue(db_mgr.ensure_vector_index())
+
+    @patch.dict('os.environ', {'QA_DB_INDEX_TYPE': 'ivfflat', 'QA_DB_IVFFLAT_REBUILD_GROWTH': '0'})
+    def test_never_rebuilds_ivfflat_index_without_growth_factor(self):
+        db_mgr = DBMgr('test_db', 'user', 'password', 'localhost', 5432)
+        db_mgr.execute = MagicMock(side_effect=[True])
+
+        self.assertTrue(db_mgr.ensure_vector_index())
+        db_mgr.execute.assert_called_once()
+
+    @patch.dict('os.environ', {'QA_DB_INDEX_DEFERRED': 'true'})
+    def test_rebuilds_deferred_index(self):
+        db_mgr = DBMgr('test_db', 'user', 'password', 'localhost', 5432)
+        db_mgr.execute = MagicMock()
+        db_mgr.execute_in_transaction = MagicMock()
+
+        self.assertFalse(db_mgr.ensure_vector_index())
+        db_mgr.execute.assert_not_called()
+
+        self.assertTrue(db_mgr.rebuild_vector_index())
+
+        statements = [call[0][0] for call in db_mgr.execute.call_args_list]
+        self.assertEqual("DROP INDEX CONCURRENTLY IF EXISTS qa_embeddings_embedding_hnsw_idx_new", statements[0])
+        self.assertTrue(statements[2].startswith("CREATE INDEX CONCURRENTLY qa_embeddings_embedding_hnsw_idx_new"))
+        db_mgr.execute_in_transaction.assert_called_once()
+
+    def test_computes_ivfflat_lists(self):
+        self.assertEqual(1, ivfflat_lists_for(10))
+        self.assertEqual(1000, ivfflat_lists_for(1000000))
+        self.assertEqual(2000, ivfflat_lists_for(4000000))
+
+    def test_finds_nearest_contexts_with_session_defaults(self):
+        db_manager = MagicMock()
+
+        find_nearest_contexts(db_manager, [0.1, 0.2], limit=3)
+
+        stmt, _, stmt_vars = db_manager.execute.call_args[0]
+        self.assertIn("ORDER BY embedding <=> %(embedding)s LIMIT %(limit)s", stmt)
+        self.assertEqual({"embedding": [0.1, 0.2], "limit": 3}, stmt_vars)
+        db_manager.execute_in_transaction.assert_not_called()
+
+    def test_finds_nearest_contexts_with_query_settings(self):
+        db_manager = MagicMock()
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [("context", 0.1)]
+        db_manager.execute_in_transaction.side_effect = lambda logic: logic(MagicMock(), cursor)
+
+        result = find_nearest_contexts(db_manager, [0.1, 0.2], ef_search=100, probes=20)
+
+        self.assertEqual([("context", 0.1)], result)
+        cursor.execute.assert_any_call("SELECT set_config('hnsw.ef_search', %s, true)", ("100",))
+        cursor.execute.assert_any_call("SELECT set_config('ivfflat.probes', %s, true)", ("20",))
+        db_manager.execute.assert_not_called()
+
+    def test_searches_with_query_settings_through_the_store(self):
+        db_mgr = DBMgr('test_db', 'user', 'password', 'localhost', 5432)
+        cursor = MagicMock()
+        cursor.fetchall.side_effect = [[("context", 0.1)], [(1, "context", 0.1)]]
+        db_mgr.execute_in_transaction = MagicMock(side_effect=lambda logic: logic(MagicMock(), cursor))
+
+        self.assertEqual([("context", 0.1)], db_mgr.find_nearest_contexts([0.1], ef_search=80))
+        cursor.execute.assert_any_call("SELECT set_config('hnsw.ef_search', %s, true)", ("80",))
+
+        self.assertEqual([[("context", 0.1)]], db_mgr.find_nearest_contexts_batch([[0.1]], probes=30))
+        cursor.execute.assert_any_call("SELECT set_config('ivfflat.probes', %s, true)", ("30",))
+
+    def test_finds_nearest_contexts_batch_in_one_query(self):
+        db_manager = MagicMock()
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [(1, "first", 0.1), (1, "second", 0.2), (3, "third", 0.3)]
+        db_manager.execute.side_effect = lambda stmt, logic, stmt_vars: logic(MagicMock(), cursor)
+
+        result = find_nearest_contexts_batch(db_manager, [[0.1], [0.2], [0.3]], limit=2)
+
+        self.assertEqual([[("first", 0.1), ("second", 0.2)], [], [("third", 0.3)]], result)
+        stmt, _, stmt_vars = db_manager.execute.call_args[0]
+        self.assertIn("unnest(%(embeddings)s::vector[]) WITH ORDINALITY", stmt)
+        self.assertIn("CROSS JOIN LATERAL", stmt)
+        self.assertEqual({"embeddings": [[0.1], [0.2], [0.3]], "limit": 2}, stmt_vars)
+        db_manager.execute.assert_called_once()
+
+    def test_finds_nearest_contexts_batch_without_embeddings(self):
+        db_manager = MagicMock()
+
+        self.assertEqual([], find_nearest_contexts_batch(db_manager, []))
+        db_manager.execute.assert_not_called()
+
+    def test_reranks_half_precision_candidates(self):
+        db_manager = MagicMock()
+
+        find_nearest_contexts(db_manager, [0.1, 0.2], limit=3, precision="half", candidates=40)
+
+        stmt, _, stmt_vars = db_manager.execute.call_args[0]
+        dimensions = embedding_config.token_length
+        self.assertIn(f"ORDER BY embedding::halfvec({dimensions}) <=> (%(embedding)s)::halfvec({dimensions}) "
+                      "LIMIT %(candidates)s", stmt)
+        self.assertIn("ORDER BY distance LIMIT %(limit)s", stmt)
+        self.assertEqual({"embedding": [0.1, 0.2], "limit": 3, "candidates": 40}, stmt_vars)
+
+    @patch.dict('os.environ', {'QA_DB_EMBEDDING_PRECISION': 'binary', 'QA_DB_RERANK_CANDIDATES': '100'})
+    def test_searches_binary_index_with_enough_ef_search(self):
+        db_mgr = DBMgr('test_db', 'user', 'password', 'localhost', 5432)
+        cursor = MagicMock()
+        cursor.fetchall.return_value = [(1, "first", 0.1)]
+        db_mgr.execute_in_transaction = MagicMock(side_effect=lambda logic: logic(MagicMock(), cursor))
+
+        self.assertEqual([[("first", 0.1)]], db_mgr.find_nearest_contexts_batch([[0.1]], limit=2))
+
+        cursor.execute.assert_any_call("SELECT set_config('hnsw.ef_search', %s, true)", ("100",))
+        stmt, stmt_vars = cursor.execute.call_args[0]
+        self.assertIn("binary_quantize(embedding)::bit(", stmt)
+        self.assertIn("<~> binary_quantize((searched.embedding)::vector)", stmt)
+        self.assertEqual(100, stmt_vars["candidates"])
+
+    @patch.dict('os.environ', {'QA_DB_EMBEDDING_PRECISION': 'half'})
+    def test_migrates_vector_index_to_half_precision(self):
+        db_mgr = DBMgr('test_db', 'user', 'password', 'localhost', 5432)
+        db_mgr.execute = MagicMock(return_value=False)
+
+        db_mgr.initialize()
+
+        statements = [call[0][0] for call in db_mgr.execute.call_args_list]
+        self.assertIn("DROP INDEX IF EXISTS qa_embeddings_embedding_hnsw_idx", statements)
+        self.assertNotIn("DROP INDEX IF EXISTS qa_embeddings_embedding_half_hnsw_idx", statements)
+        self.assertIn("CREATE INDEX IF NOT EXISTS qa_embeddings_embedding_half_hnsw_idx ON qa_embeddings "
+                      f"USING hnsw ((embedding::halfvec({embedding_config.token_length})) halfvec_cosine_ops) "
+                      "WITH (m = %s, ef_construction = %s)", statements)
+
+    @patch('query_ai.database.db_manager.register_vector', new_callable=MagicMock)
+    @patch('psycopg2.connect')
+    def test_skips_content_hash_migration_when_indexed(self, mock_connect, mock_register_vector):
+        db_mgr = DBMgr('test_db', 'user', 'password', 'localhost', 5432)
+        connection = MagicMock()
+        cursor = MagicMock()
+        connection.cursor.return_value = cursor
+        mock_connect.return_value = connection
+        cursor.fetchone.return_value = (True,)
+
+        db_mgr.initialize()
+
+        statements = [call[0][0] for call in cursor.execute.call_args_list]
+        self.assertFalse(any(statement.startswith(("UPDATE", "DELETE")) for statement in statements))
 
     @patch('query_ai.database.db_manager.register_vector', new_callable=MagicMock)
     @patch('psycopg2.connect')
@@ -87,32 +338,26 @@ class TestDBMgr(unittest.TestCase):
 
         result = is_existing_context(db_mgr, context)
 
-        self.assertEqual(cursor.execute.call_args[0][0], "SELECT EXISTS(SELECT 1 FROM qa_embeddings WHERE context = %s)")
+        self.assertEqual(cursor.execute.call_args[0][0], "SELECT EXISTS(SELECT 1 FROM qa_embeddings "
+                                                         "WHERE content_hash = %s)")
+        self.assertEqual((content_hash(context),), cursor.execute.call_args[0][1])
         self.assertTrue(result)
 
-    @patch('query_ai.database.db_manager.DBMgr.connect')
     @patch('query_ai.database.db_manager.register_vector', new_callable=MagicMock)
-    def test_execute_handles_programming_error_with_numpy(self, mock_register_vector, mock_connect):
+    @patch('psycopg2.connect')
+    def test_registers_vector_once_per_pooled_connection(self, mock_connect, mock_register_vector):
         db_mgr = DBMgr('test_db', 'user', 'password', 'localhost', 5432)
+        connection = MagicMock()
+        connection.closed = 0
+        mock_connect.return_value = connection
 
-        call_count = 0
-        def side_effect(*args, **kwargs):
-            nonlocal call_count
-            if call_count == 0:
-                call_count += 1
-                raise ProgrammingError("can't adapt type 'numpy.ndarray'")
-            else:
-                return MagicMock()
-
-        mock_connection = MagicMock()
-        mock_cursor = mock_connection.cursor.return_value
-        mock_connect.return_value = mock_connection
-        mock_cursor.execute.side_effect = side_effect
+        db_mgr.execute("SELECT 1")
+        db_mgr.execute("SELECT 2")
+        db_mgr.execute("SELECT 3")
 
-        db_mgr.execute("SELECT * FROM qa_embeddings", stmt_vars=(1,))
-
-        mock_register_vector.assert_called_once()
-        mock_cursor.execute.assert_called_with("SELECT * FROM qa_embeddings", (1,))
+        mock_connect.assert_called_once()
+        mock_register_vector.assert_called_once_with(connection)
+        self.assertEqual(1, db_mgr.get_pool_stats()['idle'])
 
     @patch('query_ai.database.db_manager.DBMgr.connect')
     @patch('query_ai.database.db_manager.register_vector', new_callable=MagicMock)
@@ -138,5 +383,56 @@ class TestDBMgr(unittest.TestCase):
 
         mock_register_vector.assert_not_called()
 
+    @patch('query_ai.database.db_manager.execute_values')
+    @patch('query_ai.database.db_manager.register_vector', new_callable=MagicMock)
+    @patch('psycopg2.connect')
+    def test_persists_contexts_in_one_transaction(self, mock_connect, mock_register_vector, mock_execute_values):
+        db_mgr = DBMgr('test_db', 'user', 'password', 'localhost', 5432)
+        connection = MagicMock()
+        connection.closed = 0
+        mock_connect.return_value = connection
+        mock_execute_values.return_value = [(1,), (2,)]
+        records = [(0, 0, 5, "chunk one", [0.1]), (1, 3, 8, "chunk two", [0.2]),
+                   (0, 0, 5, "chunk one", [0.1])]
+
+        result = persist_contexts(db_mgr, records, page_size=500)
+
+        self.assertEqual(2, result)
+        mock_execute_values.assert_called_once()
+        self.assertEqual([record + (content_hash(record[3]),) for record in records[:2]],
+                         mock_execute_values.call_args[0][2])
+        self.assertEqual(500, mock_execute_values.call_args[1]['page_size'])
+        self.assertIn("ON CONFLICT (content_hash) DO NOTHING", mock_execute_values.call_args[0][1])
+        connection.commit.assert_called_once()
+        self.assertTrue(connection.autocommit)
+
+    @patch('query_ai.database.db_manager.register_vector', new_callable=MagicMock)
+    @patch('psycopg2.connect')
+    def test_rolls_back_failed_transaction(self, mock_connect, mock_register_vector):
+        db_mgr = DBMgr('test_db', 'user', 'password', 'localhost', 5432)
+        connection = MagicMock()
+        connection.closed = 0
+        mock_connect.return_value = connection
+
+        def failing_logic(conn, cur):
+            raise ProgrammingError("syntax error")
+
+        with self.assertRaises(DBException):
+            db_mgr.execute_in_transaction(failing_logic)
+
+        connection.rollback.assert_called_once()
+        connection.commit.assert_not_called()
+
+    def test_hashes_content_like_postgresql(self):
+        self.assertEqual(bytes.fromhex("e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855"),
+                         content_hash(""))
+        self.assertEqual(32, len(content_hash("café")))
+
+    def test_persists_nothing_without_records(self):
+        db_mgr = MagicMock()
+
+        self.assertEqual(0, persist_contexts(db_mgr, []))
+        db_mgr.execute_in_transaction.assert_not_called()
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,216 @@
+import os
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from query_ai.config import embedding_config
+from query_ai.config.db_config import DBConfig
+from query_ai.config.index_config import IndexConfig
+from query_ai.benchmark.precision import exact_nearest_contexts, sample_queries
+from query_ai.database.db_manager import DBMgr, content_hash, is_existing_context, persist_contexts, \
+    search_distance
+
+TEST_DATABASE = os.getenv("QA_TEST_DB_NAME")
+
+
+def create_db_manager(index_config=None):
+    db_config = DBConfig()
+    return DBMgr(dbname=TEST_DATABASE, user=db_config.get_user(), password=db_config.get_password(),
+                 host=db_config.get_host(), port=db_config.get_port(),
+                 index_config=index_config if index_config is not None else IndexConfig())
+
+
+def random_embeddings(count, seed=0):
+    embeddings = np.random.default_rng(seed).standard_normal(
+        (count, embedding_config.token_length)).astype(np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+@unittest.skipUnless(TEST_DATABASE, "Set QA_TEST_DB_NAME to a scratch PostgreSQL database with pgvector.")
+class PostgresTestCase(unittest.TestCase):
+    """
+    Runs against the QA_TEST_DB_NAME database reached with the QA_DB_* settings. The
+    qa_embeddings table of that database is dropped before every test.
+    """
+
+    def setUp(self):
+        self.db_managers = []
+        self.connection = create_db_manager().connect()
+        self.sql("DROP TABLE IF EXISTS qa_embeddings")
+        DBMgr.__is_db_initialized__ = False
+
+    def tearDown(self):
+        for db_manager in self.db_managers:
+            db_manager.close()
+        self.connection.close()
+        DBMgr.__is_db_initialized__ = False
+
+    def create_db_manager(self, index_config=None):
+        db_manager = create_db_manager(index_config)
+        self.db_managers.append(db_manager)
+        return db_manager
+
+    def sql(self, stmt, stmt_vars=None):
+        cursor = self.connection.cursor()
+        cursor.execute(stmt, stmt_vars)
+        return cursor.fetchall() if cursor.description else None
+
+    def persist(self, db_manager, contexts, embeddings):
+        return persist_contexts(db_manager, [(index, 0, len(context.split()), context, embedding)
+                                             for index, (context, embedding)
+                                             in enumerate(zip(contexts, embeddings))])
+
+
+class TestDBMgrIntegration(PostgresTestCase):
+
+    def test_initializes_a_new_database(self):
+        db_manager = self.create_db_manager()
+
+        self.assertEqual(1, db_manager.execute("SELECT 1", lambda conn, cur: cur.fetchone()[0]))
+        self.assertEqual([(True,)], self.sql("SELECT to_regclass('qa_embeddings_content_hash_idx') IS NOT NULL"))
+
+    def test_skips_duplicate_contexts_by_content_hash(self):
+        db_manager = self.create_db_manager()
+        embeddings = random_embeddings(3)
+
+        self.assertEqual(2, self.persist(db_manager, ["café au lait", "chunk two", "café au lait"],
+                                         embeddings))
+        self.assertEqual(0, self.persist(db_manager, ["chunk two"], embeddings))
+
+        self.assertTrue(is_existing_context(db_manager, "café au lait"))
+        self.assertFalse(is_existing_context(db_manager, "café"))
+        self.assertEqual([(True,)], self.sql("SELECT bool_and(content_hash = sha256(convert_to(context, 'UTF8'))) "
+                                             "FROM qa_embeddings"))
+
+    def test_migrates_a_table_without_content_hash(self):
+        self.sql(f"""
+            CREATE TABLE qa_embeddings (id SERIAL PRIMARY KEY, chunk_id INTEGER NOT NULL,
+                start_word INTEGER NOT NULL, end_word INTEGER NOT NULL, context TEXT,
+                embedding vector({embedding_config.token_length}))
+            """)
+        for context, embedding in zip(["old chunk", "crème brûlée", "old chunk"], random_embeddings(3)):
+            self.sql("INSERT INTO qa_embeddings (chunk_id, start_word, end_word, context, embedding) "
+                     "VALUES (0, 0, 2, %s, %s::vector)", (context, embedding.tolist()))
+        db_manager = self.create_db_manager()
+
+        self.assertTrue(is_existing_context(db_manager, "crème brûlée"))
+        self.assertEqual([(1, "old chunk", content_hash("old chunk")), (2, "crème brûlée", content_hash("crème brûlée"))],
+                         [(row[0], row[1], bytes(row[2]))
+                          for row in self.sql("SELECT id, context, content_hash FROM qa_embeddings ORDER BY id")])
+        self.assertEqual(0, self.persist(db_manager, ["old chunk"], random_embeddings(1)))
+
+    @patch.dict('os.environ', {'QA_DB_INDEX_TYPE': 'ivfflat', 'QA_DB_IVFFLAT_MIN_ROWS': '20',
+                               'QA_DB_IVFFLAT_REBUILD_GROWTH': '2'})
+    def test_rebuilds_the_outgrown_ivfflat_index_on_reindex(self):
+        db_manager = self.create_db_manager(IndexConfig())
+        embeddings = random_embeddings(50)
+        index_comment = "SELECT obj_description('qa_embeddings_embedding_ivfflat_idx'::regclass, 'pg_class')"
+
+        self.persist(db_manager, [f"chunk {index}" for index in range(19)], embeddings[:19])
+        self.assertFalse(db_manager.ensure_vector_index())
+
+        self.persist(db_manager, [f"chunk {index}" for index in range(25)], embeddings[:25])
+        self.assertTrue(db_manager.ensure_vector_index())
+        self.assertEqual([("25",)], self.sql(index_comment))
+
+        self.persist(db_manager, [f"chunk {index}" for index in range(50)], embeddings)
+        self.sql("ANALYZE qa_embeddings")
+        self.assertTrue(db_manager.ensure_vector_index())
+        self.assertEqual([("25",)], self.sql(index_comment))
+
+        self.assertTrue(db_manager.rebuild_vector_index())
+        self.assertEqual([("50",)], self.sql(index_comment))
+        self.assertEqual([], self.sql("SELECT indexname FROM pg_indexes WHERE indexname LIKE '%\\_new' "
+                                      "OR indexname LIKE '%\\_old'"))
+
+        nearest = db_manager.find_nearest_contexts(embeddings[7], limit=3, probes=1)
+        self.assertEqual("chunk 7", nearest[0][0])
+        self.assertEqual([["chunk 7"], ["chunk 9"]],
+                         [[context for context, _ in rows]
+                          for rows in db_manager.find_nearest_contexts_batch([embeddings[7], embeddings[9]], probes=1)])
+
+    def test_searches_the_hnsw_index_with_query_settings(self):
+        db_manager = self.create_db_manager()
+        embeddings = random_embeddings(30)
+        self.persist(db_manager, [f"chunk {index}" for index in range(30)], embeddings)
+
+        self.assertEqual("chunk 3", db_manager.find_nearest_contexts(embeddings[3], ef_search=100)[0][0])
+        self.assertEqual([[("chunk 4", 0.0)]], [[(context, round(distance, 5)) for context, distance in rows]
+                                               for rows in db_manager.find_nearest_contexts_batch(
+                                                   [embeddings[4]], ef_search=100)])
+
+
+class TestReducedPrecisionIntegration(PostgresTestCase):
+
+    def setUp(self):
+        super().setUp()
+        generator = np.random.default_rng(7)
+        centers = generator.standard_normal((40, embedding_config.token_length))
+        embeddings = centers[generator.integers(0, len(centers), 1500)] \
+            + 0.6 * generator.standard_normal((1500, embedding_config.token_length))
+        self.embeddings = (embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)).astype(np.float32)
+        self.persist(self.create_db_manager(), [f"chunk {index}" for index in range(len(self.embeddings))],
+                     self.embeddings)
+
+    def create_precision_db_manager(self, precision):
+        with patch.dict('os.environ', {'QA_DB_EMBEDDING_PRECISION': precision}):
+            index_config = IndexConfig()
+
+        DBMgr.__is_db_initialized__ = False
+        db_manager = self.create_db_manager(index_config)
+        db_manager.initialize()
+        self.sql("ANALYZE qa_embeddings")
+        return db_manager
+
+    def recall(self, db_manager, queries, limit=10):
+        recalls = []
+        for query in queries:
+            exact = {context for context, _ in exact_nearest_contexts(db_manager, query, limit)}
+            found = {context for context, _ in db_manager.find_nearest_contexts(query, limit)}
+            recalls.append(len(exact & found) / limit)
+        return sum(recalls) / len(recalls)
+
+    def assert_searches_index(self, index_name, precision, query):
+        plan = "\n".join(row[0] for row in self.sql(
+            f"EXPLAIN SELECT context FROM qa_embeddings ORDER BY {search_distance(precision, '%(embedding)s')} "
+            "LIMIT 40", {"embedding": query.tolist()}))
+        self.assertIn(f"Index Scan using {index_name}", plan)
+
+    def test_reranks_half_precision_candidates_with_full_precision_recall(self):
+        db_manager = self.create_precision_db_manager("half")
+        queries = sample_queries(db_manager, 30, 0.1, 42)
+
+        self.assertEqual([("qa_embeddings_embedding_half_hnsw_idx",)],
+                         self.sql("SELECT indexname FROM pg_indexes WHERE indexname LIKE 'qa_embeddings_embedding%'"))
+        self.assert_searches_index("qa_embeddings_embedding_half_hnsw_idx", "half", queries[0])
+        self.assertGreaterEqual(self.recall(db_manager, queries), 0.95)
+
+        nearest = db_manager.find_nearest_contexts(queries[0], 5)
+        self.assertEqual([nearest], db_manager.find_nearest_contexts_batch([queries[0]], 5))
+        self.assertEqual(sorted(distance for _, distance in nearest), [distance for _, distance in nearest])
+
+    def test_reranks_binary_candidates_with_full_precision_recall(self):
+        db_manager = self.create_precision_db_manager("binary")
+        queries = sample_queries(db_manager, 30, 0.1, 42)
+
+        self.assertEqual([("qa_embeddings_embedding_binary_hnsw_idx",)],
+                         self.sql("SELECT indexname FROM pg_indexes WHERE indexname LIKE 'qa_embeddings_embedding%'"))
+        self.assert_searches_index("qa_embeddings_embedding_binary_hnsw_idx", "binary", queries[0])
+        self.assertGreaterEqual(self.recall(db_manager, queries), 0.75)
+
+        nearest = db_manager.find_nearest_contexts(queries[0], 5)
+        exact = exact_nearest_contexts(db_manager, queries[0], 5)
+        self.assertAlmostEqual(exact[0][1], nearest[0][1], places=5)
+        self.assertEqual([nearest], db_manager.find_nearest_contexts_batch([queries[0]], 5))
+
+    @patch.dict('os.environ', {'QA_DB_INDEX_TYPE': 'ivfflat', 'QA_DB_IVFFLAT_MIN_ROWS': '100'})
+    def test_builds_half_precision_ivfflat_index(self):
+        db_manager = self.create_precision_db_manager("half")
+        queries = sample_queries(db_manager, 10, 0.1, 42)
+
+        self.assert_searches_index("qa_embeddings_embedding_half_ivfflat_idx", "half", queries[0])
+        self.assertGreaterEqual(self.recall(db_manager, queries), 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
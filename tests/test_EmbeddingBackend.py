@@ -0,0 +1,92 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+import numpy as np
+import torch
+from transformers import BertConfig, BertModel, BertTokenizerFast
+
+from query_ai.config import embedding_config
+from query_ai.model.embedding_backend import TorchEmbeddingBackend, OnnxEmbeddingBackend, \
+    create_embedding_backend, onnx_model_path
+from query_ai.model.model_manager import mean_pooling
+
+HAS_ONNX = importlib.util.find_spec("onnxruntime") is not None \
+    and importlib.util.find_spec("onnx") is not None
+
+VOCABULARY = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "an", "example", "text", "padding",
+              "the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog", "."]
+
+
+def create_tiny_model(directory):
+    vocab_file = os.path.join(directory, "vocab.txt")
+    with open(vocab_file, "w", encoding="utf-8") as vocab:
+        vocab.write("\n".join(VOCABULARY))
+
+    torch.manual_seed(0)
+    model = BertModel(BertConfig(vocab_size=len(VOCABULARY), hidden_size=32, num_hidden_layers=2,
+                                 num_attention_heads=4, intermediate_size=64)).eval()
+
+    return model, BertTokenizerFast(vocab_file)
+
+
+class TestEmbeddingBackend(unittest.TestCase):
+
+    def test_torch_backend_returns_last_hidden_state(self):
+        model = MagicMock(return_value=SimpleNamespace(last_hidden_state=torch.ones(1, 2, 3)))
+        inputs = {"input_ids": torch.tensor([[1, 2]]), "attention_mask": torch.tensor([[1, 1]])}
+
+        result = TorchEmbeddingBackend(model).last_hidden_state(inputs)
+
+        self.assertTrue(torch.equal(torch.ones(1, 2, 3), result))
+        model.assert_called_once_with(**inputs)
+
+    def test_creates_torch_backend_by_default(self):
+        self.assertIsInstance(create_embedding_backend(MagicMock(), MagicMock()), TorchEmbeddingBackend)
+
+    @patch.object(embedding_config, 'backend', 'tensorflow')
+    def test_rejects_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_embedding_backend(MagicMock(), MagicMock())
+
+    def test_onnx_model_path_is_per_model(self):
+        self.assertEqual(os.path.join("onnx", "sentence-transformers--all-MiniLM-L6-v2.onnx"),
+                         onnx_model_path("onnx", "sentence-transformers/all-MiniLM-L6-v2"))
+
+    @unittest.skipUnless(HAS_ONNX, "onnxruntime is not installed")
+    def test_onnx_backend_matches_torch_backend(self):
+        with tempfile.TemporaryDirectory() as directory:
+            model, tokenizer = create_tiny_model(directory)
+            model_path = os.path.join(directory, "onnx", "tiny.onnx")
+            torch_backend = TorchEmbeddingBackend(model)
+            onnx_backend = OnnxEmbeddingBackend(model, tokenizer, model_path)
+
+            self.assertTrue(os.path.exists(model_path))
+
+            for texts in (["the quick brown fox"],
+                          ["the quick brown fox jumps over the lazy dog .", "dog", "the fox"]):
+                inputs = tokenizer(texts, return_tensors="pt", padding=True)
+                expected = mean_pooling(torch_backend.last_hidden_state(inputs), inputs["attention_mask"])
+                actual = mean_pooling(onnx_backend.last_hidden_state(inputs), inputs["attention_mask"])
+
+                np.testing.assert_allclose(expected.numpy(), actual.numpy(), atol=1e-5)
+
+    @unittest.skipUnless(HAS_ONNX, "onnxruntime is not installed")
+    @patch('query_ai.model.embedding_backend.export_onnx')
+    def test_onnx_backend_reuses_exported_model(self, mock_export):
+        with tempfile.TemporaryDirectory() as directory:
+            model, tokenizer = create_tiny_model(directory)
+            model_path = os.path.join(directory, "tiny.onnx")
+            open(model_path, "wb").close()
+
+            with patch('onnxruntime.InferenceSession') as mock_session:
+                OnnxEmbeddingBackend(model, tokenizer, model_path)
+
+            mock_export.assert_not_called()
+            self.assertEqual(model_path, mock_session.call_args[0][0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from flask import Flask
+from query_ai.api.health import Health
+
+class TestHealth(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        Health(self.app)
+        self.client = self.app.test_client()
+
+    def test_reports_live(self):
+        response = self.client.get('/api/v1/health')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({'status': 'live'}, response.get_json())
+
+    @patch('query_ai.model.model_manager.ModelMgr.is_ready', return_value=False)
+    def test_reports_not_ready_while_warming_up(self, mock_is_ready):
+        response = self.client.get('/api/v1/health/ready')
+
+        self.assertEqual(503, response.status_code)
+        self.assertEqual('5', response.headers['Retry-After'])
+
+    @patch('query_ai.model.model_manager.ModelMgr.is_ready', return_value=True)
+    def test_reports_ready_after_warmup(self, mock_is_ready):
+        response = self.client.get('/api/v1/health/ready')
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({'status': 'ready'}, response.get_json())
+
+    def test_reports_ready_from_the_given_models(self):
+        app = Flask(__name__)
+        models = MagicMock()
+        models.is_ready.return_value = True
+        Health(app, models)
+
+        response = app.test_client().get('/api/v1/health/ready')
+
+        self.assertEqual(200, response.status_code)
+        models.is_ready.assert_called_once_with()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from unittest.mock import patch
+from query_ai.config.index_config import IndexConfig
+
+class TestIndexConfig(unittest.TestCase):
+
+    @patch('os.getenv')
+    def test_initializes_with_default_values(self, mock_getenv):
+        mock_getenv.side_effect = lambda key, default: default
+
+        config = IndexConfig()
+
+        self.assertEqual(config.get_index_type(), "hnsw")
+        self.assertFalse(config.is_deferred())
+        self.assertEqual(config.get_hnsw_m(), 16)
+        self.assertEqual(config.get_hnsw_ef_construction(), 64)
+        self.assertEqual(config.get_hnsw_ef_search(), 40)
+        self.assertEqual(config.get_ivfflat_lists(), 0)
+        self.assertEqual(config.get_ivfflat_probes(), 10)
+        self.assertEqual(config.get_ivfflat_min_rows(), 1000)
+        self.assertEqual(config.get_ivfflat_rebuild_growth(), 2.0)
+        self.assertEqual(config.get_embedding_precision(), "full")
+        self.assertEqual(config.get_rerank_candidates(), 40)
+
+    @patch('os.getenv')
+    def test_initializes_with_custom_values(self, mock_getenv):
+        mock_getenv.side_effect = lambda key, default: "IVFFlat" if key == "QA_DB_INDEX_TYPE" \
+            else "TRUE" if key == "QA_DB_INDEX_DEFERRED" \
+            else "500" if key == "QA_DB_IVFFLAT_LISTS" \
+            else "25" if key == "QA_DB_IVFFLAT_PROBES" \
+            else "0" if key == "QA_DB_IVFFLAT_REBUILD_GROWTH" \
+            else "Binary" if key == "QA_DB_EMBEDDING_PRECISION" \
+            else "100" if key == "QA_DB_RERANK_CANDIDATES" else default
+
+        config = IndexConfig()
+
+        self.assertEqual(config.get_index_type(), "ivfflat")
+        self.assertTrue(config.is_deferred())
+        self.assertEqual(config.get_ivfflat_lists(), 500)
+        self.assertEqual(config.get_ivfflat_probes(), 25)
+        self.assertEqual(config.get_ivfflat_rebuild_growth(), 0.0)
+        self.assertEqual(config.get_embedding_precision(), "binary")
+        self.assertEqual(config.get_rerank_candidates(), 100)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import threading
+import unittest
+
+from query_ai.job.job_manager import JobMgr, IngestionJob, JobQueueFullException
+
+
+class TestJobMgr(unittest.TestCase):
+
+    def setUp(self):
+        self.job_mgr = JobMgr(max_workers=1, max_queued=1, retention=3600)
+
+    def tearDown(self):
+        self.job_mgr.shutdown()
+
+    def test_runs_job_in_background(self):
+        done = threading.Event()
+
+        def task(job):
+            job.add_paragraphs(2)
+            job.advance(3)
+            job.advance(1)
+            job.record_persisted(3, 1)
+            done.set()
+
+        job = self.job_mgr.submit(task)
+        done.wait(5)
+        self.job_mgr.shutdown()
+
+        result = self.job_mgr.get_job(job.job_id).to_dict()
+        self.assertEqual(IngestionJob.COMPLETED, result['status'])
+        self.assertEqual(2, result['paragraphs_total'])
+        self.assertEqual(2, result['paragraphs_done'])
+        self.assertEqual(4, result['chunks_done'])
+        self.assertEqual(3, result['chunks_inserted'])
+        self.assertEqual(1, result['chunks_skipped'])
+        self.assertIsNotNone(result['finished_at'])
+
+    def test_records_failed_job(self):
+        def task(job):
+            raise ValueError("embedding failed")
+
+        job = self.job_mgr.submit(task)
+        self.job_mgr.shutdown()
+
+        self.assertEqual(IngestionJob.FAILED, job.status)
+        self.assertEqual("embedding failed", job.error)
+
+    def test_rejects_job_when_queue_is_full(self):
+        release = threading.Event()
+
+        self.job_mgr.submit(lambda job: release.wait(5))
+        self.job_mgr.submit(lambda job: None)
+
+        with self.assertRaises(JobQueueFullException):
+            self.job_mgr.submit(lambda job: None)
+
+        release.set()
+        self.job_mgr.shutdown()
+
+        self.job_mgr.submit(lambda job: None)
+
+    def test_returns_none_for_unknown_job(self):
+        self.assertIsNone(self.job_mgr.get_job('unknown'))
+
+    def test_prunes_expired_jobs(self):
+        job_mgr = JobMgr(max_workers=1, max_queued=1, retention=0)
+        job = job_mgr.submit(lambda job: None)
+        job_mgr.shutdown()
+
+        self.assertIsNone(job_mgr.get_job(job.job_id))
+
+if __name__ == '__main__':
+    unittest.main()
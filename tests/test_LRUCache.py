@@ -0,0 +1,86 @@
+import threading
+import unittest
+
+from query_ai.util.cache import LRUCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_returns_cached_value(self):
+        cache = LRUCache(2)
+        cache.put('key', 'value')
+
+        self.assertEqual('value', cache.get('key'))
+        self.assertEqual({'hits': 1, 'misses': 0, 'evictions': 0, 'expirations': 0, 'size': 1},
+                         cache.get_stats())
+
+    def test_returns_default_for_missing_key(self):
+        cache = LRUCache(2)
+
+        self.assertEqual('default', cache.get('key', 'default'))
+        self.assertEqual(1, cache.get_stats()['misses'])
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put('first', 1)
+        cache.put('second', 2)
+        cache.get('first')
+        cache.put('third', 3)
+
+        self.assertEqual(1, cache.get('first'))
+        self.assertIsNone(cache.get('second'))
+        self.assertEqual(3, cache.get('third'))
+        self.assertEqual(1, cache.get_stats()['evictions'])
+
+    def test_expires_entries_after_ttl(self):
+        clock = FakeClock()
+        cache = LRUCache(2, ttl=10, clock=clock)
+        cache.put('key', 'value')
+
+        clock.now = 9.9
+        self.assertEqual('value', cache.get('key'))
+        clock.now = 10
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(1, cache.get_stats()['expirations'])
+        self.assertEqual(0, len(cache))
+
+    def test_zero_size_disables_cache(self):
+        cache = LRUCache(0)
+        cache.put('key', 'value')
+
+        self.assertIsNone(cache.get('key'))
+
+    def test_clear_removes_entries(self):
+        cache = LRUCache(2)
+        cache.put('key', 'value')
+        cache.clear()
+
+        self.assertIsNone(cache.get('key'))
+
+    def test_stays_bounded_under_concurrency(self):
+        cache = LRUCache(50)
+
+        def worker(offset):
+            for index in range(200):
+                cache.put(offset + index, index)
+                cache.get(offset + index - 1)
+
+        threads = [threading.Thread(target=worker, args=(offset * 1000,)) for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(50, len(cache))
+        self.assertEqual(750, cache.get_stats()['evictions'])
+
+if __name__ == '__main__':
+    unittest.main()
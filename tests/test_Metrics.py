@@ -0,0 +1,42 @@
+import unittest
+from unittest.mock import patch
+
+from flask import Flask
+
+from query_ai.api.health import Health
+from query_ai.api.metrics import Metrics
+from query_ai.metrics import request_duration, stage_duration
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TESTING'] = True
+        Health(self.app)
+        Metrics(self.app)
+        self.client = self.app.test_client()
+
+    def test_exposes_metrics_in_prometheus_text_format(self):
+        stage_duration.observe(0.2, stage="tokenize")
+
+        response = self.client.get('/metrics')
+
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        body = response.get_data(as_text=True)
+        self.assertIn('# TYPE query_ai_stage_duration_seconds histogram', body)
+        self.assertIn('query_ai_stage_duration_seconds_count{stage="tokenize"}', body)
+        self.assertIn('# TYPE query_ai_chunks_total counter', body)
+
+    @patch('query_ai.model.model_manager.ModelMgr.is_ready')
+    def test_records_request_duration_by_endpoint(self, mock_is_ready):
+        mock_is_ready.return_value = False
+        before, _ = request_duration.get(method='GET', endpoint='/api/v1/health/ready', status='503')
+
+        self.client.get('/api/v1/health/ready')
+
+        after, _ = request_duration.get(method='GET', endpoint='/api/v1/health/ready', status='503')
+        self.assertEqual(before + 1, after)
+
+if __name__ == '__main__':
+    unittest.main()
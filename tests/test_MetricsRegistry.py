@@ -0,0 +1,125 @@
+import threading
+import unittest
+
+from query_ai.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_renders_counter(self):
+        counter = self.registry.counter("test_chunks_total", "The chunks.", ("outcome",))
+        counter.inc(3, outcome="inserted")
+        counter.inc(outcome="skipped")
+        counter.inc(0.5, outcome="skipped")
+
+        self.assertEqual("# HELP test_chunks_total The chunks.\n"
+                         "# TYPE test_chunks_total counter\n"
+                         'test_chunks_total{outcome="inserted"} 3\n'
+                         'test_chunks_total{outcome="skipped"} 1.5\n', self.registry.render())
+
+    def test_renders_cumulative_histogram_buckets(self):
+        histogram = self.registry.histogram("test_seconds", "The seconds.", ("stage",), buckets=(0.1, 1.0))
+        histogram.observe(0.1, stage="tokenize")
+        histogram.observe(0.5, stage="tokenize")
+        histogram.observe(2, stage="tokenize")
+
+        self.assertEqual("# HELP test_seconds The seconds.\n"
+                         "# TYPE test_seconds histogram\n"
+                         'test_seconds_bucket{stage="tokenize",le="0.1"} 1\n'
+                         'test_seconds_bucket{stage="tokenize",le="1"} 2\n'
+                         'test_seconds_bucket{stage="tokenize",le="+Inf"} 3\n'
+                         'test_seconds_sum{stage="tokenize"} 2.6\n'
+                         'test_seconds_count{stage="tokenize"} 3\n', self.registry.render())
+
+    def test_estimates_quantiles_from_buckets(self):
+        histogram = self.registry.histogram("test_seconds", "The seconds.", ("stage",), buckets=(0.1, 0.2, 0.4))
+        for value in (0.05, 0.15, 0.15, 0.3):
+            histogram.observe(value, stage="generation")
+
+        self.assertAlmostEqual(0.15, histogram.quantile(0.5, stage="generation"))
+        self.assertAlmostEqual(0.4, histogram.quantile(1.0, stage="generation"))
+        self.assertIsNone(histogram.quantile(0.5, stage="validation"))
+
+        histogram.observe(1.0, stage="generation")
+        self.assertEqual(0.4, histogram.quantile(0.99, stage="generation"))
+
+        self.registry.reset()
+        self.assertIsNone(histogram.quantile(0.5, stage="generation"))
+
+    def test_times_block_even_when_it_raises(self):
+        histogram = self.registry.histogram("test_seconds", "The seconds.", ("stage",))
+
+        with histogram.time(stage="retrieval"):
+            pass
+
+        with self.assertRaises(RuntimeError):
+            with histogram.time(stage="retrieval"):
+                raise RuntimeError("failed")
+
+        count, total = histogram.get(stage="retrieval")
+        self.assertEqual(2, count)
+        self.assertGreaterEqual(total, 0)
+
+    def test_escapes_label_values(self):
+        counter = self.registry.counter("test_total", "The requests.", ("endpoint",))
+        counter.inc(endpoint='a "quoted"\\path\n')
+
+        self.assertIn('test_total{endpoint="a \\"quoted\\"\\\\path\\n"} 1', self.registry.render())
+
+    def test_rejects_invalid_use(self):
+        counter = self.registry.counter("test_total", "The requests.", ("endpoint",))
+
+        with self.assertRaises(ValueError):
+            counter.inc(-1, endpoint="/")
+        with self.assertRaises(ValueError):
+            counter.inc(stage="tokenize")
+        with self.assertRaises(ValueError):
+            self.registry.histogram("test_total", "The requests.")
+
+        self.assertIs(counter, self.registry.counter("test_total", "The requests.", ("endpoint",)))
+
+    def test_merges_drained_metrics(self):
+        worker = MetricsRegistry()
+        worker_counter = worker.counter("test_total", "The chunks.", ("outcome",))
+        worker_histogram = worker.histogram("test_seconds", "The seconds.", ("stage",), buckets=(0.1, 1.0))
+        worker.counter("test_unchanged_total", "The requests.")
+        worker.counter("test_unknown_total", "The others.").inc()
+        counter = self.registry.counter("test_total", "The chunks.", ("outcome",))
+        histogram = self.registry.histogram("test_seconds", "The seconds.", ("stage",), buckets=(0.1, 1.0))
+        counter.inc(outcome="inserted")
+        histogram.observe(0.5, stage="tokenize")
+
+        worker_counter.inc(2, outcome="inserted")
+        worker_histogram.observe(0.05, stage="tokenize")
+        worker_histogram.observe(2, stage="generation")
+        drained = worker.drain()
+        self.registry.merge(drained)
+
+        self.assertEqual({"test_total", "test_seconds", "test_unknown_total"}, set(drained))
+        self.assertEqual({}, worker.drain())
+        self.assertEqual(3, counter.get(outcome="inserted"))
+        self.assertEqual((2, 0.55), histogram.get(stage="tokenize"))
+        self.assertEqual(0.1, histogram.quantile(0.5, stage="tokenize"))
+        self.assertEqual((1, 2.0), histogram.get(stage="generation"))
+        self.assertNotIn("test_unknown_total", self.registry.render())
+
+    def test_counts_concurrent_increments(self):
+        counter = self.registry.counter("test_total", "The requests.")
+
+        def increment():
+            for _ in range(1000):
+                counter.inc()
+
+        threads = [threading.Thread(target=increment) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(4000, counter.get())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,62 @@
+import re
+import threading
 import unittest
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
 
+import numpy as np
+import torch
+
+from query_ai.config import embedding_config, generator_config
 from query_ai.database import DBException
 from query_ai.model import model_manager, ModelMgr
+from query_ai.model.model_manager import quantize_dynamic_int8, split_into_token_chunks
+
+
+def fake_embedding_tokenizer(texts, **kwargs):
+    ids = [[(sum(map(ord, word)) % 97) + 1 for word in text.split()] for text in texts]
+    longest = max(len(row) for row in ids)
+    return {
+        'input_ids': torch.tensor([row + [0] * (longest - len(row)) for row in ids]),
+        'attention_mask': torch.tensor([[1] * len(row) + [0] * (longest - len(row)) for row in ids]),
+    }
+
+
+class FakeEmbeddingModel:
+    def __init__(self):
+        torch.manual_seed(0)
+        self.embedding = torch.nn.Embedding(100, 4)
+
+    def __call__(self, input_ids, attention_mask):
+        return SimpleNamespace(last_hidden_state=self.embedding(input_ids))
+
+
+class FakeFastTokenizer:
+    """Splits every word into tokens of up to three characters, with [CLS] 98 and [SEP] 99."""
+
+    is_fast = True
+    pad_token_id = 0
+
+    def __init__(self, model_max_length):
+        self.model_max_length = model_max_length
+        self.calls = []
+
+    def __call__(self, text, **kwargs):
+        self.calls.append((text, kwargs))
+        ids = []
+        offsets = []
+        for match in re.finditer(r"\S+", text):
+            for start in range(match.start(), match.end(), 3):
+                end = min(start + 3, match.end())
+                ids.append((sum(map(ord, text[start:end])) % 97) + 1)
+                offsets.append((start, end))
+        return {'input_ids': ids, 'offset_mapping': offsets}
+
+    def num_special_tokens_to_add(self, pair=False):
+        return 2
+
+    def build_inputs_with_special_tokens(self, ids):
+        return [98] + ids + [99]
 
 
 class TestModelMgr(unittest.TestCase):
@@ -84,14 +138,126 @@ class TestModelMgr(unittest.TestCase):
         self.assertEqual(embeddings[3][3], "into chunks.")
 
     @patch('query_ai.model.model_manager.get_logger')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModel.from_pretrained')
+    def test_get_embedding_uses_cache(self, mock_auto_model, mock_auto_tokenizer, mock_get_logger):
+        mock_tokenizer = MagicMock()
+        mock_auto_tokenizer.return_value = mock_tokenizer
+        mock_model = MagicMock()
+        mock_auto_model.return_value = mock_model
+        mock_model.return_value.last_hidden_state.mean.return_value.squeeze.return_value.numpy.return_value = [0.1, 0.2, 0.3]
+
+        model_mgr = ModelMgr()
+        first = model_mgr.get_embedding("What is  AI?")
+        second = model_mgr.get_embedding(" What is AI? ")
+
+        self.assertEqual(first, second)
+        mock_tokenizer.assert_called_once()
+        mock_model.assert_called_once()
+        stats = model_mgr.get_cache_stats()['embedding']
+        self.assertEqual(1, stats['hits'])
+        self.assertEqual(1, stats['misses'])
+
+    @patch('query_ai.model.model_manager.get_logger')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModel.from_pretrained')
+    def test_embed_batch_ignores_padding(self, mock_auto_model, mock_auto_tokenizer, mock_get_logger):
+        mock_auto_tokenizer.return_value = MagicMock(side_effect=fake_embedding_tokenizer)
+        mock_auto_model.return_value = FakeEmbeddingModel()
+
+        model_mgr = ModelMgr()
+        texts = ["one two three four five", "six", "seven eight"]
+        batched = model_mgr.embed_batch(texts, batch_size=3)
+        single = [model_mgr.embed_batch([text], batch_size=1)[0] for text in texts]
+
+        self.assertEqual(3, len(batched))
+        for batched_embedding, single_embedding in zip(batched, single):
+            np.testing.assert_allclose(batched_embedding, single_embedding, rtol=1e-5)
+
+    @patch('query_ai.model.model_manager.get_logger')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModel.from_pretrained')
+    def test_get_embeddings_batches_chunks_in_order(self, mock_auto_model, mock_auto_tokenizer, mock_get_logger):
+        mock_tokenizer = MagicMock(side_effect=fake_embedding_tokenizer)
+        mock_auto_tokenizer.return_value = mock_tokenizer
+        mock_auto_model.return_value = FakeEmbeddingModel()
+
+        model_mgr = ModelMgr()
+        text = "This is a test text that will be split into chunks."
+        embeddings = model_mgr.get_embeddings(text, chunk_size=5, overlap=2, batch_size=2)
+
+        self.assertEqual(2, mock_tokenizer.call_count)
+        self.assertEqual([0, 1, 2, 3], [record[0] for record in embeddings])
+        for record in embeddings:
+            np.testing.assert_allclose(record[4], model_mgr.embed_batch([record[3]])[0], rtol=1e-5)
+
+    def test_split_into_token_chunks_covers_every_token(self):
+        text = "alpha beta gamma delta"
+        offsets = [(0, 3), (3, 5), (6, 9), (9, 10), (11, 14), (14, 16), (17, 20), (20, 22)]
+
+        chunks = split_into_token_chunks(text, offsets, window_size=3, stride=1)
+
+        self.assertEqual([(0, 0, 2, "alpha bet", 0, 3),
+                          (1, 1, 3, "beta gam", 2, 5),
+                          (2, 2, 4, "gamma del", 4, 7),
+                          (3, 3, 4, "delta", 6, 8)], chunks)
+
+    def test_split_into_token_chunks_single_window(self):
+        chunks = split_into_token_chunks("one two", [(0, 3), (4, 7)], window_size=5, stride=2)
+
+        self.assertEqual([(0, 0, 2, "one two", 0, 2)], chunks)
+        self.assertEqual([], split_into_token_chunks("", [], window_size=5, stride=2))
+
+    def test_split_into_token_chunks_rejects_stride(self):
+        with self.assertRaises(ValueError):
+            split_into_token_chunks("one two", [(0, 3), (4, 7)], window_size=2, stride=2)
+
+    @patch('query_ai.model.model_manager.get_logger')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModel.from_pretrained')
+    def test_get_embeddings_by_tokens_tokenizes_once(self, mock_auto_model, mock_auto_tokenizer, mock_get_logger):
+        tokenizer = FakeFastTokenizer(model_max_length=6)
+        mock_auto_tokenizer.return_value = tokenizer
+        model = FakeEmbeddingModel()
+        model.config = SimpleNamespace(max_position_embeddings=512)
+        mock_auto_model.return_value = model
+
+        model_mgr = ModelMgr()
+        text = "Tokenization keeps every word of this paragraph."
+        with patch.object(embedding_config, 'db_record_token_stride', 1):
+            embeddings = model_mgr.get_embeddings(text, batch_size=2, chunking="tokens")
+
+        self.assertEqual(1, len(tokenizer.calls))
+        self.assertFalse(tokenizer.calls[0][1]['add_special_tokens'])
+        self.assertEqual(4, model_mgr.get_token_window_size())
+        self.assertEqual(list(range(len(embeddings))), [record[0] for record in embeddings])
+        self.assertTrue(text.startswith(embeddings[0][3]))
+        self.assertTrue(text.endswith(embeddings[-1][3]))
+        self.assertEqual(len(text.split()), embeddings[-1][2])
+
+        token_ids = tokenizer(text)['input_ids']
+        expected = [[98] + token_ids[start:min(start + 4, len(token_ids))] + [99]
+                    for start in range(0, len(token_ids) - 1, 3)]
+        self.assertEqual(len(expected), len(embeddings))
+        for record, ids in zip(embeddings, expected):
+            self.assertIn(record[3], text)
+            pooled = model(torch.tensor([ids]), torch.tensor([[1] * len(ids)])).last_hidden_state.mean(dim=1)[0]
+            np.testing.assert_allclose(record[4], pooled.detach().numpy(), rtol=1e-5)
+
+    @patch('query_ai.model.model_manager.get_logger')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModel.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModelForSeq2SeqLM.from_pretrained')
     @patch('query_ai.model.model_manager.pipeline')
-    def test_generate_answer_handles_empty_database(self, mock_pipeline, mock_get_logger):
+    def test_generate_answer_handles_empty_database(self, mock_pipeline, mock_auto_model_seq2seq, mock_auto_model, mock_auto_tokenizer, mock_get_logger):
         mock_get_logger.return_value = MagicMock()
         mock_pipeline.return_value = MagicMock()
+        mock_auto_tokenizer.return_value = MagicMock(side_effect=fake_embedding_tokenizer)
+        mock_auto_model.return_value = FakeEmbeddingModel()
 
         model_mgr = ModelMgr()
         db_manager = MagicMock()
-        db_manager.execute.side_effect = DBException
+        db_manager.find_nearest_contexts.side_effect = DBException
 
         result = model_mgr.generate_answer("What is AI?", db_manager=db_manager)
 
@@ -99,9 +265,12 @@ class TestModelMgr(unittest.TestCase):
         self.assertEqual(result[0]['question'], "What is AI?")
         self.assertEqual(result[0]['context'], "")
 
+    @patch.object(generator_config, 'validation_mode', 'generate')
     @patch('query_ai.model.model_manager.get_logger')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModelForSeq2SeqLM.from_pretrained')
     @patch('query_ai.model.model_manager.pipeline')
-    def test_generate_answer_handles_provided_context(self, mock_pipeline, mock_get_logger):
+    def test_generate_answer_handles_provided_context(self, mock_pipeline, mock_auto_model_seq2seq, mock_auto_tokenizer, mock_get_logger):
         mock_get_logger.return_value = MagicMock()
 
         pipeline_instance = MagicMock()
@@ -120,6 +289,181 @@ class TestModelMgr(unittest.TestCase):
         self.assertEqual(result[0]['question'], "What is AI?")
         self.assertEqual(result[0]['context'], provided_context)
 
+    @patch.object(generator_config, 'validation_mode', 'generate')
+    @patch('query_ai.model.model_manager.get_logger')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModelForSeq2SeqLM.from_pretrained')
+    @patch('query_ai.model.model_manager.pipeline')
+    def test_generate_answer_uses_answer_cache(self, mock_pipeline, mock_auto_model_seq2seq, mock_auto_tokenizer, mock_get_logger):
+        pipeline_instance = MagicMock()
+        pipeline_instance.side_effect = [
+            [{'generated_text': '1'}],
+            [{'generated_text': 'AI stands for Artificial Intelligence.'}],
+            [{'generated_text': '1'}],
+            [{'generated_text': 'Artificial Intelligence.'}],
+        ]
+        mock_pipeline.return_value = pipeline_instance
+        provided_context = "AI stands for Artificial Intelligence."
+
+        model_mgr = ModelMgr()
+        first = model_mgr.generate_answer("What is AI?", provided_context=provided_context)
+        second = model_mgr.generate_answer("What is AI?", provided_context=provided_context)
+
+        self.assertEqual(first, second)
+        self.assertEqual(2, pipeline_instance.call_count)
+        self.assertEqual(1, model_mgr.get_cache_stats()['answer']['hits'])
+
+        model_mgr.clear_answer_cache()
+        third = model_mgr.generate_answer("What is AI?", provided_context=provided_context)
+
+        self.assertEqual('Artificial Intelligence.', third[0]['generated_text'])
+        self.assertEqual(4, pipeline_instance.call_count)
+
+    @patch.object(ModelMgr, '_ModelMgr__stream_generation')
+    @patch.object(ModelMgr, 'validate_question', return_value=1)
+    def test_stream_answer_yields_events_in_order(self, mock_validate_question, mock_stream_generation):
+        mock_stream_generation.return_value = iter(["AI stands ", "for Artificial Intelligence."])
+        context = "AI stands for Artificial Intelligence."
+
+        model_mgr = ModelMgr()
+        events = list(model_mgr.stream_answer("What is AI?", provided_context=context))
+
+        self.assertEqual(['context', 'validation', 'token', 'token', 'answer', 'done'],
+                         [name for name, _ in events])
+        self.assertEqual({'context': context, 'distance': 0.0, 'cached': False}, events[0][1])
+        self.assertEqual({'valid': True}, events[1][1])
+        self.assertEqual({'answer': 'AI stands for Artificial Intelligence.'}, events[4][1])
+
+        cached = list(model_mgr.stream_answer("What is AI?", provided_context=context))
+
+        self.assertTrue(cached[0][1]['cached'])
+        self.assertEqual(events[4], cached[-2])
+        mock_stream_generation.assert_called_once()
+        self.assertEqual('AI stands for Artificial Intelligence.',
+                         model_mgr.generate_answer("What is AI?", provided_context=context)[0]['generated_text'])
+
+    @patch.object(ModelMgr, 'validate_question', return_value=0)
+    def test_stream_answer_invalid_question(self, mock_validate_question):
+        model_mgr = ModelMgr()
+        events = list(model_mgr.stream_answer("What is AI?", provided_context="context text"))
+
+        self.assertEqual(('validation', {'valid': False}), events[1])
+        self.assertEqual(('answer', {'answer': "I don't know"}), events[-2])
+
+    @patch('query_ai.model.model_manager.get_logger')
+    def test_stream_answer_handles_database_error(self, mock_get_logger):
+        db_manager = MagicMock()
+        db_manager.find_nearest_contexts.side_effect = DBException
+
+        model_mgr = ModelMgr()
+        with patch.object(model_mgr, 'get_embedding', return_value=np.zeros(3)):
+            events = list(model_mgr.stream_answer("What is AI?", db_manager=db_manager))
+
+        self.assertEqual(['error', 'done'], [name for name, _ in events])
+
+    @patch('query_ai.model.model_manager.get_logger')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModelForSeq2SeqLM.from_pretrained')
+    @patch('query_ai.model.model_manager.pipeline')
+    def test_stream_generation_yields_text_as_generated(self, mock_pipeline, mock_auto_model_seq2seq, mock_auto_tokenizer, mock_get_logger):
+        mock_auto_tokenizer.return_value = MagicMock(return_value={'input_ids': torch.tensor([[1, 2]]), 'attention_mask': torch.tensor([[1, 1]])})
+
+        def generate(**kwargs):
+            kwargs['streamer'].on_finalized_text("Hello ")
+            kwargs['streamer'].on_finalized_text("world", stream_end=True)
+
+        mock_auto_model_seq2seq.return_value.generate.side_effect = generate
+
+        model_mgr = ModelMgr()
+        texts = list(model_mgr._ModelMgr__stream_generation("prompt"))
+
+        self.assertEqual(["Hello ", "world"], texts)
+
+    @patch('query_ai.model.model_manager.get_logger')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModelForSeq2SeqLM.from_pretrained')
+    @patch('query_ai.model.model_manager.pipeline')
+    def test_stream_generation_raises_generation_error(self, mock_pipeline, mock_auto_model_seq2seq, mock_auto_tokenizer, mock_get_logger):
+        mock_auto_tokenizer.return_value = MagicMock(return_value={'input_ids': torch.tensor([[1, 2]]), 'attention_mask': torch.tensor([[1, 1]])})
+        mock_auto_model_seq2seq.return_value.generate.side_effect = RuntimeError("out of memory")
+
+        model_mgr = ModelMgr()
+
+        with self.assertRaises(RuntimeError):
+            list(model_mgr._ModelMgr__stream_generation("prompt"))
+
+    @patch.object(generator_config, 'max_batch_size', 2)
+    @patch.object(generator_config, 'validation_mode', 'generate')
+    @patch('query_ai.model.model_manager.get_logger')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModelForSeq2SeqLM.from_pretrained')
+    @patch('query_ai.model.model_manager.pipeline')
+    def test_generate_answers_batches_every_step(self, mock_pipeline, mock_auto_model_seq2seq, mock_auto_tokenizer, mock_get_logger):
+        def output(prompt):
+            if 'analyst:' in prompt:
+                return {'generated_text': '0' if 'beta' in prompt else '1'}
+            return {'generated_text': 'answer'}
+
+        def generate(prompts, **kwargs):
+            if isinstance(prompts, str):
+                return [output(prompts)]
+            return [[output(prompt)] for prompt in prompts]
+
+        pipeline_instance = MagicMock(side_effect=generate)
+        mock_pipeline.return_value = pipeline_instance
+        db_manager = MagicMock()
+        db_manager.find_nearest_contexts_batch.return_value = [[("alpha context", 0.1)], [],
+                                                               [("beta context", 0.2)]]
+
+        model_mgr = ModelMgr()
+        with patch.object(model_mgr, 'get_cached_embeddings', return_value=[1, 2, 3]) as mock_embed:
+            results = model_mgr.generate_answers(["alpha?", "empty?", "beta?", "given?"], db_manager,
+                                                 provided_contexts=[None, None, None, "given context"])
+
+        mock_embed.assert_called_once_with(["alpha?", "empty?", "beta?"])
+        db_manager.find_nearest_contexts_batch.assert_called_once_with([1, 2, 3])
+        self.assertEqual(["answer", "The context database is empty.", "I don't know", "answer"],
+                         [result['generated_text'] for result in results])
+        self.assertEqual(["alpha context", "", "beta context", "given context"],
+                         [result['context'] for result in results])
+        # Three validations in batches of two, then the two valid questions in one batch.
+        self.assertEqual(3, pipeline_instance.call_count)
+
+        cached = model_mgr.generate_answers(["alpha?"], provided_contexts=["alpha context"])
+
+        self.assertEqual("answer", cached[0]['generated_text'])
+        self.assertEqual(3, pipeline_instance.call_count)
+
+    @patch('query_ai.model.model_manager.get_logger')
+    def test_generate_answers_handles_database_error(self, mock_get_logger):
+        db_manager = MagicMock()
+        db_manager.find_nearest_contexts_batch.side_effect = DBException
+
+        model_mgr = ModelMgr()
+        with patch.object(model_mgr, 'get_cached_embeddings', return_value=[1]):
+            results = model_mgr.generate_answers(["What is AI?"], db_manager)
+
+        self.assertEqual("Sorry, I cannot access my database. Try again later.",
+                         results[0]['generated_text'])
+
+    @patch('query_ai.model.model_manager.get_logger')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModel.from_pretrained')
+    def test_get_cached_embeddings_embeds_missing_texts_once(self, mock_auto_model, mock_auto_tokenizer, mock_get_logger):
+        mock_tokenizer = MagicMock(side_effect=fake_embedding_tokenizer)
+        mock_auto_tokenizer.return_value = mock_tokenizer
+        mock_auto_model.return_value = FakeEmbeddingModel()
+
+        model_mgr = ModelMgr()
+        first = model_mgr.get_cached_embeddings(["one two", "three", " one  two "])
+        second = model_mgr.get_cached_embeddings(["three", "one two"])
+
+        self.assertEqual(1, mock_tokenizer.call_count)
+        self.assertCountEqual(["one two", "three"], mock_tokenizer.call_args[0][0])
+        self.assertIs(first[0], first[2])
+        self.assertIs(first[1], second[0])
+        self.assertIs(first[0], second[1])
+
     @patch.object(ModelMgr, 'validate_question', return_value=0)
     def test_generate_result_invalid_question(self, mock_validate_question):
         context = "context text"
@@ -137,8 +481,11 @@ class TestModelMgr(unittest.TestCase):
 
         self.assertEqual(result[0]['generated_text'], "The context database is empty.")
 
+    @patch.object(generator_config, 'validation_mode', 'generate')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModelForSeq2SeqLM.from_pretrained')
     @patch('query_ai.model.model_manager.pipeline')
-    def test_out_of_context_question(self, mock_pipeline):
+    def test_out_of_context_question(self, mock_pipeline, mock_auto_model_seq2seq, mock_auto_tokenizer):
 
         mock_pipeline.return_value.side_effect = [[{'generated_text': '0'}]]
 
@@ -147,5 +494,151 @@ class TestModelMgr(unittest.TestCase):
 
         self.assertEqual(result, 0)
 
+    @patch.object(generator_config, 'validation_mode', 'generate')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModelForSeq2SeqLM.from_pretrained')
+    @patch('query_ai.model.model_manager.pipeline')
+    def test_non_numeric_validation_is_out_of_context(self, mock_pipeline, mock_auto_model_seq2seq, mock_auto_tokenizer):
+        mock_pipeline.return_value.side_effect = [[{'generated_text': 'yes'}]]
+
+        model_mgr = ModelMgr()
+        result = model_mgr.validate_question("Context", "Question")
+
+        self.assertEqual(result, 0)
+
+    @patch.object(generator_config, 'validation_mode', 'generate')
+    @patch.object(generator_config, 'max_batch_wait', 0.5)
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModelForSeq2SeqLM.from_pretrained')
+    @patch('query_ai.model.model_manager.pipeline')
+    def test_batches_concurrent_generations(self, mock_pipeline, mock_auto_model_seq2seq, mock_auto_tokenizer):
+        mock_pipeline.return_value.side_effect = \
+            lambda prompts, **kwargs: [{'generated_text': '1' if 'alpha' in prompt else '0'} for prompt in prompts]
+
+        model_mgr = ModelMgr()
+        barrier = threading.Barrier(2)
+        results = {}
+
+        def validate(question):
+            barrier.wait()
+            results[question] = model_mgr.validate_question("Context", question)
+
+        threads = [threading.Thread(target=validate, args=(question,)) for question in ['alpha?', 'beta?']]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual({'alpha?': 1, 'beta?': 0}, results)
+        mock_pipeline.return_value.assert_called_once()
+        self.assertEqual(2, mock_pipeline.return_value.call_args[1]['batch_size'])
+
+    def create_logits_model_mgr(self, mock_auto_tokenizer, mock_auto_model_seq2seq, no_logit, yes_logit):
+        tokenizer = MagicMock()
+        tokenizer.encode.side_effect = lambda label, add_special_tokens: {'0': [5], '1': [7]}[label]
+        tokenizer.return_value = {'input_ids': torch.tensor([[1, 2, 3]]),
+                                  'attention_mask': torch.tensor([[1, 1, 1]])}
+        mock_auto_tokenizer.return_value = tokenizer
+
+        logits = torch.zeros((1, 1, 10))
+        logits[0, 0, 5] = no_logit
+        logits[0, 0, 7] = yes_logit
+        model = MagicMock()
+        model.config.decoder_start_token_id = 0
+        model.return_value = SimpleNamespace(logits=logits)
+        mock_auto_model_seq2seq.return_value = model
+
+        return ModelMgr(), model
+
+    @patch('query_ai.model.model_manager.pipeline')
+    @patch('query_ai.model.model_manager.AutoModel.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModelForSeq2SeqLM.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    def test_scores_question_from_first_step_logits(self, mock_auto_tokenizer, mock_auto_model_seq2seq, mock_auto_model, mock_pipeline):
+        model_mgr, model = self.create_logits_model_mgr(mock_auto_tokenizer, mock_auto_model_seq2seq, 0.0, 2.0)
+
+        probability = model_mgr.score_question("Context", "Question")
+
+        self.assertAlmostEqual(float(torch.sigmoid(torch.tensor(2.0))), probability, places=5)
+        self.assertEqual(1, model_mgr.validate_question("Context", "Question"))
+        self.assertEqual([[0]], model.call_args[1]['decoder_input_ids'].tolist())
+        mock_pipeline.return_value.assert_not_called()
+
+    @patch('query_ai.model.model_manager.pipeline')
+    @patch('query_ai.model.model_manager.AutoModel.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModelForSeq2SeqLM.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    def test_validates_question_against_threshold(self, mock_auto_tokenizer, mock_auto_model_seq2seq, mock_auto_model, mock_pipeline):
+        model_mgr, _ = self.create_logits_model_mgr(mock_auto_tokenizer, mock_auto_model_seq2seq, 1.0, 0.0)
+
+        self.assertEqual(0, model_mgr.validate_question("Context", "Question"))
+
+        with patch.object(generator_config, 'validation_threshold', 0.2):
+            self.assertEqual(1, model_mgr.validate_question("Context", "Question"))
+
+    def test_quantizes_linear_layers_to_int8(self):
+        model = torch.nn.Sequential(torch.nn.Linear(8, 4), torch.nn.ReLU(), torch.nn.Linear(4, 2))
+        inputs = torch.randn(3, 8)
+
+        with torch.no_grad():
+            expected = model(inputs)
+            quantized = quantize_dynamic_int8(model)
+
+            self.assertNotIsInstance(quantized[0], torch.nn.Linear)
+            self.assertNotIsInstance(quantized[2], torch.nn.Linear)
+            self.assertTrue(torch.allclose(expected, quantized(inputs), atol=0.1))
+
+    @patch('query_ai.model.model_manager.quantize_dynamic_int8')
+    @patch('query_ai.model.model_manager.pipeline')
+    @patch('query_ai.model.model_manager.AutoModel.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModelForSeq2SeqLM.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    def test_quantizes_models_when_configured(self, mock_auto_tokenizer, mock_auto_model_seq2seq, mock_auto_model, mock_pipeline, mock_quantize):
+        self.assertEqual(mock_auto_model.return_value, ModelMgr().embedding_model)
+        mock_quantize.assert_not_called()
+
+        model_mgr = ModelMgr(quantize_embedding=True, quantize_generator=True)
+
+        self.assertEqual(mock_quantize.return_value, model_mgr.embedding_model)
+        self.assertEqual(mock_quantize.return_value, model_mgr.generator_model)
+        mock_pipeline.assert_called_with("text2text-generation", model=mock_quantize.return_value,
+                                         tokenizer=mock_auto_tokenizer.return_value)
+
+    @patch('query_ai.model.model_manager.pipeline')
+    @patch('query_ai.model.model_manager.AutoModel.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModelForSeq2SeqLM.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    def test_loads_models_on_first_use(self, mock_auto_tokenizer, mock_auto_model_seq2seq, mock_auto_model, mock_pipeline):
+        model_mgr = ModelMgr()
+
+        mock_auto_tokenizer.assert_not_called()
+        mock_auto_model.assert_not_called()
+        mock_auto_model_seq2seq.assert_not_called()
+
+        self.assertEqual(model_mgr.embedding_model, model_mgr.embedding_model)
+        mock_auto_model.assert_called_once()
+        mock_auto_model_seq2seq.assert_not_called()
+
+        self.assertEqual(mock_pipeline.return_value, model_mgr.generator_pipeline)
+        mock_auto_model_seq2seq.assert_called_once()
+        self.assertEqual(2, mock_auto_tokenizer.call_count)
+
+    @patch.object(generator_config, 'validation_mode', 'generate')
+    @patch('query_ai.model.model_manager.pipeline')
+    @patch('query_ai.model.model_manager.AutoModel.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoModelForSeq2SeqLM.from_pretrained')
+    @patch('query_ai.model.model_manager.AutoTokenizer.from_pretrained')
+    def test_warmup_makes_ready(self, mock_auto_tokenizer, mock_auto_model_seq2seq, mock_auto_model, mock_pipeline):
+        mock_auto_tokenizer.return_value = MagicMock(side_effect=fake_embedding_tokenizer)
+        mock_auto_model.return_value = FakeEmbeddingModel()
+        model_mgr = ModelMgr()
+
+        self.assertFalse(model_mgr.is_ready())
+
+        model_mgr.warmup()
+
+        self.assertTrue(model_mgr.is_ready())
+        mock_pipeline.return_value.assert_called_once()
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
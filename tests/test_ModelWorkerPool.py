@@ -0,0 +1,203 @@
+import os
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+from query_ai.database import VectorStore, DBException
+from query_ai.metrics import stage_duration
+from query_ai.model.worker_pool import ModelWorkerPool, WorkerPoolException, split_cores
+
+class FakeModels:
+    def __init__(self):
+        self.loaded = False
+        self.cleared = 0
+
+    @property
+    def embedding_backend(self):
+        self.loaded = True
+        return "backend"
+
+    @property
+    def generator_pipeline(self):
+        return "pipeline"
+
+    def warmup(self):
+        pass
+
+    def get_embeddings(self, text):
+        with stage_duration.time(stage="tokenize"):
+            return [(os.getpid(), self.loaded, text)]
+
+    def generate_answer(self, question, db_manager=None):
+        if question == "exit":
+            os._exit(1)
+        if question == "slow":
+            time.sleep(2)
+        if db_manager is None:
+            raise ValueError("No vector store.")
+        return {"generated_text": f"{question}:{type(db_manager).__name__}"}
+
+    def stream_answer(self, question):
+        if question == "tick":
+            for tick in range(50):
+                time.sleep(0.1)
+                yield "token", tick
+        for word in question.split():
+            yield "token", word
+        yield "done", {"cleared": self.cleared}
+
+    def clear_answer_cache(self):
+        self.cleared += 1
+
+class FakeStore(VectorStore):
+    def persist_contexts(self, records):
+        return 0
+
+    def find_nearest_contexts(self, embedding, limit=1):
+        return []
+
+@unittest.skipUnless(hasattr(os, "fork"), "The worker pool forks its workers.")
+class TestModelWorkerPool(unittest.TestCase):
+    def setUp(self):
+        stage_duration.observe(0.1, stage="tokenize")
+        self.pool = ModelWorkerPool(FakeModels(), 2, threads=1, pin_cores=False)
+
+        with patch('query_ai.database.vector_store') as self.vector_store:
+            self.pool.start()
+
+    def tearDown(self):
+        self.pool.shutdown(timeout=5)
+
+    def __wait_until_ready(self):
+        deadline = time.monotonic() + 10
+
+        while not self.pool.is_ready() and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def test_runs_calls_in_the_workers_with_the_models_loaded_before_forking(self):
+        (pid, loaded, text), = self.pool.get_embeddings("A text.")
+
+        self.assertNotEqual(os.getpid(), pid)
+        self.assertTrue(loaded)
+        self.assertEqual("A text.", text)
+
+    def test_prepares_the_vector_store_before_forking(self):
+        self.vector_store.prepare.assert_called_once()
+
+    def test_reports_ready_after_the_workers_warm_up(self):
+        self.__wait_until_ready()
+
+        self.assertTrue(self.pool.is_ready())
+
+    def test_substitutes_the_vector_store_of_the_worker(self):
+        result = self.pool.generate_answer("Why?", FakeStore())
+
+        self.assertTrue(result["generated_text"].startswith("Why?:"))
+        self.assertNotEqual("FakeStore", result["generated_text"].split(":")[1])
+
+    def test_raises_the_exception_of_the_worker(self):
+        with self.assertRaises(ValueError):
+            self.pool.generate_answer("Why?")
+
+    def test_streams_the_events(self):
+        events = list(self.pool.stream_answer("Stream the words"))
+
+        self.assertEqual([("token", "Stream"), ("token", "the"), ("token", "words"),
+                          ("done", {"cleared": 0})], events)
+
+    def test_clears_the_answer_cache_of_every_worker_without_waiting(self):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            slow = [executor.submit(self.pool.generate_answer, "slow", FakeStore())
+                    for _ in range(2)]
+            time.sleep(0.5)
+            start = time.monotonic()
+
+            self.pool.clear_answer_cache()
+
+            self.assertLess(time.monotonic() - start, 1)
+            self.assertEqual([{"cleared": 1}] * 2,
+                             [list(events)[-1][1] for events in
+                              executor.map(self.pool.stream_answer, ["", ""])])
+            for future in slow:
+                future.result()
+
+    def test_runs_the_calls_of_a_worker_at_the_same_time(self):
+        start = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: self.pool.generate_answer("slow", FakeStore()), range(4)))
+
+        self.assertLess(time.monotonic() - start, 3.5)
+
+    def test_merges_the_metrics_of_the_workers(self):
+        count, _ = stage_duration.get(stage="tokenize")
+
+        self.pool.get_embeddings("A text.")
+        self.pool.get_embeddings("Another text.")
+
+        self.assertEqual(count + 2, stage_duration.get(stage="tokenize")[0])
+
+    def test_shuts_down_without_reporting_exited_workers(self):
+        with self.assertNoLogs('query_ai.model.worker_pool', level='ERROR'):
+            self.pool.shutdown(timeout=5)
+            time.sleep(1.5)
+
+    def test_fails_the_calls_of_an_exited_worker(self):
+        with self.assertRaises(WorkerPoolException):
+            self.pool.generate_answer("exit")
+
+        self.assertEqual([], [pid for pid, _, _ in self.pool.get_embeddings("Still served.")
+                              if pid == os.getpid()])
+
+    def test_fails_the_calls_of_an_exited_worker_while_another_one_streams(self):
+        events = self.pool.stream_answer("tick")
+        next(events)
+        start = time.monotonic()
+
+        with self.assertRaises(WorkerPoolException):
+            self.pool.generate_answer("exit")
+
+        self.assertLess(time.monotonic() - start, 3)
+        self.assertEqual(("done", {"cleared": 0}), list(events)[-1])
+
+    def test_fails_the_calls_not_answered_within_the_timeout(self):
+        self.pool.timeout = 0.5
+
+        with self.assertRaises(WorkerPoolException):
+            self.pool.generate_answer("slow")
+
+class TestModelWorkerPoolBackend(unittest.TestCase):
+    @patch('query_ai.model.worker_pool.embedding_config')
+    def test_rejects_the_onnx_backend(self, mock_config):
+        mock_config.backend = "onnx"
+        models = FakeModels()
+
+        with self.assertRaises(WorkerPoolException):
+            ModelWorkerPool(models, 2).start()
+
+        self.assertFalse(models.loaded)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "The worker pool forks its workers.")
+    @patch('query_ai.database.vector_store')
+    def test_starts_when_the_vector_store_cannot_be_prepared(self, mock_vector_store):
+        mock_vector_store.prepare = MagicMock(side_effect=DBException("Database error occurred."))
+        pool = ModelWorkerPool(FakeModels(), 1, threads=1, pin_cores=False)
+
+        try:
+            with self.assertLogs('query_ai.model.worker_pool', level='ERROR'):
+                pool.start()
+
+            self.assertEqual("A text.", pool.get_embeddings("A text.")[0][2])
+        finally:
+            pool.shutdown(timeout=5)
+
+class TestSplitCores(unittest.TestCase):
+    def test_splits_contiguous_core_sets(self):
+        self.assertEqual([[0, 1, 2], [3, 4], [5, 6]], split_cores(list(range(7)), 3))
+
+    def test_shares_the_cores_when_there_are_more_workers(self):
+        self.assertEqual([[0], [1], [0]], split_cores([0, 1], 3))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@ import unittest
 from unittest.mock import patch, Mock, ANY
 from flask import Flask
 from query_ai.api.query import Query
+from query_ai.config import generator_config
 
 class TestQuery(unittest.TestCase):
     def setUp(self):
@@ -42,6 +43,61 @@ class TestQuery(unittest.TestCase):
             self.assertEqual(500, response[1])
             self.assertEqual({'error': 'Error generating response.'}, response[0].get_json())
 
+    @patch('query_ai.model.model_manager.ModelMgr.stream_answer')
+    def test_streams_answer_as_server_sent_events(self, mock_stream):
+        mock_stream.return_value = iter([('validation', {'valid': True}), ('token', {'text': 'test'}),
+                                         ('done', {})])
+        client = self.app.test_client()
+
+        response = client.post('/api/v1/query', json={'question': 'test?', 'context': 'test context'},
+                               headers={'Accept': 'text/event-stream'})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('text/event-stream', response.mimetype)
+        self.assertEqual('event: validation\ndata: {"valid": true}\n\n'
+                         'event: token\ndata: {"text": "test"}\n\n'
+                         'event: done\ndata: {}\n\n', response.get_data(as_text=True))
+        mock_stream.assert_called_with('test?', provided_context='test context')
+
+    @patch('query_ai.model.model_manager.ModelMgr.generate_answer')
+    def test_prefers_json_for_any_accept(self, mock_generate):
+        mock_generate.return_value = [{'generated_text': 'test answer'}]
+        client = self.app.test_client()
+
+        response = client.post('/api/v1/query', json={'question': 'test?', 'context': 'test context'},
+                               headers={'Accept': '*/*'})
+
+        self.assertEqual({'answer': 'test answer'}, response.get_json())
+
+    @patch('query_ai.model.model_manager.ModelMgr.generate_answers')
+    def test_answers_batch_in_order(self, mock_generate):
+        mock_generate.return_value = [{'generated_text': 'first answer'}, {'generated_text': 'second answer'}]
+        client = self.app.test_client()
+
+        response = client.post('/api/v1/query/batch',
+                               json={'questions': ['first?', {'question': 'second?', 'context': 'test context'}]})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({'answers': [{'question': 'first?', 'answer': 'first answer'},
+                                      {'question': 'second?', 'answer': 'second answer'}]},
+                         response.get_json())
+        mock_generate.assert_called_with(['first?', 'second?'], ANY, provided_contexts=[None, 'test context'])
+
+    def test_rejects_invalid_batch(self):
+        client = self.app.test_client()
+
+        self.assertEqual(400, client.post('/api/v1/query/batch', json={'questions': []}).status_code)
+        self.assertEqual(400, client.post('/api/v1/query/batch', json={'questions': [{'context': 'x'}]}).status_code)
+        self.assertEqual(415, client.post('/api/v1/query/batch', data='invalid').status_code)
+
+    @patch.object(generator_config, 'max_query_batch', 1)
+    def test_rejects_too_large_batch(self):
+        client = self.app.test_client()
+
+        response = client.post('/api/v1/query/batch', json={'questions': ['first?', 'second?']})
+
+        self.assertEqual(413, response.status_code)
+
     def test_rejects_non_json_payload(self):
         with self.app.test_request_context(data='invalid'):
             response = self.query.query()
@@ -0,0 +1,51 @@
+import unittest
+
+from unittest.mock import patch
+from query_ai.config.server_config import ServerConfig
+
+class TestServerConfig(unittest.TestCase):
+
+    @patch('os.getenv')
+    def test_initializes_with_default_values(self, mock_getenv):
+        mock_getenv.side_effect = lambda key, default: default
+
+        config = ServerConfig()
+
+        self.assertEqual(config.get_host(), "0.0.0.0")
+        self.assertEqual(config.get_port(), 5000)
+        self.assertEqual(config.get_threads(), 16)
+        self.assertEqual(config.get_connection_limit(), 100)
+        self.assertEqual(config.get_backlog(), 1024)
+        self.assertEqual(config.get_retry_after(), 5)
+        self.assertEqual(config.get_workers(), 0)
+        self.assertEqual(config.get_worker_threads(), 0)
+        self.assertTrue(config.is_pin_cores())
+        self.assertEqual(config.get_worker_timeout(), 300.0)
+        self.assertEqual(config.get_worker_concurrency(), 0)
+        self.assertEqual(config.get_limit("query"), (2, 8, 5.0))
+        self.assertEqual(config.get_limit("context"), (1, 2, 5.0))
+
+    @patch('os.getenv')
+    def test_initializes_with_custom_values(self, mock_getenv):
+        mock_getenv.side_effect = lambda key, default: "8080" if key == "QA_SERVER_PORT" \
+            else "32" if key == "QA_SERVER_THREADS" \
+            else "4" if key == "QA_QUERY_MAX_CONCURRENT" \
+            else "8" if key == "QA_SERVER_WORKERS" \
+            else "False" if key == "QA_SERVER_PIN_CORES" \
+            else "60" if key == "QA_SERVER_WORKER_TIMEOUT" \
+            else "4" if key == "QA_SERVER_WORKER_CONCURRENCY" \
+            else "0.5" if key == "QA_CONTEXT_QUEUE_TIMEOUT" else default
+
+        config = ServerConfig()
+
+        self.assertEqual(config.get_port(), 8080)
+        self.assertEqual(config.get_threads(), 32)
+        self.assertEqual(config.get_workers(), 8)
+        self.assertFalse(config.is_pin_cores())
+        self.assertEqual(config.get_worker_timeout(), 60.0)
+        self.assertEqual(config.get_worker_concurrency(), 4)
+        self.assertEqual(config.get_limit("query"), (4, 8, 5.0))
+        self.assertEqual(config.get_limit("context"), (1, 2, 0.5))
+
+if __name__ == '__main__':
+    unittest.main()
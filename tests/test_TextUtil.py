@@ -1,5 +1,7 @@
+import io
 import unittest
-from query_ai.util.text_util import TextUtil
+from unittest.mock import MagicMock, patch
+from query_ai.util.text_util import TextUtil, LineTooLongException
 
 class TestTextUtil(unittest.TestCase):
 
@@ -32,5 +34,86 @@ class TestTextUtil(unittest.TestCase):
         expected = "This is a test ."
         self.assertEqual(self.text_util.clean_text(text), expected)
 
+    def test_split_by_paragraph_handles_all_newline_characters(self):
+        text = " Paragraph 1. \r\nParagraph 2.\rParagraph 3.\n \t \r\n\r\nParagraph 4."
+        expected = ["Paragraph 1.", "Paragraph 2.", "Paragraph 3.", "Paragraph 4."]
+        self.assertEqual(self.text_util.split_by_paragraph(text), expected)
+        self.assertEqual(4, self.text_util.count_paragraphs(text))
+
+    def test_iter_paragraphs_is_lazy(self):
+        paragraphs = self.text_util.iter_paragraphs("Paragraph 1.\nParagraph 2.")
+
+        self.assertEqual("Paragraph 1.", next(paragraphs))
+        self.assertEqual("Paragraph 2.", next(paragraphs))
+        self.assertIsNone(next(paragraphs, None))
+
+    def test_iter_clean_paragraphs_matches_split_and_clean(self):
+        text = "<p>First 😊 paragraph</p>\r\n\r\n  <b>Second</b> 🚀 one  \rThird <i>\n"
+        expected = [self.text_util.clean_text(paragraph)
+                    for paragraph in self.text_util.split_by_paragraph(text)]
+
+        self.assertEqual(expected, list(self.text_util.iter_clean_paragraphs(text)))
+        self.assertEqual(["First  paragraph", "Second  one", "Third "], expected)
+        self.assertEqual(3, self.text_util.count_paragraphs(text))
+
+    def test_iter_packed_paragraphs_packs_up_to_max_words(self):
+        paragraphs = ["- one two", "- three", "a long paragraph of six words", "- four", "- five"]
+
+        packs = list(self.text_util.iter_packed_paragraphs(iter(paragraphs), max_words=5))
+
+        self.assertEqual([["- one two", "- three"], ["a long paragraph of six words"],
+                          ["- four", "- five"]], packs)
+
+    def test_iter_packed_paragraphs_starts_packs_at_boundaries(self):
+        paragraphs = ["# Intro", "Some text.", "# Usage", "More text."]
+
+        packs = list(self.text_util.iter_packed_paragraphs(paragraphs, max_words=100,
+                                                           boundary_pattern=r"^#"))
+
+        self.assertEqual([["# Intro", "Some text."], ["# Usage", "More text."]], packs)
+        self.assertEqual([], list(self.text_util.iter_packed_paragraphs([], max_words=100)))
+
+    def test_iter_stream_lines_reads_incrementally(self):
+        stream = io.BytesIO("First ✓ line\r\nSecond line\rThird line\n\nLast".encode("utf-8"))
+
+        lines = list(self.text_util.iter_stream_lines(stream, read_size=3, max_line_size=100))
+
+        self.assertEqual(["First ✓ line", "Second line", "Third line", "Last"],
+                         [line for line in lines if line])
+
+    def test_iter_stream_lines_splits_long_lines_at_whitespace(self):
+        stream = io.BytesIO(b"one two three four\nfive")
+
+        lines = list(self.text_util.iter_stream_lines(stream, read_size=4, max_line_size=10))
+
+        self.assertEqual(["one two ", "three four", "five"], lines)
+
+    def test_iter_stream_lines_rejects_long_lines(self):
+        stream = io.BytesIO(b"one two three four\nfive")
+
+        with self.assertRaises(LineTooLongException):
+            list(self.text_util.iter_stream_lines(stream, read_size=4, max_line_size=10,
+                                                  split_long_lines=False))
+
+    def test_loads_nltk_resources_on_first_use(self):
+        # The nltk objects are replaced with new= so that patching does not probe, and thus
+        # load, the lazy corpus, which fails without the resources.
+        mock_download = MagicMock()
+        mock_stopwords = MagicMock()
+        mock_stopwords.words.return_value = ['the', 'a']
+
+        with patch('nltk.download', new=mock_download):
+            text_util = TextUtil()
+
+            mock_download.assert_not_called()
+
+            with patch('nltk.corpus.stopwords', new=mock_stopwords), \
+                    patch('nltk.data.find', new=MagicMock(side_effect=LookupError)):
+                self.assertEqual({'the', 'a'}, text_util.stop_words)
+                self.assertEqual({'the', 'a'}, text_util.stop_words)
+
+        mock_download.assert_called_once_with('stopwords', quiet=True)
+        mock_stopwords.words.assert_called_once_with('english')
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
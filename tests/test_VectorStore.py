@@ -0,0 +1,172 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import unittest
+from contextlib import contextmanager
+
+from unittest.mock import patch, MagicMock
+
+import numpy as np
+
+from query_ai.database.db_manager import DBMgr
+from query_ai.database.vector_store import MemmapVectorStore, create_vector_store, fcntl
+
+
+def search_new_store(path, results):
+    results.put([context for context, _ in MemmapVectorStore(path).find_nearest_contexts(
+        np.array([0.0, 0.0, 1.0]), limit=5)])
+
+
+class TestVectorStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "store")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @staticmethod
+    def records():
+        return [(0, 0, 2, "north", np.array([0.0, 2.0, 0.0])),
+                (1, 2, 4, "east", np.array([3.0, 0.0, 0.0])),
+                (2, 4, 6, "north east", np.array([1.0, 1.0, 0.0])),
+                (3, 6, 8, "north", np.array([0.0, 5.0, 0.0]))]
+
+    def test_finds_nearest_contexts_by_cosine_distance(self):
+        store = MemmapVectorStore(self.path)
+
+        self.assertEqual([], store.find_nearest_contexts(np.array([1.0, 0.0, 0.0])))
+        self.assertEqual(3, store.persist_contexts(self.records()))
+
+        nearest = store.find_nearest_contexts(np.array([0.1, 1.0, 0.0]), limit=2)
+
+        self.assertEqual(["north", "north east"], [context for context, _ in nearest])
+        self.assertAlmostEqual(1 - 1 / np.sqrt(1.01), nearest[0][1], places=5)
+        self.assertEqual(nearest, store.find_nearest_contexts(np.array([0.1, 1.0, 0.0]), limit=2,
+                                                              ef_search=10, probes=2))
+
+        batch = store.find_nearest_contexts_batch([np.array([1.0, 0.0, 0.0]),
+                                                   np.array([0.0, -1.0, 0.0])], limit=5)
+
+        self.assertEqual(["east", "north east", "north"], [context for context, _ in batch[0]])
+        self.assertEqual("north", batch[1][-1][0])
+        self.assertAlmostEqual(2.0, batch[1][-1][1], places=5)
+        self.assertFalse(store.ensure_vector_index())
+
+    def test_skips_stored_chunks_and_reloads_from_files(self):
+        store = MemmapVectorStore(self.path)
+        store.persist_contexts(self.records()[:2])
+
+        self.assertEqual(1, store.persist_contexts(self.records()[2:]))
+        store.close()
+
+        reloaded = MemmapVectorStore(self.path)
+
+        self.assertEqual(0, reloaded.persist_contexts(self.records()))
+        self.assertEqual("east", reloaded.find_nearest_contexts(np.array([1.0, 0.0, 0.0]))[0][0])
+        self.assertEqual(3, reloaded.dimension)
+
+    def test_sees_chunks_appended_by_another_store(self):
+        writer = MemmapVectorStore(self.path)
+        reader = MemmapVectorStore(self.path)
+
+        self.assertEqual([], reader.find_nearest_contexts(np.array([1.0, 0.0, 0.0])))
+
+        writer.persist_contexts(self.records()[:1])
+        self.assertEqual("north", reader.find_nearest_contexts(np.array([1.0, 0.0, 0.0]))[0][0])
+
+        writer.persist_contexts(self.records()[1:])
+        self.assertEqual("east", reader.find_nearest_contexts(np.array([1.0, 0.0, 0.0]))[0][0])
+        self.assertEqual(3, len(reader.find_nearest_contexts(np.array([1.0, 0.0, 0.0]), limit=5)))
+
+    def test_appends_after_the_chunks_appended_by_another_store(self):
+        first = MemmapVectorStore(self.path)
+        second = MemmapVectorStore(self.path)
+        first.persist_contexts(self.records()[:1])
+        self.assertEqual("north", second.find_nearest_contexts(np.array([0.0, 1.0, 0.0]))[0][0])
+
+        append_lock = second._MemmapVectorStore__append_lock
+
+        @contextmanager
+        def append_first_then_lock():
+            first.persist_contexts(self.records()[1:2])
+            with append_lock():
+                yield
+
+        with patch.object(second, '_MemmapVectorStore__append_lock', append_first_then_lock):
+            self.assertEqual(1, second.persist_contexts(self.records()[1:3]))
+        self.assertEqual(0, first.persist_contexts(self.records()))
+
+        reloaded = MemmapVectorStore(self.path)
+
+        for store in (first, second, reloaded):
+            self.assertEqual([("east", 0.0), ("north east", 0.29289), ("north", 1.0)],
+                             [(context, round(distance, 5)) for context, distance
+                              in store.find_nearest_contexts(np.array([1.0, 0.0, 0.0]), limit=5)])
+
+    def test_discards_an_incomplete_append(self):
+        store = MemmapVectorStore(self.path)
+        store.persist_contexts(self.records()[:2])
+
+        with open(os.path.join(self.path, MemmapVectorStore.EMBEDDINGS_FILE), "ab") as file:
+            file.write(np.ones(3, dtype=np.float32).tobytes())
+
+        reloaded = MemmapVectorStore(self.path)
+
+        self.assertEqual(2, len(reloaded.find_nearest_contexts(np.array([1.0, 1.0, 0.0]),
+                                                               limit=5)))
+        self.assertEqual(2 * 3 * 4, os.path.getsize(
+            os.path.join(self.path, MemmapVectorStore.EMBEDDINGS_FILE)))
+
+    @unittest.skipIf(fcntl is None, "The appends are only locked with fcntl.")
+    def test_first_load_in_another_process_waits_for_an_append_in_progress(self):
+        MemmapVectorStore(self.path).persist_contexts(self.records()[:2])
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+
+        with open(os.path.join(self.path, MemmapVectorStore.LOCK_FILE), "ab") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            # The appending process wrote the embedding but not yet its chunk.
+            with open(os.path.join(self.path, MemmapVectorStore.EMBEDDINGS_FILE), "ab") as file:
+                file.write(np.array([0.0, 0.0, 1.0], dtype=np.float32).tobytes())
+
+            reader = context.Process(target=search_new_store, args=(self.path, results))
+            reader.start()
+            reader.join(0.5)
+
+            self.assertTrue(reader.is_alive())
+            self.assertEqual(3 * 3 * 4, os.path.getsize(
+                os.path.join(self.path, MemmapVectorStore.EMBEDDINGS_FILE)))
+
+            with open(os.path.join(self.path, MemmapVectorStore.CONTEXTS_FILE), "ab") as file:
+                file.write((json.dumps({"chunk_id": 2, "start_word": 0, "end_word": 1,
+                                        "context": "up"}) + "\n").encode("utf-8"))
+
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+        self.assertEqual("up", results.get(timeout=10)[0])
+        reader.join(10)
+        self.assertEqual(3, len(MemmapVectorStore(self.path).find_nearest_contexts(
+            np.array([0.0, 0.0, 1.0]), limit=5)))
+
+    @patch('query_ai.database.db_manager.DBMgr.execute')
+    def test_db_manager_is_a_vector_store(self, mock_execute):
+        db_mgr = DBMgr('test_db', 'user', 'password', 'localhost', 5432)
+        mock_execute.return_value = [("context", 0.1)]
+
+        self.assertIs(db_mgr, create_vector_store("postgres", db_mgr, self.path))
+        self.assertEqual([("context", 0.1)], db_mgr.find_nearest_contexts([0.1, 0.2], limit=2))
+        self.assertEqual(2, mock_execute.call_args[0][2]["limit"])
+
+    def test_creates_memmap_store_or_fails_for_unknown_type(self):
+        self.assertIsInstance(create_vector_store("memmap", MagicMock(), self.path),
+                              MemmapVectorStore)
+
+        with self.assertRaises(ValueError):
+            create_vector_store("faiss", MagicMock(), self.path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+
+from unittest.mock import patch
+from query_ai.config.vector_store_config import VectorStoreConfig
+
+class TestVectorStoreConfig(unittest.TestCase):
+
+    @patch('os.getenv')
+    def test_initializes_with_default_values(self, mock_getenv):
+        mock_getenv.side_effect = lambda key, default: default
+
+        config = VectorStoreConfig()
+
+        self.assertEqual(config.get_store_type(), "postgres")
+        self.assertEqual(config.get_directory(), "vector_store")
+
+    @patch('os.getenv')
+    def test_initializes_with_custom_values(self, mock_getenv):
+        mock_getenv.side_effect = lambda key, default: "MemMap" if key == "QA_VECTOR_STORE" \
+            else "/data/vectors" if key == "QA_VECTOR_STORE_DIR" else default
+
+        config = VectorStoreConfig()
+
+        self.assertEqual(config.get_store_type(), "memmap")
+        self.assertEqual(config.get_directory(), "/data/vectors")
+
+if __name__ == '__main__':
+    unittest.main()